@@ -0,0 +1,63 @@
+"""
+Benchmark the vectorized haversine matrix against the per-pair `haversine` package loop
+that the fallback path used before.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_geodesic [--sizes 50 200 500] [--repeat 5]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+from haversine import haversine
+
+from src.geodesic import haversine_matrix
+
+
+def random_locations(n, seed=0):
+    rnd = random.Random(seed)
+    # Roughly the Ho Chi Minh City bounding box
+    return [(rnd.uniform(10.70, 10.90), rnd.uniform(106.60, 106.80)) for _ in range(n)]
+
+
+def nested_loop_matrix(locations):
+    n = len(locations)
+    matrix = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i, n):
+            d = haversine(locations[i], locations[j])
+            matrix[i][j] = d
+            matrix[j][i] = d
+    return matrix
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'N':>6} {'loop (ms)':>12} {'numpy f64 (ms)':>16} {'numpy f32 (ms)':>16} {'max err f32 (m)':>16}")
+    for n in args.sizes:
+        locations = random_locations(n)
+        loop_time, reference = best_of(lambda: nested_loop_matrix(locations), max(1, args.repeat // 2))
+        f64_time, f64 = best_of(lambda: haversine_matrix(locations), args.repeat)
+        f32_time, f32 = best_of(lambda: haversine_matrix(locations, dtype=np.float32), args.repeat)
+        assert np.allclose(f64, np.asarray(reference), atol=1e-9)
+        max_err_m = float(np.abs(f32.astype(np.float64) - f64).max() * 1000)
+        print(f"{n:>6} {loop_time * 1e3:>12.2f} {f64_time * 1e3:>16.3f} {f32_time * 1e3:>16.3f} {max_err_m:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
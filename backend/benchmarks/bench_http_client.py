@@ -0,0 +1,76 @@
+"""
+Compare the external-call pattern of a plan request before and after the shared HTTP
+client, against the local ORS stub: one matrix call and one reverse-geocode call.
+
+- before: `requests.post` / `requests.get` without a session, one after another
+- after:  pooled keep-alive HttpClient, both calls awaited concurrently
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_http_client [--rounds 20] [--latency 0.05] [--connect 0.03]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import requests
+
+from benchmarks.ors_stub_server import start_stub_server
+from src.http_client import HttpClient
+
+
+def plan_inputs(n_locations=30, seed=0):
+    rnd = random.Random(seed)
+    locations = [(rnd.uniform(10.70, 10.90), rnd.uniform(106.60, 106.80)) for _ in range(n_locations)]
+    matrix_payload = {"locations": [[lng, lat] for lat, lng in locations], "metrics": ["distance"], "units": "km"}
+    geocode_params = {"point.lat": locations[0][0], "point.lon": locations[0][1], "size": 1}
+    return matrix_payload, geocode_params
+
+
+def run_sequential(base_url, matrix_payload, geocode_params):
+    requests.post(f"{base_url}/v2/matrix/driving-car", json=matrix_payload, timeout=10).raise_for_status()
+    requests.get(f"{base_url}/geocode/reverse", params=geocode_params, timeout=10).raise_for_status()
+
+
+def run_pooled(client, base_url, matrix_payload, geocode_params):
+    async def both():
+        return await asyncio.gather(
+            client.apost(f"{base_url}/v2/matrix/driving-car", json=matrix_payload),
+            client.aget(f"{base_url}/geocode/reverse", params=geocode_params),
+        )
+    for response in client.run(both()):
+        response.raise_for_status()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="Per-request server latency (s)")
+    parser.add_argument("--connect", type=float, default=0.03, help="Per-connection setup delay (s)")
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(latency_seconds=args.latency, connect_seconds=args.connect)
+    matrix_payload, geocode_params = plan_inputs()
+    client = HttpClient()
+    try:
+        results = {}
+        for name, call in (
+            ("sequential, no session", lambda: run_sequential(base_url, matrix_payload, geocode_params)),
+            ("pooled + concurrent", lambda: run_pooled(client, base_url, matrix_payload, geocode_params)),
+        ):
+            connections_before = server.stats["connections"]
+            start = time.perf_counter()
+            for _ in range(args.rounds):
+                call()
+            elapsed = time.perf_counter() - start
+            results[name] = elapsed / args.rounds
+            print(f"{name:<24} {elapsed / args.rounds * 1e3:8.1f} ms/plan request, "
+                  f"{server.stats['connections'] - connections_before} connections opened")
+        speedup = results["sequential, no session"] / results["pooled + concurrent"]
+        print(f"speedup: {speedup:.2f}x")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Check and time the local road-network engine (src.road_network) on a synthetic city grid:
+contraction time, hierarchy size, and many-to-many matrix time for growing location
+counts, with every matrix checked against plain Dijkstra on the original graph.
+
+The grid has `--size` x `--size` intersections `--spacing` metres apart around central
+Ho Chi Minh City, jittered block lengths, a share of one-way streets and some missing
+blocks, written as the CSV edge list the engine reads.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_road_network [--size 60] [--locations 10 50 200 500] [--oneway 0.2]
+"""
+import argparse
+import csv
+import heapq
+import math
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from src.road_network import RoadNetwork
+
+ORIGIN = (10.7769, 106.7009)
+
+
+def write_grid_edge_list(path, size, spacing_m=150, oneway_share=0.2, missing_share=0.05, seed=0):
+    rnd = random.Random(seed)
+    lat_step = spacing_m / 111320.0
+    lng_step = spacing_m / (111320.0 * math.cos(math.radians(ORIGIN[0])))
+
+    def coord(r, c):
+        return ORIGIN[0] + (r - size / 2) * lat_step, ORIGIN[1] + (c - size / 2) * lng_step
+
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["u", "v", "u_lat", "u_lng", "v_lat", "v_lng", "length_m", "oneway"])
+        for r in range(size):
+            for c in range(size):
+                for r2, c2 in ((r + 1, c), (r, c + 1)):
+                    if r2 >= size or c2 >= size or rnd.random() < missing_share:
+                        continue
+                    u, v = (r, c), (r2, c2)
+                    oneway = rnd.random() < oneway_share
+                    if oneway and rnd.random() < 0.5:
+                        u, v = v, u
+                    writer.writerow([f"{u[0]}_{u[1]}", f"{v[0]}_{v[1]}", *coord(*u), *coord(*v),
+                                     round(spacing_m * rnd.uniform(1.0, 1.3), 1), int(oneway)])
+
+
+def dijkstra_matrix(path, network, nodes):
+    """Reference distances between graph nodes (indices as assigned by the engine) on the original edges."""
+    node_index = {tuple(coord): idx for idx, coord in enumerate(network.node_coords.tolist())}
+    adjacency = [[] for _ in range(network.num_nodes)]
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            u = node_index[(float(row["u_lat"]), float(row["u_lng"]))]
+            v = node_index[(float(row["v_lat"]), float(row["v_lng"]))]
+            adjacency[u].append((v, float(row["length_m"]) / 1000.0))
+            if row["oneway"] != "1":
+                adjacency[v].append((u, float(row["length_m"]) / 1000.0))
+    matrix = np.full((len(nodes), len(nodes)), np.inf)
+    position = {node: j for j, node in enumerate(nodes)}
+    for i, source in enumerate(nodes):
+        dist = {source: 0.0}
+        heap = [(0.0, source)]
+        while heap:
+            d, x = heapq.heappop(heap)
+            if d > dist[x]:
+                continue
+            if x in position:
+                matrix[i, position[x]] = d
+            for y, w in adjacency[x]:
+                if d + w < dist.get(y, math.inf):
+                    dist[y] = d + w
+                    heapq.heappush(heap, (d + w, y))
+    return matrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=60, help="intersections per side")
+    parser.add_argument("--spacing", type=float, default=150, help="block length in metres")
+    parser.add_argument("--oneway", type=float, default=0.2, help="share of one-way streets")
+    parser.add_argument("--locations", type=int, nargs="+", default=[10, 50, 200, 500])
+    parser.add_argument("--check", type=int, default=60, help="locations checked against plain Dijkstra")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "grid.csv")
+        write_grid_edge_list(path, args.size, args.spacing, args.oneway, seed=args.seed)
+        start = time.perf_counter()
+        network = RoadNetwork.load(path, build=True)
+        build_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        network = RoadNetwork.load(path)
+        load_seconds = time.perf_counter() - start
+        print(f"grid {args.size}x{args.size}: {network.num_nodes} nodes, "
+              f"{len(network.fwd_indices) + len(network.bwd_indices)} upward edges, "
+              f"contraction {build_seconds:.2f}s, load {load_seconds * 1e3:.1f}ms")
+
+        rnd = random.Random(args.seed)
+        lats, lngs = network.node_coords[:, 0], network.node_coords[:, 1]
+
+        def random_locations(n):
+            return [(rnd.uniform(lats.min(), lats.max()), rnd.uniform(lngs.min(), lngs.max())) for _ in range(n)]
+
+        check_nodes = rnd.sample(range(network.num_nodes), min(args.check, network.num_nodes))
+        reference = dijkstra_matrix(path, network, check_nodes)
+        computed = network.node_distances(check_nodes, check_nodes)
+        both_finite = np.isfinite(reference) & np.isfinite(computed)
+        assert (np.isfinite(reference) == np.isfinite(computed)).all(), "reachability differs from Dijkstra"
+        max_error = float(np.abs(reference[both_finite] - computed[both_finite]).max())
+        print(f"check vs Dijkstra on {len(check_nodes)} nodes: max error {max_error:.2e} km")
+        assert max_error < 1e-9
+
+        print(f"{'locations':>10} {'matrix (ms)':>12} {'per pair (us)':>14}")
+        for n in args.locations:
+            locations = random_locations(n)
+            start = time.perf_counter()
+            matrix = network.distance_matrix(locations)
+            elapsed = time.perf_counter() - start
+            assert matrix.shape == (n, n)
+            print(f"{n:>10} {elapsed * 1e3:>12.1f} {elapsed * 1e6 / (n * n):>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Compare OR-Tools search throughput with Python transit callbacks against matrix/vector
+registered transit costs (SearchService transit_evaluator "callback" vs "matrix").
+
+Instances come from benchmarks.instances and distances are haversine only
+(OfflineSearchService), so no network is used. Each solve runs for the same fixed time
+limit with early stopping disabled; the table shows the local-search neighbors
+accepted, the solutions found and the objective.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_routing_transit [--stores 20 80 200] [--time-limit 2] [--weight 500]
+"""
+import argparse
+import logging
+
+from benchmarks.bench_solver_suite import OfflineSearchService
+from benchmarks.instances import generate_instance
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stores", type=int, nargs="+", default=[20, 80, 200])
+    parser.add_argument("--time-limit", type=float, default=2)
+    parser.add_argument("--weight", type=float, default=500, help="distance cost per km")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.disable(logging.ERROR)
+
+    print(f"{'stores':>7} {'nodes':>6} {'evaluator':>10} {'neighbors':>10} {'solutions':>10} {'objective':>12} {'wall (s)':>9}")
+    for n_stores in args.stores:
+        instance = generate_instance(n_stores, seed=args.seed)
+        base_model = None
+        for evaluator in OfflineSearchService.TRANSIT_EVALUATORS:
+            service = OfflineSearchService(
+                execution_mode="sequential", solver_engine="or_tools", transit_evaluator=evaluator,
+                time_budget_policy="fixed", time_limit_seconds=args.time_limit,
+                no_improvement_seconds=float("inf"), warm_start=False, plan_cache=None, plan_sessions=None
+            )
+            service.solver_metrics = None
+            if base_model is None:
+                base_model = service._prepare_base_model(
+                    instance.stores_for_search, instance.user_loc, instance.required_item_groups
+                )
+            plan = service.find_optimal_shopping_plan(
+                instance.stores_for_search, instance.required_item_groups, instance.user_loc,
+                base_model=base_model, distance_cost_per_km=args.weight
+            )[0]
+            budget = plan.get("_solver_budget", {})
+            print(
+                f"{n_stores:>7} {base_model.num_nodes:>6} {evaluator:>10} "
+                f"{budget.get('local_search_neighbors', 0):>10} {budget.get('solutions', 0):>10} "
+                f"{plan.get('_solver_objective_scaled', 'n/a'):>12} {budget.get('elapsed_seconds', 0):>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
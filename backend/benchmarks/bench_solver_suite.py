@@ -0,0 +1,253 @@
+"""
+Solver benchmark suite: prep time, solve time, objective, gap to the best known objective
+and peak memory of SearchService on seeded Ho Chi Minh City-like instances
+(benchmarks.instances), for one or more solver configurations.
+
+Distances are haversine only and the start address is not geocoded, so no network is
+used. Every (instance, configuration) runs in a fresh spawned process, which makes the
+peak RSS comparable between runs. Each weight of DISTANCE_COSTS_TO_TRY is solved on its
+own (no warm start between weights). OR-Tools solves record their search telemetry
+(time to the first and to the best solution, improvement after the first); it is kept
+in the report and not added to the service's Redis histograms.
+
+The gap of an objective is relative to the best objective known for the same instance
+and weight: the best of this run, and of the `--baseline` reports when given. Reports
+written with `--output` can be fed back as baselines to compare engines, parameters or
+commits.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_solver_suite [--sizes 5 20 50 100 200 500] [--configs default or_tools]
+        [--groups 5] [--candidates 6] [--seeds 0] [--output report.json] [--baseline old.json ...]
+        [--config NAME='{"solver_engine": "or_tools", "time_limit_seconds": 2}']
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from benchmarks.instances import generate_instance
+from src.geodesic import haversine_matrix
+from src.services.search_service import SearchService
+
+# SearchService keyword arguments of the built-in configurations
+CONFIGS = {
+    "default": {},
+    "or_tools": {"solver_engine": "or_tools"},
+    "decomposed": {"solver_engine": "decomposed"},
+    "cp_sat": {"solver_engine": "cp_sat"},
+    "dimension_cost": {"solver_engine": "or_tools", "cost_model": "dimension"},
+    "exact_dp": {"solver_engine": "exact_dp"},
+    "item_mode": {"solver_mode": "item", "solver_engine": "or_tools"},
+    "no_presolve": {"presolve": False},
+    "fixed_budget": {"time_budget_policy": "fixed"},
+}
+DEFAULT_SIZES = [5, 20, 50, 100, 200, 500]
+# Held-Karp is exponential in the candidate locations, larger instances are skipped
+EXACT_DP_MAX_LOCATIONS = 20
+
+
+class OfflineSearchService(SearchService):
+    """SearchService with haversine distances and no reverse geocoding."""
+
+    def _get_distance_matrix(self, locations):
+        return haversine_matrix(locations)
+
+    def _resolve_address(self, lat, lng):
+        return f"({lat}, {lng})"
+
+
+def _max_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def run_case(n_stores, n_groups, candidates_per_group, seed, service_kwargs):
+    """One instance under one configuration; runs inside a fresh worker process."""
+    logging.disable(logging.ERROR)
+    instance = generate_instance(n_stores, n_groups, candidates_per_group, seed)
+    service = OfflineSearchService(execution_mode="sequential", **{"solver_telemetry": True, **service_kwargs})
+    service.solver_metrics = None
+    rss_before = _max_rss_mb()
+
+    start = time.perf_counter()
+    base_model = service._prepare_base_model(instance.stores_for_search, instance.user_loc, instance.required_item_groups)
+    prep_seconds = time.perf_counter() - start
+    case = {
+        'instance': instance.describe(),
+        'prep_seconds': round(prep_seconds, 4),
+        'num_locations': base_model.num_locations,
+        'num_nodes': base_model.num_nodes,
+        'presolve': base_model.presolve,
+        'weights': [],
+    }
+    if service.solver_engine == "exact_dp" and len(base_model.candidate_locations()) > EXACT_DP_MAX_LOCATIONS:
+        case['skipped'] = f"more than {EXACT_DP_MAX_LOCATIONS} candidate locations for exact_dp"
+        return case
+
+    for cost_per_km in service.DISTANCE_COSTS_TO_TRY:
+        start = time.perf_counter()
+        plan = service.find_optimal_shopping_plan(
+            instance.stores_for_search, instance.required_item_groups, instance.user_loc,
+            base_model=base_model, distance_cost_per_km=cost_per_km
+        )[0]
+        solve_seconds = time.perf_counter() - start
+        budget = plan.get('_solver_budget') or {}
+        telemetry = budget.get('telemetry') or {}
+        case['weights'].append({
+            'distance_cost_per_km': cost_per_km,
+            'solve_seconds': round(solve_seconds, 4),
+            'objective_scaled': plan.get('_solver_objective_scaled'),
+            'cost': plan.get('cost'),
+            'distance_km': plan.get('distance'),
+            'engine': plan.get('_solver_engine'),
+            'stop_reason': budget.get('stop_reason'),
+            'solutions': budget.get('solutions'),
+            'local_search_neighbors': budget.get('local_search_neighbors'),
+            # OR-Tools only
+            'first_solution_seconds': telemetry.get('first_solution_seconds'),
+            'time_to_best_seconds': telemetry.get('time_to_best_seconds'),
+            'improvement_after_first': telemetry.get('improvement_after_first'),
+            'seed': telemetry.get('seed'),
+            'improvement_over_seed': telemetry.get('improvement_over_seed'),
+            'objective_curve': telemetry.get('curve'),
+            # Proven by CP-SAT only
+            'lower_bound_scaled': budget.get('lower_bound_scaled'),
+            'solver_gap': budget.get('gap'),
+            'error': plan.get('_error_message'),
+        })
+    case['peak_rss_mb'] = round(_max_rss_mb(), 1)
+    case['peak_rss_delta_mb'] = round(_max_rss_mb() - rss_before, 1)
+    return case
+
+
+def run_isolated(*args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(run_case, *args).result()
+
+
+def _best_key(instance_id, cost_per_km):
+    return f"{instance_id}@{cost_per_km}"
+
+
+def best_known_objectives(results, baselines):
+    """Lowest objective per (instance, weight) over this run and the baseline reports."""
+    best = {}
+    for report in baselines:
+        for key, objective in report.get('best_known', {}).items():
+            best[key] = min(objective, best.get(key, objective))
+    for result in results:
+        for weight in result['weights']:
+            objective = weight['objective_scaled']
+            if objective is None:
+                continue
+            key = _best_key(result['instance']['id'], weight['distance_cost_per_km'])
+            best[key] = min(objective, best.get(key, objective))
+    return best
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def _parse_config(value):
+    name, sep, raw = value.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError("expected NAME=JSON")
+    return name, json.loads(raw)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="store counts")
+    parser.add_argument("--groups", type=int, default=5, help="required item groups")
+    parser.add_argument("--candidates", type=int, default=6, help="candidate products per group")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0])
+    parser.add_argument("--configs", nargs="+", default=["default"], choices=sorted(CONFIGS))
+    parser.add_argument("--config", type=_parse_config, action="append", default=[],
+                        help="extra configuration, NAME='{\"SearchService kwarg\": value}'")
+    parser.add_argument("--baseline", nargs="*", default=[], help="earlier reports to take best known objectives from")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--in-process", action="store_true", help="skip the process per case (peak memory is then cumulative)")
+    args = parser.parse_args()
+
+    configs = {name: CONFIGS[name] for name in args.configs}
+    configs.update(dict(args.config))
+    baselines = []
+    for path in args.baseline:
+        with open(path) as f:
+            baselines.append(json.load(f))
+    runner = run_case if args.in_process else run_isolated
+
+    results = []
+    print(f"{'instance':>28} {'config':>12} {'nodes':>6} {'prep (s)':>9} {'weight':>7} {'engine':>9} "
+          f"{'solve (s)':>9} {'objective':>12} {'peak MB':>8}")
+    for seed in args.seeds:
+        for n_stores in args.sizes:
+            for name, service_kwargs in configs.items():
+                result = runner(n_stores, args.groups, args.candidates, seed, service_kwargs)
+                result['config'] = name
+                results.append(result)
+                if result.get('skipped'):
+                    print(f"{result['instance']['id']:>28} {name:>12}  skipped: {result['skipped']}")
+                for weight in result['weights']:
+                    print(f"{result['instance']['id']:>28} {name:>12} {result['num_nodes']:>6} "
+                          f"{result['prep_seconds']:>9.3f} {weight['distance_cost_per_km']:>7} {weight['engine'] or '-':>9} "
+                          f"{weight['solve_seconds']:>9.3f} {weight['objective_scaled'] or '-':>12} "
+                          f"{result.get('peak_rss_mb', 0):>8.1f}")
+
+    best = best_known_objectives(results, baselines)
+    for result in results:
+        for weight in result['weights']:
+            objective = weight['objective_scaled']
+            best_objective = best.get(_best_key(result['instance']['id'], weight['distance_cost_per_km']))
+            weight['best_known_objective'] = best_objective
+            weight['gap'] = (round((objective - best_objective) / best_objective, 6)
+                             if objective is not None and best_objective else None)
+
+    print(f"\n{'config':>12} {'solves':>7} {'mean gap %':>11} {'max gap %':>10} {'solve total (s)':>16} "
+          f"{'first sol (s)':>14} {'to best (s)':>12} {'improved %':>11}")
+    for name in configs:
+        weights = [w for r in results if r['config'] == name for w in r['weights'] if w['gap'] is not None]
+        if not weights:
+            continue
+        gaps = [w['gap'] * 100 for w in weights]
+        # Means over the OR-Tools solves; '-' for engines without search telemetry
+        searched = [w for w in weights if w['time_to_best_seconds'] is not None]
+        telemetry = ("-", "-", "-")
+        if searched:
+            telemetry = (
+                f"{sum(w['first_solution_seconds'] for w in searched) / len(searched):.4f}",
+                f"{sum(w['time_to_best_seconds'] for w in searched) / len(searched):.4f}",
+                f"{100 * sum(w['improvement_after_first'] for w in searched) / len(searched):.3f}",
+            )
+        print(f"{name:>12} {len(weights):>7} {sum(gaps) / len(gaps):>11.3f} {max(gaps):>10.3f} "
+              f"{sum(w['solve_seconds'] for w in weights):>16.2f} {telemetry[0]:>14} {telemetry[1]:>12} {telemetry[2]:>11}")
+
+    if args.output:
+        report = {
+            'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'arguments': {k: v for k, v in vars(args).items() if k not in ("output", "config")},
+            'configs': configs,
+            'results': results,
+            'best_known': best,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Seeded synthetic plan instances that look like Ho Chi Minh City searches: stores grouped
+around district centres, chains sharing a catalog and a price level, several candidate
+products per required group and a user near one of the districts.
+
+Instances are in the solver input shape built by SearchService.get_plans_from_nearby
+(`stores_for_search`, `required_item_groups`, `user_loc`) and depend only on
+(n_stores, n_groups, candidates_per_group, seed).
+"""
+import random
+from dataclasses import dataclass
+
+# (lat, lng) of district centres and their share of the stores
+DISTRICTS = [
+    ((10.7769, 106.7009), 0.18),  # District 1
+    ((10.7844, 106.6844), 0.12),  # District 3
+    ((10.7540, 106.6634), 0.10),  # District 5
+    ((10.8106, 106.7091), 0.12),  # Binh Thanh
+    ((10.7992, 106.6803), 0.10),  # Phu Nhuan
+    ((10.8015, 106.6526), 0.12),  # Tan Binh
+    ((10.7340, 106.7215), 0.10),  # District 7
+    ((10.8387, 106.6653), 0.08),  # Go Vap
+    ((10.8494, 106.7537), 0.08),  # Thu Duc
+]
+# Standard deviation of a store around its district centre, in degrees (~1 km)
+DISTRICT_SPREAD_DEG = 0.009
+# Share of stores opened at the coordinates of an earlier store (malls, shop houses)
+COLOCATED_SHARE = 0.05
+# name, price level, share of the chain catalog stocked by a store
+CHAINS = [
+    ("Bach Hoa Xanh", 0.97, 0.90),
+    ("Co.op Food", 1.00, 0.85),
+    ("WinMart+", 1.02, 0.80),
+    ("Circle K", 1.12, 0.55),
+    ("FamilyMart", 1.10, 0.55),
+    ("GS25", 1.10, 0.50),
+    ("Ministop", 1.08, 0.50),
+    ("Satrafoods", 0.98, 0.75),
+]
+PRODUCTS = ["milk", "rice", "eggs", "instant noodles", "fish sauce", "cooking oil", "coffee", "shampoo",
+            "toothpaste", "detergent", "sugar", "soy sauce"]
+BRANDS = ["Vinamilk", "TH", "Nutifood", "Dalat Milk", "Acecook", "Masan", "Neptune", "Trung Nguyen",
+          "Unilever", "P&G", "Bien Hoa", "Nam Ngu"]
+
+
+@dataclass
+class Instance:
+    id: str
+    n_stores: int
+    n_groups: int
+    candidates_per_group: int
+    seed: int
+    stores_for_search: dict
+    required_item_groups: list
+    user_loc: dict
+
+    @property
+    def num_offers(self):
+        return sum(len(store['items']) for store in self.stores_for_search.values())
+
+    def describe(self):
+        return {
+            'id': self.id,
+            'n_stores': self.n_stores,
+            'n_groups': self.n_groups,
+            'candidates_per_group': self.candidates_per_group,
+            'seed': self.seed,
+            'num_offers': self.num_offers,
+        }
+
+
+def _round_price(price):
+    return int(round(price / 500.0)) * 500
+
+
+def _district_point(rnd):
+    centre = rnd.choices([c for c, _ in DISTRICTS], weights=[w for _, w in DISTRICTS])[0]
+    return (round(rnd.gauss(centre[0], DISTRICT_SPREAD_DEG), 6), round(rnd.gauss(centre[1], DISTRICT_SPREAD_DEG), 6))
+
+
+def generate_instance(n_stores, n_groups=5, candidates_per_group=6, seed=0):
+    rnd = random.Random(f"hcmc:{n_stores}:{n_groups}:{candidates_per_group}:{seed}")
+
+    # Required groups: interchangeable candidate products, each with a base price
+    groups, base_price = [], {}
+    for g in range(n_groups):
+        product = PRODUCTS[g % len(PRODUCTS)] + (f" {g // len(PRODUCTS) + 1}" if g >= len(PRODUCTS) else "")
+        low = rnd.uniform(10000, 80000)
+        group = set()
+        for brand in rnd.sample(BRANDS, min(candidates_per_group, len(BRANDS))):
+            name = f"{product} {brand}"
+            base_price[name] = low * rnd.uniform(1.0, 1.6)
+            group.add(name)
+        groups.append(group)
+
+    # Chain catalogs: the candidates a chain lists and its shelf price for each
+    catalogs = []
+    for _, level, _ in CHAINS:
+        catalog = {}
+        for group in groups:
+            listed = [name for name in sorted(group) if rnd.random() < 0.7] or [rnd.choice(sorted(group))]
+            for name in listed:
+                catalog[name] = _round_price(base_price[name] * level * rnd.uniform(0.95, 1.05))
+        catalogs.append(catalog)
+
+    stores, coordinates = {}, []
+    for s in range(n_stores):
+        chain_idx = rnd.randrange(len(CHAINS))
+        chain_name, _, breadth = CHAINS[chain_idx]
+        if coordinates and rnd.random() < COLOCATED_SHARE:
+            lat, lng = rnd.choice(coordinates)
+        else:
+            lat, lng = _district_point(rnd)
+        coordinates.append((lat, lng))
+        items = {name: price for name, price in catalogs[chain_idx].items() if rnd.random() < breadth}
+        stores[f"{chain_name} #{s}"] = {'lat': lat, 'lng': lng, 'items': items}
+
+    # Every group must be sold somewhere, otherwise the instance is trivially infeasible
+    first_store = next(iter(stores.values()))
+    for group in groups:
+        if not any(name in store['items'] for store in stores.values() for name in group):
+            name = min(group, key=base_price.get)
+            first_store['items'][name] = _round_price(base_price[name])
+
+    user_lat, user_lng = _district_point(rnd)
+    return Instance(
+        id=f"hcmc-s{n_stores}-g{n_groups}-c{candidates_per_group}-seed{seed}",
+        n_stores=n_stores,
+        n_groups=n_groups,
+        candidates_per_group=candidates_per_group,
+        seed=seed,
+        stores_for_search=stores,
+        required_item_groups=groups,
+        user_loc={'lat': user_lat, 'lng': user_lng},
+    )
@@ -0,0 +1,82 @@
+"""
+Local OpenRouteService stub for tests and benchmarks.
+
+Serves `/v2/matrix/driving-car` (haversine distances for the requested sources and
+destinations) and `/geocode/reverse`, with a configurable per-request latency and a
+per-connection setup delay that stands in for the TCP+TLS handshake.
+
+    server, base_url = start_stub_server(latency_seconds=0.05, connect_seconds=0.03)
+    Config.ORS_BASE_URL = base_url
+    ...
+    server.shutdown()
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from src.geodesic import haversine_matrix
+
+
+def _make_handler(latency_seconds, connect_seconds, stats):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so pooled clients reuse connections
+        disable_nagle_algorithm = True  # headers and body are separate writes
+
+        def setup(self):
+            # Called once per TCP connection
+            time.sleep(connect_seconds)
+            with stats["lock"]:
+                stats["connections"] += 1
+            super().setup()
+
+        def _send_json(self, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _count_request(self):
+            with stats["lock"]:
+                stats["requests"] += 1
+            time.sleep(latency_seconds)
+
+        def do_POST(self):
+            self._count_request()
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not urlsplit(self.path).path.startswith("/v2/matrix"):
+                self.send_error(404)
+                return
+            locations = [(lat, lng) for lng, lat in payload["locations"]]
+            sources = payload.get("sources", list(range(len(locations))))
+            destinations = payload.get("destinations", list(range(len(locations))))
+            distances = haversine_matrix([locations[i] for i in sources], [locations[j] for j in destinations])
+            self._send_json({"distances": (distances * 1.3).round(3).tolist()})
+
+        def do_GET(self):
+            self._count_request()
+            url = urlsplit(self.path)
+            if url.path != "/geocode/reverse":
+                self.send_error(404)
+                return
+            query = parse_qs(url.query)
+            lat, lng = query["point.lat"][0], query["point.lon"][0]
+            self._send_json({"features": [{"properties": {"label": f"Stub address near {lat}, {lng}"}}]})
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def start_stub_server(latency_seconds=0.05, connect_seconds=0.03, port=0):
+    """Start the stub on a background thread. Returns (server, base_url); server.stats counts traffic."""
+    stats = {"requests": 0, "connections": 0, "lock": threading.Lock()}
+    server = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(latency_seconds, connect_seconds, stats))
+    server.daemon_threads = True
+    server.stats = stats
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
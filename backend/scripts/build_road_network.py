@@ -0,0 +1,30 @@
+"""
+Contract the local road network used by SearchService (Config.ROAD_NETWORK_PATH) and save
+the hierarchy next to the edge list as `<path>.ch.npz`.
+
+Usage (from the backend directory):
+    python -m scripts.build_road_network [--path data/hcmc_roads.csv]
+"""
+import argparse
+import time
+
+from src.config import Config
+from src.road_network import RoadNetwork
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default=None, help="CSV edge list (defaults to Config.ROAD_NETWORK_PATH)")
+    args = parser.parse_args()
+
+    path = args.path or Config.ROAD_NETWORK_PATH
+    if not path:
+        raise SystemExit("No edge list given and ROAD_NETWORK_PATH is not configured")
+    start = time.perf_counter()
+    network = RoadNetwork.load(path, build=True)
+    print(f"Road network ready: {network.num_nodes} nodes, {len(network.fwd_indices) + len(network.bwd_indices)} "
+          f"upward edges, {RoadNetwork.hierarchy_path(path)} ({time.perf_counter() - start:.1f}s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""
+Build or incrementally extend the store x store distance table used by SearchService.
+
+Usage (from the backend directory):
+    python -m scripts.build_store_distance_table [--path data/store_distances.npy] [--full] [--haversine]
+"""
+import argparse
+
+from src.services.store_distance_table import update_store_distance_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default=None, help="Output .npy path (defaults to Config.STORE_DISTANCE_TABLE_PATH)")
+    parser.add_argument("--full", action="store_true", help="Rebuild from scratch instead of adding new stores only")
+    parser.add_argument("--haversine", action="store_true", help="Use straight-line distances instead of OpenRouteService")
+    args = parser.parse_args()
+
+    added = update_store_distance_table(path=args.path, use_haversine=args.haversine, incremental=not args.full)
+    print(f"Store distance table updated, {added} stores added.")
+
+
+if __name__ == "__main__":
+    main()
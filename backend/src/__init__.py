@@ -4,17 +4,18 @@ from .database import MongoDB
 from .config import Config
 import logging
 import sys
-
-from src.routes.user_routes import user_routes
-from src.routes.ai_routes import ai_routes
-from src.routes.product_routes import product_routes
-from src.routes.store_routes import store_routes
-from src.routes.auth_routes import auth_routes
-from src.routes.search_routes import search_bp
-from src.extensions import db, redis, AI_MODELS
 import os
 
 def create_app():
+    # Import blueprints (and through them the DB/AI extensions) only when the app is built,
+    # so standalone modules such as src.geodesic can be imported by jobs and benchmarks.
+    from src.routes.user_routes import user_routes
+    from src.routes.ai_routes import ai_routes
+    from src.routes.product_routes import product_routes
+    from src.routes.store_routes import store_routes
+    from src.routes.auth_routes import auth_routes
+    from src.routes.search_routes import search_bp
+
     app = Flask(__name__)
     app.config.from_object(Config)
     
@@ -17,6 +17,59 @@ class Config:
     REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
     GGMAP_API_KEY = os.getenv('GGMAP_API_KEY')
     ORS_API_KEY = os.getenv('ORS_API_KEY')
+    ORS_BASE_URL = os.getenv('ORS_BASE_URL', 'https://api.openrouteservice.org')
+    # Shared HTTP client for external APIs
+    HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 20))
+    HTTP_PER_HOST_CONCURRENCY = int(os.getenv('HTTP_PER_HOST_CONCURRENCY', 4))
+    HTTP_MAX_WORKERS = int(os.getenv('HTTP_MAX_WORKERS', 16))
+    # "sequential" solves plan weights one after another, "process_pool" solves them in parallel
+    SOLVER_EXECUTION_MODE = os.getenv('SOLVER_EXECUTION_MODE', 'sequential')
+    SOLVER_POOL_SIZE = int(os.getenv('SOLVER_POOL_SIZE', 3))
+    SOLVER_POOL_TIMEOUT_MARGIN_SECONDS = float(os.getenv('SOLVER_POOL_TIMEOUT_MARGIN_SECONDS', 5))
+    # Total solving time allowed per plan request, 0 for no limit
+    SOLVER_LATENCY_BUDGET_SECONDS = float(os.getenv('SOLVER_LATENCY_BUDGET_SECONDS', 0))
+    # CP-SAT engine (solver_engine="cp_sat"): search workers per solve (0: one per core) and relative gap to stop at
+    CP_SAT_NUM_WORKERS = int(os.getenv('CP_SAT_NUM_WORKERS', 8))
+    CP_SAT_GAP_LIMIT = float(os.getenv('CP_SAT_GAP_LIMIT', 0.005))
+    # Pairwise road-distance cache in front of the ORS matrix API
+    DISTANCE_CACHE_PRECISION = int(os.getenv('DISTANCE_CACHE_PRECISION', 5))
+    DISTANCE_CACHE_LRU_SIZE = int(os.getenv('DISTANCE_CACHE_LRU_SIZE', 200000))
+    DISTANCE_CACHE_TTL_SECONDS = int(os.getenv('DISTANCE_CACHE_TTL_SECONDS', 30 * 86400))
+    ORS_MATRIX_MAX_ROUTES = int(os.getenv('ORS_MATRIX_MAX_ROUTES', 3500))
+    # Reverse-geocode cache for plan start addresses (precision 4 ~ 11 m)
+    GEOCODE_CACHE_PRECISION = int(os.getenv('GEOCODE_CACHE_PRECISION', 4))
+    GEOCODE_CACHE_LRU_SIZE = int(os.getenv('GEOCODE_CACHE_LRU_SIZE', 10000))
+    GEOCODE_CACHE_TTL_SECONDS = int(os.getenv('GEOCODE_CACHE_TTL_SECONDS', 7 * 86400))
+    # Offline store x store distance table (.npy); empty disables it
+    STORE_DISTANCE_TABLE_PATH = os.getenv('STORE_DISTANCE_TABLE_PATH', '')
+    STORE_DISTANCE_TABLE_AUTO_UPDATE = os.getenv('STORE_DISTANCE_TABLE_AUTO_UPDATE', 'False') == 'True'
+    # Local road network (CSV edge list, contracted by scripts/build_road_network.py); empty uses ORS
+    ROAD_NETWORK_PATH = os.getenv('ROAD_NETWORK_PATH', '')
+    ROAD_NETWORK_MAX_SNAP_KM = float(os.getenv('ROAD_NETWORK_MAX_SNAP_KM', 0.5))
+    # Solved plans for repeated /search/plans requests
+    PLAN_CACHE_ENABLED = os.getenv('PLAN_CACHE_ENABLED', 'True') == 'True'
+    PLAN_CACHE_LRU_SIZE = int(os.getenv('PLAN_CACHE_LRU_SIZE', 1000))
+    PLAN_CACHE_TTL_SECONDS = int(os.getenv('PLAN_CACHE_TTL_SECONDS', 3600))
+    PLAN_CACHE_LOCATION_PRECISION = int(os.getenv('PLAN_CACHE_LOCATION_PRECISION', 4))
+    PLAN_CACHE_VERSION_CHECK_SECONDS = float(os.getenv('PLAN_CACHE_VERSION_CHECK_SECONDS', 5))
+    # Background plan jobs (/search/plans/jobs)
+    PLAN_JOB_WORKERS = int(os.getenv('PLAN_JOB_WORKERS', 2))
+    PLAN_JOB_MAX_PENDING = int(os.getenv('PLAN_JOB_MAX_PENDING', 20))
+    PLAN_JOB_TTL_SECONDS = int(os.getenv('PLAN_JOB_TTL_SECONDS', 3600))
+    # Safe from job threads: solver workers are forked by the pool's forkserver, not by this threaded process
+    PLAN_JOB_EXECUTION_MODE = os.getenv('PLAN_JOB_EXECUTION_MODE', 'process_pool')
+    PLAN_JOB_POLL_SECONDS = float(os.getenv('PLAN_JOB_POLL_SECONDS', 0.2))
+    # An SSE stream holds a web worker thread (8 per container with the sync gthread
+    # workers), so it is kept short; clients then poll. Raise it only with an async
+    # worker class (gevent, eventlet).
+    PLAN_JOB_STREAM_TIMEOUT_SECONDS = float(os.getenv('PLAN_JOB_STREAM_TIMEOUT_SECONDS', 10))
+    # Plan sessions for incremental replanning (/search/plans/replan)
+    PLAN_SESSION_ENABLED = os.getenv('PLAN_SESSION_ENABLED', 'True') == 'True'
+    PLAN_SESSION_TTL_SECONDS = int(os.getenv('PLAN_SESSION_TTL_SECONDS', 3600))
+    # Base data models (with their distance matrix) kept in process memory
+    PLAN_SESSION_MODEL_LRU_SIZE = int(os.getenv('PLAN_SESSION_MODEL_LRU_SIZE', 100))
+    # OR-Tools search telemetry in the plans' debug output and in /search/plans/metrics histograms
+    SOLVER_TELEMETRY_ENABLED = os.getenv('SOLVER_TELEMETRY_ENABLED', 'False') == 'True'
     DEBUG = True 
     DIMENSIONS = 768
     VECTOR_WEIGHT = 0.7
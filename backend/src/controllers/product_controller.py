@@ -1,4 +1,5 @@
-from src.services.services import product_service
+from src.services.services import product_service, redis_service
+from src.services.plan_cache_service import PlanCacheService
 from src.models.product_model import Product
 from flask import jsonify
 from datetime import datetime
@@ -6,6 +7,8 @@ from datetime import datetime
 class ProductController:
     def __init__(self):
         self.product_service = product_service
+        # Cached plans embed product prices, any catalog change invalidates them
+        self.plan_cache = PlanCacheService(redis_service=redis_service)
 
     def get_products(self) -> list[Product]:
         return self.product_service.get_all_products()
@@ -32,7 +35,9 @@ class ProductController:
                 created_at=datetime.now(),
                 updated_at=datetime.now()
             )
-            return self.product_service.insert_one(product)
+            inserted = self.product_service.insert_one(product)
+            self.plan_cache.bump_catalog_version()
+            return inserted
         except Exception as e:
             return jsonify({"error": str(e)}), 500
     
@@ -49,6 +54,8 @@ class ProductController:
                 curr.updated_at = datetime.now()
                 products.append(curr)
             success, failed = self.product_service.insert_many(products)
+            if success:
+                self.plan_cache.bump_catalog_version()
             
             print(f"**{success}** products inserted successfully, **{len(failed)}** products failed")
             if len(failed) > 0:
@@ -58,7 +65,10 @@ class ProductController:
             return jsonify({"error": str(e)}), 500
 
     def delete_product(self, id: str) -> bool:
-        return self.product_service.delete_by_id(id)
+        deleted = self.product_service.delete_by_id(id)
+        if deleted:
+            self.plan_cache.bump_catalog_version()
+        return deleted
 
     def re_indexing(self) -> bool:
         return self.product_service.re_indexing()
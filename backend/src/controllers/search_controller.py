@@ -1,20 +1,44 @@
+import uuid
 from datetime import datetime
-from flask import g, jsonify, request
+from flask import Response, g, jsonify, request, stream_with_context
 from pydantic import ValidationError
 
-from src.models.search_model import PlanRequestModel, StoreSearchRequestModel, NearbySearchRequestModel
+from src.models.search_model import PlanRequestModel, PlanReplanRequestModel, StoreSearchRequestModel, NearbySearchRequestModel
+from src.config import Config
+from src.services.plan_job_service import PlanJobService
 from src.services.search_service import SearchService
 from src.services.services import store_service, redis_service
 
 class SearchController:
     def __init__(self):
-        self.search_service = SearchService()
+        self.search_service = SearchService(redis_service=redis_service)
+        # Jobs solve in the solver process pool so web workers are not held by CPU-bound solves
+        self.plan_jobs = PlanJobService(
+            SearchService(
+                redis_service=redis_service,
+                execution_mode=Config.PLAN_JOB_EXECUTION_MODE,
+                plan_cache=self.search_service.plan_cache
+            ),
+            redis_service
+        )
         self.store_service = store_service
         self.redis_service = redis_service
 
+    @staticmethod
+    def _session_key(session_id):
+        # Sessions are stored per user, so the id of another user's session finds nothing
+        return f"{g.user_id}:{session_id}"
+
+    @staticmethod
+    def _with_session(plans, session_id):
+        for plan in plans:
+            plan['session_id'] = session_id
+        return plans
+
     def get_plans(self, request):
         """
-        Receives `/search/nearby` output unchanged and returns top-k plans.
+        Receives `/search/nearby` output unchanged and returns top-k plans. Every plan
+        carries the `session_id` to send to replan after editing the shopping list.
         """
         payload = request.get_json(force=True)
         # validate input
@@ -26,7 +50,11 @@ class SearchController:
         # pass stores list and user location directly to service
         stores_list = [store.dict() for store in req.stores]
         user_loc = tuple(req.user_loc)
-        plans = self.search_service.get_plans_from_nearby(stores_list, user_loc)
+        session_id = uuid.uuid4().hex
+        plans = self._with_session(self.search_service.get_plans_from_nearby(
+            stores_list, user_loc, plan_mode=req.mode, max_plans=req.max_plans,
+            latency_budget_seconds=req.latency_budget_seconds, session_id=self._session_key(session_id)
+        ), session_id)
 
         # cache in redis
         key = f"user:{g.user_id}:data"
@@ -34,6 +62,105 @@ class SearchController:
         
         return jsonify(plans), 200
 
+    def replan(self, request):
+        """
+        Plans for an edit of an earlier /search/plans request: products or stores added or
+        removed (PlanReplanRequestModel). Reuses the session's distance matrix and routes,
+        so it answers much faster than a new request; 404 once the session expired.
+        """
+        payload = request.get_json(force=True)
+        try:
+            req = PlanReplanRequestModel(**payload)
+        except ValidationError as e:
+            return jsonify({"error": e.errors()}), 400
+
+        delta = req.dict(exclude={"session_id"})
+        try:
+            plans = self.search_service.replan(self._session_key(req.session_id), delta)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if plans is None:
+            return jsonify({"error": "Plan session not found or expired"}), 404
+        self._with_session(plans, req.session_id)
+
+        key = f"user:{g.user_id}:data"
+        redis_service.update_latest_plans(key, plans)
+        return jsonify(plans), 200
+
+    def get_solver_metrics(self):
+        """
+        Histograms of the OR-Tools searches (time to first and best solution, improvement
+        after the first, solutions) and counts of their statuses and stop reasons; 404
+        unless SOLVER_TELEMETRY_ENABLED.
+        """
+        if self.search_service.solver_metrics is None:
+            return jsonify({"error": "Solver telemetry is disabled"}), 404
+        return jsonify(self.search_service.solver_metrics.snapshot()), 200
+
+    def submit_plan_job(self, request):
+        """
+        Same input as get_plans, but returns a job id at once (202). Plans are then read
+        with get_plan_job (polling) or stream_plan_job (Server-Sent Events).
+        """
+        payload = request.get_json(force=True)
+        try:
+            req = PlanRequestModel(**payload)
+        except ValidationError as e:
+            return jsonify({"error": e.errors()}), 400
+
+        stores_list = [store.dict() for store in req.stores]
+        history_key = f"user:{g.user_id}:data"
+        try:
+            job_id = self.plan_jobs.submit(
+                g.user_id, stores_list, tuple(req.user_loc),
+                plan_kwargs={
+                    "plan_mode": req.mode, "max_plans": req.max_plans,
+                    "latency_budget_seconds": req.latency_budget_seconds
+                },
+                on_done=lambda plans: redis_service.update_latest_plans(history_key, plans)
+            )
+        except Exception as e:
+            return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+        if job_id is None:
+            return jsonify({"error": "Too many plan jobs in progress, try again later."}), 503
+        return jsonify({
+            "job_id": job_id,
+            "status_url": f"/search/plans/jobs/{job_id}",
+            "events_url": f"/search/plans/jobs/{job_id}/events"
+        }), 202
+
+    def _find_job(self, job_id, since=0):
+        job = self.plan_jobs.get(job_id, since)
+        # Jobs of other users are reported as missing
+        if job is None or job.get("user_id") != g.user_id:
+            return None
+        return job
+
+    def get_plan_job(self, request, job_id):
+        """Job status, the plans produced since `?since=<n>` and, when done, the final plans."""
+        try:
+            since = max(0, int(request.args.get("since", 0)))
+        except ValueError:
+            return jsonify({"error": "since must be an integer"}), 400
+        job = self._find_job(job_id, since)
+        if job is None:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(job), 200
+
+    def stream_plan_job(self, job_id):
+        """
+        Server-Sent Events of a job (PlanJobService.stream). The stream lasts at most
+        PLAN_JOB_STREAM_TIMEOUT_SECONDS; on its `timeout` event the client closes the
+        EventSource (which would otherwise reconnect) and polls `status_url?since=<next>`.
+        """
+        if self._find_job(job_id) is None:
+            return jsonify({"error": "Job not found"}), 404
+        return Response(
+            stream_with_context(self.plan_jobs.stream(job_id)),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
     def search_nearby(self, request):
         payload = request.get_json(force=True)
         # Validate input
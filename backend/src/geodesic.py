@@ -0,0 +1,39 @@
+"""
+Vectorized great-circle (haversine) distances.
+
+All functions take coordinates as (lat, lng) in degrees, either a single pair or an
+array-like of shape (N, 2), and return kilometres. Pass `dtype=np.float32` for a
+faster, half-size result when metre-level precision is enough.
+"""
+import numpy as np
+
+# Mean Earth radius, same value as the `haversine` package
+EARTH_RADIUS_KM = 6371.0088
+
+
+def _as_radians(points, dtype):
+    points = np.asarray(points, dtype=dtype).reshape(-1, 2)
+    return np.radians(points[:, 0]), np.radians(points[:, 1])
+
+
+def haversine_matrix(origins, destinations=None, dtype=np.float64):
+    """
+    N x M matrix of haversine distances (km) between `origins` (N points) and
+    `destinations` (M points, defaults to `origins`), computed with NumPy broadcasting.
+    """
+    lat1, lng1 = _as_radians(origins, dtype)
+    if destinations is None:
+        lat2, lng2 = lat1, lng1
+    else:
+        lat2, lng2 = _as_radians(destinations, dtype)
+
+    dlat = lat2[None, :] - lat1[:, None]
+    dlng = lng2[None, :] - lng1[:, None]
+    a = np.sin(dlat * 0.5) ** 2 + np.cos(lat1)[:, None] * np.cos(lat2)[None, :] * np.sin(dlng * 0.5) ** 2
+    np.clip(a, 0.0, 1.0, out=a)
+    return (2.0 * EARTH_RADIUS_KM) * np.arcsin(np.sqrt(a))
+
+
+def haversine_to_point(lat, lng, points, dtype=np.float64):
+    """Vector of haversine distances (km) from the point (lat, lng) to each of `points`."""
+    return haversine_matrix([(lat, lng)], points, dtype=dtype)[0]
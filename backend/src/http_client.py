@@ -0,0 +1,107 @@
+"""
+Shared HTTP client for calls to external APIs (OpenRouteService, ...).
+
+- keep-alive connection pooling through one `requests.Session`
+- a per-host concurrency limit, so bursts of parallel calls cannot exceed provider limits
+- an asyncio interface (`arequest`, `call_async`, `run`) backed by a thread pool, so
+  independent calls for one request can be awaited concurrently without a new dependency
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.config import Config
+
+
+class HttpClient:
+    def __init__(self, pool_maxsize=None, per_host_limit=None, max_workers=None, default_timeout=10):
+        self.pool_maxsize = pool_maxsize if pool_maxsize is not None else Config.HTTP_POOL_MAXSIZE
+        self.per_host_limit = per_host_limit if per_host_limit is not None else Config.HTTP_PER_HOST_CONCURRENCY
+        self.default_timeout = default_timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=self.pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        max_workers = max_workers if max_workers is not None else Config.HTTP_MAX_WORKERS
+        # Leaf HTTP calls and composite tasks (which may fan out leaf calls) use separate
+        # pools, so a task waiting on its own requests can never starve them of threads.
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="http-client")
+        self._task_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="http-client-task")
+        self._host_limits = {}
+        self._host_limits_lock = threading.Lock()
+
+    def _host_limit(self, url):
+        host = urlsplit(url).netloc
+        with self._host_limits_lock:
+            limit = self._host_limits.get(host)
+            if limit is None:
+                limit = threading.BoundedSemaphore(self.per_host_limit)
+                self._host_limits[host] = limit
+            return limit
+
+    # --- blocking interface ---
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.default_timeout)
+        with self._host_limit(url):
+            return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def map_concurrently(self, fn, iterable):
+        """Like map(), but runs the calls on the client's thread pool (results in input order)."""
+        items = list(iterable)
+        if len(items) <= 1:
+            return [fn(item) for item in items]
+        return list(self._executor.map(fn, items))
+
+    # --- asyncio interface ---
+    async def call_async(self, fn, *args, **kwargs):
+        """Await a blocking callable (which may itself issue requests) on the task pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._task_executor, partial(fn, *args, **kwargs))
+
+    async def arequest(self, method, url, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(self.request, method, url, **kwargs))
+
+    async def aget(self, url, **kwargs):
+        return await self.arequest("GET", url, **kwargs)
+
+    async def apost(self, url, **kwargs):
+        return await self.arequest("POST", url, **kwargs)
+
+    @staticmethod
+    def run(coroutine):
+        """Run a coroutine to completion from synchronous code (e.g. a Flask view)."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coroutine)
+        # Already inside an event loop on this thread: run on a separate thread instead
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, coroutine).result()
+
+
+_shared_client = None
+_shared_client_pid = None
+_shared_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """Process-wide shared HttpClient. A forked child builds its own: inherited pool threads do not exist there."""
+    global _shared_client, _shared_client_pid
+    with _shared_client_lock:
+        if _shared_client is None or _shared_client_pid != os.getpid():
+            _shared_client = HttpClient()
+            _shared_client_pid = os.getpid()
+        return _shared_client
@@ -0,0 +1,135 @@
+import numpy as np
+
+
+class PlanDataModel:
+    """
+    Routing data model of one plan request, held in NumPy arrays.
+
+    Location 0 is the user, every other location is a distinct store coordinate, and
+    `location_store` maps a location to the first store found there. Node 0 is the depot
+    (at location 0); every other node is one way to buy one required group, described by
+    the node_* arrays (index into `item_ids` / `store_ids` for items and stores).
+
+    The weight-dependent fields (distance_cost_per_km, distance_scaled, scaled_penalty)
+    are only set on the copies made by SearchService._apply_distance_cost.
+    """
+    __slots__ = (
+        'solver_mode', 'user_loc', 'groups', 'start_address',
+        'locations', 'distance_km', 'distance_source', 'location_store',
+        'store_ids', 'store_addresses', 'item_ids',
+        'node_location', 'node_group', 'node_item', 'node_store', 'node_price', 'node_price_scaled',
+        'task_nodes_for_group', 'presolve',
+        'distance_cost_per_km', 'distance_scaled', 'scaled_penalty',
+    )
+    depot = 0
+    num_vehicles = 1
+
+    def __init__(self, solver_mode, user_loc, groups, locations, location_store, store_ids, store_addresses, item_ids,
+                 node_location, node_group, node_item, node_store, node_price, node_price_scaled,
+                 distance_km=None, start_address=None, distance_source=None):
+        self.solver_mode = solver_mode
+        self.user_loc = user_loc
+        self.groups = groups
+        self.start_address = start_address
+        self.locations = np.asarray(locations, dtype=np.float64).reshape(-1, 2)
+        self.distance_km = distance_km
+        # "matrix" (road network / ORS) hoặc "haversine" (fallback khi không lấy được ma trận)
+        self.distance_source = distance_source
+        self.location_store = np.asarray(location_store, dtype=np.int32)
+        self.store_ids = store_ids
+        self.store_addresses = store_addresses
+        self.item_ids = item_ids
+        self.node_location = np.asarray(node_location, dtype=np.int32)
+        self.node_group = np.asarray(node_group, dtype=np.int32)
+        self.node_item = np.asarray(node_item, dtype=np.int32)
+        self.node_store = np.asarray(node_store, dtype=np.int32)
+        self.node_price = np.asarray(node_price, dtype=np.float64)
+        self.node_price_scaled = np.asarray(node_price_scaled, dtype=np.int64)
+        self.task_nodes_for_group = self._group_nodes()
+        self.presolve = None
+        self.distance_cost_per_km = None
+        self.distance_scaled = None
+        self.scaled_penalty = None
+
+    @property
+    def num_nodes(self):
+        return len(self.node_location)
+
+    @property
+    def num_locations(self):
+        return len(self.locations)
+
+    @property
+    def num_groups(self):
+        return len(self.groups)
+
+    def _group_nodes(self):
+        """Node indices (plain ints, as OR-Tools expects) of each required group."""
+        return [np.flatnonzero(self.node_group == group_idx).tolist() for group_idx in range(len(self.groups))]
+
+    def copy(self, **changes):
+        """Shallow copy; arrays are shared unless replaced through `changes`."""
+        clone = PlanDataModel.__new__(PlanDataModel)
+        for name in self.__slots__:
+            setattr(clone, name, changes[name] if name in changes else getattr(self, name))
+        return clone
+
+    def select_nodes(self, nodes):
+        """Copy keeping the depot and `nodes`, renumbered 1..len(nodes) in the given order."""
+        keep = np.concatenate(([self.depot], np.asarray(nodes, dtype=np.int64)))
+        clone = self.copy(
+            node_location=self.node_location[keep],
+            node_group=self.node_group[keep],
+            node_item=self.node_item[keep],
+            node_store=self.node_store[keep],
+            node_price=self.node_price[keep],
+            node_price_scaled=self.node_price_scaled[keep],
+        )
+        clone.task_nodes_for_group = clone._group_nodes()
+        return clone
+
+    def cheapest_nodes(self):
+        """
+        (num_locations x num_groups) arrays with the cheapest scaled price and the node
+        offering it at each location, np.inf / -1 where the location does not sell the group.
+        Ties go to the lowest node index.
+        """
+        prices = np.full((self.num_locations, self.num_groups), np.inf)
+        nodes = np.full((self.num_locations, self.num_groups), -1, dtype=np.int64)
+        task_nodes = np.arange(1, self.num_nodes)
+        if len(task_nodes):
+            keys = self.node_location[task_nodes].astype(np.int64) * self.num_groups + self.node_group[task_nodes]
+            order = np.lexsort((task_nodes, self.node_price_scaled[task_nodes], keys))
+            _, first = np.unique(keys[order], return_index=True)
+            best = task_nodes[order[first]]
+            prices[self.node_location[best], self.node_group[best]] = self.node_price_scaled[best]
+            nodes[self.node_location[best], self.node_group[best]] = best
+        return prices, nodes
+
+    def candidate_locations(self):
+        """Location indices (excluding the user location) that carry at least one task node."""
+        return np.unique(self.node_location[1:]).tolist()
+
+    def node_detail(self, node):
+        store = self.node_store[node]
+        return {
+            'item_id': self.item_ids[self.node_item[node]],
+            'store_id': self.store_ids[store],
+            'store_address': self.store_addresses[store],
+            'price_original': float(self.node_price[node]),
+            'location_idx': int(self.node_location[node]),
+            'group_idx': int(self.node_group[node]),
+        }
+
+    def location_address(self, location_idx):
+        if location_idx == 0:
+            return self.start_address or "User Location"
+        if 0 < location_idx < self.num_locations and self.location_store[location_idx] >= 0:
+            return self.store_addresses[self.location_store[location_idx]]
+        return f"Unknown Location (Index {location_idx})"
+
+    def location_coordinates(self, location_idx):
+        if 0 <= location_idx < self.num_locations:
+            lat, lng = self.locations[location_idx]
+            return {'lat': float(lat), 'lng': float(lng)}
+        return {'lat': None, 'lng': None}
@@ -1,4 +1,4 @@
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Tuple, Any, Literal, Optional
 from pydantic import BaseModel, Field
 
 
@@ -45,3 +45,20 @@ class PlanStoreModel(BaseModel):
 class PlanRequestModel(BaseModel):
     stores: List[PlanStoreModel] = Field(..., description="List of stores from /search/nearby")
     user_loc: Tuple[float, float] = Field(..., description="User location")
+    mode: Literal["weights", "pareto"] = Field(
+        "weights", description="'weights': fixed distance weights, 'pareto': non-dominated price/distance plans"
+    )
+    max_plans: Optional[int] = Field(None, gt=0, le=10, description="Maximum number of Pareto plans")
+    latency_budget_seconds: Optional[float] = Field(
+        None, gt=0, le=60, description="Maximum solving time for the whole request, in seconds"
+    )
+
+
+class PlanReplanRequestModel(BaseModel):
+    session_id: str = Field(..., description="session_id of an earlier /search/plans answer")
+    add_products: List[str] = Field(default_factory=list, description="Product names to add; offers come in add_stores")
+    remove_products: List[str] = Field(default_factory=list, description="Product names to remove")
+    add_stores: List[PlanStoreModel] = Field(
+        default_factory=list, description="New stores, or item entries replacing those of an existing address"
+    )
+    remove_stores: List[str] = Field(default_factory=list, description="Addresses of stores to remove")
@@ -0,0 +1,373 @@
+"""
+In-process road distances on a local road graph, preprocessed with contraction
+hierarchies (CH).
+
+The graph is read from a CSV edge list, e.g. exported from OpenStreetMap with osmnx, with
+the header `u,v,u_lat,u_lng,v_lat,v_lng,length_m` and an optional `oneway` column
+(true/false/1/0; two-way by default). Contraction is done once, by
+`scripts/build_road_network.py`, and saved next to the edge list as `<path>.ch.npz`;
+request handlers only load that file.
+
+Many-to-many matrices use the CH bucket algorithm: one backward upward search per
+target fills per-node buckets, one forward upward search per source scans them. Every
+location is snapped to its nearest graph node, and the straight-line access legs are
+added at both ends.
+"""
+import csv
+import heapq
+import logging
+import math
+import os
+import threading
+
+import numpy as np
+
+from src.config import Config
+from src.geodesic import haversine_matrix, haversine_to_point
+
+logger = logging.getLogger(__name__)
+
+_TRUE_VALUES = {"1", "true", "yes", "y", "t"}
+
+
+class RoadNetwork:
+    # Snapping grid cell, in degrees (~1.1 km)
+    SNAP_CELL_DEG = 0.01
+    # Witness searches stop after this many settled nodes; a missed witness only adds a
+    # redundant shortcut, never a wrong distance
+    WITNESS_SETTLE_LIMIT = 60
+
+    def __init__(self, node_coords, rank, fwd_indptr, fwd_indices, fwd_weights, bwd_indptr, bwd_indices, bwd_weights,
+                 max_snap_km=None):
+        self.node_coords = np.asarray(node_coords, dtype=np.float64).reshape(-1, 2)
+        self.rank = np.asarray(rank, dtype=np.int64)
+        self.fwd_indptr = np.asarray(fwd_indptr, dtype=np.int64)
+        self.fwd_indices = np.asarray(fwd_indices, dtype=np.int64)
+        self.fwd_weights = np.asarray(fwd_weights, dtype=np.float64)
+        self.bwd_indptr = np.asarray(bwd_indptr, dtype=np.int64)
+        self.bwd_indices = np.asarray(bwd_indices, dtype=np.int64)
+        self.bwd_weights = np.asarray(bwd_weights, dtype=np.float64)
+        self.max_snap_km = max_snap_km if max_snap_km is not None else Config.ROAD_NETWORK_MAX_SNAP_KM
+        # Searches run in plain Python, which is much faster on lists than on array items
+        self._fwd = (self.fwd_indptr.tolist(), self.fwd_indices.tolist(), self.fwd_weights.tolist())
+        self._bwd = (self.bwd_indptr.tolist(), self.bwd_indices.tolist(), self.bwd_weights.tolist())
+        self._build_snap_index()
+
+    @property
+    def num_nodes(self):
+        return len(self.node_coords)
+
+    # --- loading ---
+    @staticmethod
+    def hierarchy_path(path):
+        return f"{path}.ch.npz"
+
+    @classmethod
+    def load(cls, path, build=False, max_snap_km=None):
+        """
+        Load the contracted network of the edge list at `path`. With `build=True` the
+        hierarchy is (re)built when it is missing or older than the edge list; otherwise
+        a missing hierarchy raises FileNotFoundError.
+        """
+        ch_path = cls.hierarchy_path(path)
+        stale = not os.path.exists(ch_path) or (
+            os.path.exists(path) and os.path.getmtime(path) > os.path.getmtime(ch_path))
+        if stale:
+            if not build:
+                raise FileNotFoundError(f"No up-to-date contraction hierarchy at {ch_path}, run scripts/build_road_network.py")
+            network = cls.from_edge_list(path, max_snap_km=max_snap_km)
+            network.save(ch_path)
+            return network
+        with np.load(ch_path) as data:
+            return cls(**{name: data[name] for name in data.files}, max_snap_km=max_snap_km)
+
+    def save(self, ch_path):
+        tmp_path = f"{ch_path}.tmp.npz"
+        np.savez(
+            tmp_path, node_coords=self.node_coords, rank=self.rank,
+            fwd_indptr=self.fwd_indptr, fwd_indices=self.fwd_indices, fwd_weights=self.fwd_weights,
+            bwd_indptr=self.bwd_indptr, bwd_indices=self.bwd_indices, bwd_weights=self.bwd_weights,
+        )
+        os.replace(tmp_path, ch_path)
+
+    @classmethod
+    def from_edge_list(cls, path, max_snap_km=None):
+        node_index, node_coords = {}, []
+        tails, heads, lengths = [], [], []
+
+        def node(node_id, lat, lng):
+            idx = node_index.get(node_id)
+            if idx is None:
+                idx = node_index[node_id] = len(node_coords)
+                node_coords.append((float(lat), float(lng)))
+            return idx
+
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                u = node(row["u"], row["u_lat"], row["u_lng"])
+                v = node(row["v"], row["v_lat"], row["v_lng"])
+                length_km = float(row["length_m"]) / 1000.0
+                tails.append(u)
+                heads.append(v)
+                lengths.append(length_km)
+                if str(row.get("oneway") or "").strip().lower() not in _TRUE_VALUES:
+                    tails.append(v)
+                    heads.append(u)
+                    lengths.append(length_km)
+        logger.info(f"Road network {path}: {len(node_coords)} nodes, {len(tails)} directed edges.")
+        return cls.from_edges(node_coords, tails, heads, lengths, max_snap_km=max_snap_km)
+
+    @classmethod
+    def from_edges(cls, node_coords, tails, heads, lengths_km, max_snap_km=None):
+        """Contract a directed graph given as parallel edge arrays (lengths in km)."""
+        num_nodes = len(node_coords)
+        out_adj = [dict() for _ in range(num_nodes)]
+        in_adj = [dict() for _ in range(num_nodes)]
+        for u, v, length in zip(tails, heads, lengths_km):
+            if u == v:
+                continue
+            if length < out_adj[u].get(v, math.inf):
+                out_adj[u][v] = length
+                in_adj[v][u] = length
+
+        rank = cls._contract(num_nodes, out_adj, in_adj)
+        fwd = cls._upward_csr(num_nodes, out_adj, rank)
+        bwd = cls._upward_csr(num_nodes, in_adj, rank)
+        return cls(node_coords, rank, *fwd, *bwd, max_snap_km=max_snap_km)
+
+    # --- contraction ---
+    @classmethod
+    def _witness_distances(cls, source, excluded, max_distance, out_adj, contracted):
+        """Bounded Dijkstra from `source` over uncontracted nodes, avoiding `excluded`."""
+        dist = {source: 0.0}
+        heap = [(0.0, source)]
+        settled = 0
+        while heap:
+            d, x = heapq.heappop(heap)
+            if d > dist[x]:
+                continue
+            if d > max_distance or settled >= cls.WITNESS_SETTLE_LIMIT:
+                break
+            settled += 1
+            for y, w in out_adj[x].items():
+                if y == excluded or contracted[y]:
+                    continue
+                nd = d + w
+                if nd < dist.get(y, math.inf):
+                    dist[y] = nd
+                    heapq.heappush(heap, (nd, y))
+        return dist
+
+    @classmethod
+    def _shortcuts(cls, v, out_adj, in_adj, contracted):
+        """Shortcuts (u, w, length) needed to contract v, and v's remaining degree."""
+        ins = [(u, a) for u, a in in_adj[v].items() if not contracted[u]]
+        outs = [(w, b) for w, b in out_adj[v].items() if not contracted[w]]
+        shortcuts = []
+        if ins and outs:
+            max_out = max(b for _, b in outs)
+            for u, a in ins:
+                witness = cls._witness_distances(u, v, a + max_out, out_adj, contracted)
+                for w, b in outs:
+                    if w != u and witness.get(w, math.inf) > a + b:
+                        shortcuts.append((u, w, a + b))
+        return shortcuts, len(ins) + len(outs)
+
+    @classmethod
+    def _contract(cls, num_nodes, out_adj, in_adj):
+        """
+        Contract every node in order of edge difference plus contracted neighbours, with
+        lazy priority updates. Shortcuts are added to the adjacency dicts in place.
+        Returns the rank (contraction order) of every node.
+        """
+        contracted = [False] * num_nodes
+        deleted_neighbors = [0] * num_nodes
+
+        def priority(v):
+            shortcuts, degree = cls._shortcuts(v, out_adj, in_adj, contracted)
+            return len(shortcuts) - degree + deleted_neighbors[v], shortcuts
+
+        heap = [(priority(v)[0], v) for v in range(num_nodes)]
+        heapq.heapify(heap)
+        rank = [0] * num_nodes
+        order = 0
+        while heap:
+            _, v = heapq.heappop(heap)
+            if contracted[v]:
+                continue
+            current, shortcuts = priority(v)
+            if heap and current > heap[0][0]:
+                heapq.heappush(heap, (current, v))
+                continue
+            for u, w, length in shortcuts:
+                if length < out_adj[u].get(w, math.inf):
+                    out_adj[u][w] = length
+                    in_adj[w][u] = length
+            contracted[v] = True
+            rank[v] = order
+            order += 1
+            for x in set(out_adj[v]) | set(in_adj[v]):
+                if not contracted[x]:
+                    deleted_neighbors[x] += 1
+        return rank
+
+    @staticmethod
+    def _upward_csr(num_nodes, adjacency, rank):
+        """CSR arrays of the edges of `adjacency` that lead to a higher-ranked node."""
+        indptr = [0]
+        indices, weights = [], []
+        for u in range(num_nodes):
+            for w, length in adjacency[u].items():
+                if rank[w] > rank[u]:
+                    indices.append(w)
+                    weights.append(length)
+            indptr.append(len(indices))
+        return indptr, indices, weights
+
+    # --- queries ---
+    @staticmethod
+    def _upward_search(node, graph, reverse_graph):
+        """
+        Dijkstra from `node` over upward edges, with stall-on-demand: a node reachable
+        more cheaply through a higher neighbour (an upward edge of `reverse_graph`) is not
+        expanded nor returned, as no shortest path peaks there.
+        Returns (nodes, distances) arrays.
+        """
+        indptr, indices, weights = graph
+        rev_indptr, rev_indices, rev_weights = reverse_graph
+        dist = {node: 0.0}
+        done = set()
+        settled_nodes, settled_dists = [], []
+        heap = [(0.0, node)]
+        while heap:
+            d, x = heapq.heappop(heap)
+            if x in done:
+                continue
+            done.add(x)
+            stalled = False
+            for k in range(rev_indptr[x], rev_indptr[x + 1]):
+                if dist.get(rev_indices[k], math.inf) + rev_weights[k] < d:
+                    stalled = True
+                    break
+            if stalled:
+                continue
+            settled_nodes.append(x)
+            settled_dists.append(d)
+            for k in range(indptr[x], indptr[x + 1]):
+                y = indices[k]
+                nd = d + weights[k]
+                if nd < dist.get(y, math.inf):
+                    dist[y] = nd
+                    heapq.heappush(heap, (nd, y))
+        return np.asarray(settled_nodes, dtype=np.int64), np.asarray(settled_dists, dtype=np.float64)
+
+    def node_distances(self, sources, targets):
+        """len(sources) x len(targets) shortest-path distances (km) between graph nodes, inf when unreachable."""
+        matrix = np.full((len(sources), len(targets)), np.inf)
+        if not len(sources) or not len(targets):
+            return matrix
+        # Buckets: every (node, target, distance) of the backward searches, sorted by node
+        bucket_nodes, bucket_targets, bucket_dists = [], [], []
+        for j, target in enumerate(targets):
+            nodes, dists = self._upward_search(int(target), self._bwd, self._fwd)
+            bucket_nodes.append(nodes)
+            bucket_targets.append(np.full(len(nodes), j, dtype=np.int64))
+            bucket_dists.append(dists)
+        bucket_nodes = np.concatenate(bucket_nodes)
+        order = np.argsort(bucket_nodes, kind="stable")
+        bucket_nodes = bucket_nodes[order]
+        bucket_targets = np.concatenate(bucket_targets)[order]
+        bucket_dists = np.concatenate(bucket_dists)[order]
+
+        for i, source in enumerate(sources):
+            nodes, dists = self._upward_search(int(source), self._fwd, self._bwd)
+            starts = np.searchsorted(bucket_nodes, nodes, side="left")
+            counts = np.searchsorted(bucket_nodes, nodes, side="right") - starts
+            hits = counts > 0
+            if not hits.any():
+                continue
+            starts, counts, dists = starts[hits], counts[hits], dists[hits]
+            # Positions of every bucket entry of every meeting node
+            offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            np.minimum.at(matrix[i], bucket_targets[offsets], np.repeat(dists, counts) + bucket_dists[offsets])
+        return matrix
+
+    def _build_snap_index(self):
+        cells = np.floor(self.node_coords / self.SNAP_CELL_DEG).astype(np.int64)
+        self._snap_order = np.lexsort((cells[:, 1], cells[:, 0]))
+        sorted_cells = cells[self._snap_order]
+        keys, starts, counts = np.unique(sorted_cells, axis=0, return_index=True, return_counts=True)
+        self._snap_cells = {(int(a), int(b)): (int(s), int(s + c)) for (a, b), s, c in zip(keys, starts, counts)}
+
+    def snap(self, locations):
+        """
+        Nearest graph node and its straight-line distance (km) for each (lat, lng).
+        Raises ValueError when a location is farther than max_snap_km from the network.
+        """
+        nodes, offsets = [], []
+        for lat, lng in locations:
+            lng_cell_km = self.SNAP_CELL_DEG * 111.32 * max(0.1, math.cos(math.radians(lat)))
+            reach = max(1, math.ceil(self.max_snap_km / lng_cell_km))
+            cell_lat, cell_lng = math.floor(lat / self.SNAP_CELL_DEG), math.floor(lng / self.SNAP_CELL_DEG)
+            candidates = [
+                self._snap_order[start:end]
+                for dlat in range(-reach, reach + 1)
+                for dlng in range(-reach, reach + 1)
+                for start, end in [self._snap_cells.get((cell_lat + dlat, cell_lng + dlng), (0, 0))]
+                if end > start
+            ]
+            if not candidates:
+                raise ValueError(f"({lat}, {lng}) is more than {self.max_snap_km} km from the road network")
+            candidates = np.concatenate(candidates)
+            distances = haversine_to_point(lat, lng, self.node_coords[candidates])
+            best = int(np.argmin(distances))
+            if distances[best] > self.max_snap_km:
+                raise ValueError(f"({lat}, {lng}) is more than {self.max_snap_km} km from the road network")
+            nodes.append(int(candidates[best]))
+            offsets.append(float(distances[best]))
+        return np.asarray(nodes, dtype=np.int64), np.asarray(offsets)
+
+    def distance_matrix(self, locations):
+        """
+        Road distance matrix (km) for a list of (lat, lng) tuples, same contract as
+        SearchService._get_distance_matrix_ors: rows and columns follow `locations`.
+        Locations snapped to the same node are apart by their straight-line distance.
+        """
+        nodes, offsets = self.snap(locations)
+        unique_nodes, inverse = np.unique(nodes, return_inverse=True)
+        node_matrix = self.node_distances(unique_nodes, unique_nodes)
+        matrix = offsets[:, None] + node_matrix[np.ix_(inverse, inverse)] + offsets[None, :]
+        same_node = nodes[:, None] == nodes[None, :]
+        if same_node.any():
+            matrix = np.where(same_node, haversine_matrix(locations), matrix)
+        np.fill_diagonal(matrix, 0.0)
+        return matrix
+
+
+_shared_network = None
+_shared_network_key = None
+_shared_network_lock = threading.Lock()
+
+
+def get_road_network():
+    """
+    Process-wide RoadNetwork for Config.ROAD_NETWORK_PATH, or None when it is not
+    configured or its hierarchy cannot be loaded (the failure is logged once per file
+    version, and retried when the file changes).
+    """
+    global _shared_network, _shared_network_key
+    path = Config.ROAD_NETWORK_PATH
+    if not path:
+        return None
+    ch_path = RoadNetwork.hierarchy_path(path)
+    key = (path, os.path.getmtime(ch_path) if os.path.exists(ch_path) else None)
+    with _shared_network_lock:
+        if key != _shared_network_key:
+            _shared_network_key = key
+            try:
+                _shared_network = RoadNetwork.load(path)
+                logger.info(f"Loaded road network with {_shared_network.num_nodes} nodes from {ch_path}.")
+            except Exception as e:
+                logger.error(f"Road network unavailable: {e}")
+                _shared_network = None
+        return _shared_network
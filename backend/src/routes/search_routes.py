@@ -11,6 +11,36 @@ search_controller = SearchController()
 def get_plans_route():
     return search_controller.get_plans(request)
 
+# POST /search/plans/replan
+@search_bp.route("/plans/replan", methods=["POST"])
+@token_required
+def replan_route():
+    return search_controller.replan(request)
+
+# GET /search/plans/metrics
+@search_bp.route("/plans/metrics", methods=["GET"])
+@token_required
+def get_solver_metrics_route():
+    return search_controller.get_solver_metrics()
+
+# POST /search/plans/jobs
+@search_bp.route("/plans/jobs", methods=["POST"])
+@token_required
+def submit_plan_job_route():
+    return search_controller.submit_plan_job(request)
+
+# GET /search/plans/jobs/<job_id>?since=<n>
+@search_bp.route("/plans/jobs/<string:job_id>", methods=["GET"])
+@token_required
+def get_plan_job_route(job_id):
+    return search_controller.get_plan_job(request, job_id)
+
+# GET /search/plans/jobs/<job_id>/events (Server-Sent Events)
+@search_bp.route("/plans/jobs/<string:job_id>/events", methods=["GET"])
+@token_required
+def stream_plan_job_route(job_id):
+    return search_controller.stream_plan_job(job_id)
+
 # POST /search/nearby
 @search_bp.route("/nearby", methods=["POST"])
 @token_required
@@ -3,6 +3,8 @@ from src.controllers.store_controller import StoreController
 from src.utils import batched
 from tqdm import tqdm
 from src.models.store_model import Store
+from src.config import Config
+from src.services.store_distance_table import schedule_store_distance_table_update
 import traceback
 
 store_routes = Blueprint("store", __name__, url_prefix="/store")
@@ -39,6 +41,10 @@ def insert_stores():
             results.append(f"Batch failed: {failed}")
         else:
             results.append(failed)
+    if Config.STORE_DISTANCE_TABLE_PATH and Config.STORE_DISTANCE_TABLE_AUTO_UPDATE:
+        # Chỉ tính thêm hàng/cột cho các cửa hàng mới, chạy nền để không chặn request;
+        # các lần insert trong lúc đang cập nhật được gộp thành một lần cập nhật sau đó
+        schedule_store_distance_table_update()
     return jsonify({"message": f"{results}"}), 200
 
 @store_routes.route("/<string:name>", methods=["GET"])
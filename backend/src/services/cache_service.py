@@ -0,0 +1,151 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from src.services.redis_service import RedisService
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with an optional per-entry TTL."""
+
+    def __init__(self, maxsize=10000, ttl_seconds=None):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expired(self, expires_at):
+        return expires_at is not None and expires_at < time.monotonic()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if self._expired(expires_at):
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def get_many(self, keys):
+        """Return a dict with the keys that are present (and not expired)."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None:
+                    continue
+                value, expires_at = entry
+                if self._expired(expires_at):
+                    del self._data[key]
+                    continue
+                self._data.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def set_many(self, mapping):
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            for key, value in mapping.items():
+                self._data[key] = (value, expires_at)
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TieredCache:
+    """
+    Two-tier key/value cache: an in-process LRU in front of Redis.
+    Values are stored in Redis as JSON under `<namespace>:<key>`. When Redis is unreachable
+    the cache keeps working from the local tier and retries Redis after `redis_retry_seconds`.
+    """
+
+    def __init__(self, namespace, redis_service=None, maxsize=10000, ttl_seconds=None, local_ttl_seconds=None,
+                 redis_retry_seconds=30):
+        self.namespace = namespace
+        self.redis_service = redis_service if redis_service else RedisService()
+        self.ttl_seconds = ttl_seconds
+        self.local = LRUCache(maxsize=maxsize, ttl_seconds=local_ttl_seconds if local_ttl_seconds is not None else ttl_seconds)
+        self.redis_retry_seconds = redis_retry_seconds
+        self._redis_disabled_until = 0.0
+
+    def _redis_key(self, key):
+        return f"{self.namespace}:{key}"
+
+    def _redis_available(self):
+        return time.monotonic() >= self._redis_disabled_until
+
+    def _redis_failed(self, e):
+        logger.warning(f"TieredCache[{self.namespace}]: Redis unavailable, using local tier only for {self.redis_retry_seconds}s: {e}")
+        self._redis_disabled_until = time.monotonic() + self.redis_retry_seconds
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys):
+        keys = list(keys)
+        found = self.local.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if missing and self._redis_available():
+            try:
+                raw_values = self.redis_service.client.mget([self._redis_key(key) for key in missing])
+            except Exception as e:
+                self._redis_failed(e)
+                return found
+            from_redis = {}
+            for key, raw in zip(missing, raw_values):
+                if raw is None:
+                    continue
+                try:
+                    from_redis[key] = json.loads(raw)
+                except (TypeError, ValueError):
+                    continue
+            if from_redis:
+                self.local.set_many(from_redis)
+                found.update(from_redis)
+        return found
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def set_many(self, mapping):
+        if not mapping:
+            return
+        self.local.set_many(mapping)
+        if not self._redis_available():
+            return
+        try:
+            pipe = self.redis_service.client.pipeline(transaction=False)
+            for key, value in mapping.items():
+                pipe.set(self._redis_key(key), json.dumps(value, default=str), ex=self.ttl_seconds)
+            pipe.execute()
+        except Exception as e:
+            self._redis_failed(e)
+
+    def delete(self, key):
+        self.local.delete(key)
+        if self._redis_available():
+            try:
+                self.redis_service.client.delete(self._redis_key(key))
+            except Exception as e:
+                self._redis_failed(e)
@@ -0,0 +1,130 @@
+import logging
+
+from src.config import Config
+from src.services.cache_service import TieredCache
+
+logger = logging.getLogger(__name__)
+
+
+class DistanceCacheService:
+    """
+    Pairwise road-distance store (km) in front of a matrix API such as OpenRouteService.
+    Pairs are directed and keyed by coordinates rounded to `precision` decimals, so
+    repeat neighbourhoods are answered from the in-process LRU or Redis without any
+    API call. Only the rows and columns of locations with missing pairs are fetched.
+    """
+
+    def __init__(self, redis_service=None, precision=None, maxsize=None, ttl_seconds=None, max_routes_per_request=None):
+        self.precision = precision if precision is not None else Config.DISTANCE_CACHE_PRECISION
+        self.max_routes_per_request = max_routes_per_request if max_routes_per_request is not None else Config.ORS_MATRIX_MAX_ROUTES
+        self.cache = TieredCache(
+            namespace="road_dist:v1",
+            redis_service=redis_service,
+            maxsize=maxsize if maxsize is not None else Config.DISTANCE_CACHE_LRU_SIZE,
+            ttl_seconds=ttl_seconds if ttl_seconds is not None else Config.DISTANCE_CACHE_TTL_SECONDS
+        )
+
+    def point_key(self, location):
+        lat, lng = location
+        return f"{round(float(lat), self.precision)},{round(float(lng), self.precision)}"
+
+    def pair_key(self, from_location, to_location):
+        return f"{self.point_key(from_location)}|{self.point_key(to_location)}"
+
+    def get_matrix(self, locations, fetch_matrix, only_indices=None, map_fn=None):
+        """
+        Return the full distance matrix (km, list of lists) for `locations`.
+
+        `fetch_matrix(locations, sources, destinations)` must return the sub-matrix for the
+        given source/destination indices of `locations` (rows follow `sources`). It is only
+        called for pairs missing from the cache, in chunks of at most
+        `max_routes_per_request` source x destination pairs.
+
+        If `only_indices` is given, only pairs with at least one end in it are resolved and
+        the other entries are left at 0 for the caller to fill. `map_fn(fn, chunks)` may be
+        given to fetch the chunks concurrently (defaults to sequential map).
+        """
+        n = len(locations)
+        point_keys = [self.point_key(loc) for loc in locations]
+        only = set(only_indices) if only_indices is not None else None
+        pair_keys = {}
+        for i in range(n):
+            for j in range(n):
+                if point_keys[i] == point_keys[j]:
+                    continue
+                if only is not None and i not in only and j not in only:
+                    continue
+                pair_keys[(i, j)] = f"{point_keys[i]}|{point_keys[j]}"
+
+        cached = self.cache.get_many(set(pair_keys.values()))
+        matrix = [[0.0] * n for _ in range(n)]
+        missing = []
+        for (i, j), key in pair_keys.items():
+            value = cached.get(key)
+            if value is None:
+                missing.append((i, j))
+            else:
+                matrix[i][j] = float(value)
+
+        if not missing:
+            logger.info(f"Distance cache: all {len(pair_keys)} pairs served from cache.")
+            return matrix
+
+        blocks = self._plan_fetch(missing, n, only)
+        logger.info(
+            f"Distance cache: {len(missing)}/{len(pair_keys)} pairs missing, "
+            f"fetching {sum(len(src) * len(dst) for src, dst in blocks)} routes."
+        )
+
+        fetched = {}
+        chunks = [chunk for sources, destinations in blocks for chunk in self.chunk_routes(sources, destinations)]
+        sub_matrices = list((map_fn or map)(lambda chunk: fetch_matrix(locations, *chunk), chunks))
+        for (chunk_sources, chunk_destinations), sub_matrix in zip(chunks, sub_matrices):
+            for r, i in enumerate(chunk_sources):
+                for c, j in enumerate(chunk_destinations):
+                    key = pair_keys.get((i, j))
+                    if key is None:
+                        continue
+                    value = sub_matrix[r][c]
+                    if value is None:
+                        raise Exception(f"Matrix API returned no route between locations {i} and {j}")
+                    matrix[i][j] = float(value)
+                    fetched[key] = float(value)
+
+        self.cache.set_many(fetched)
+        return matrix
+
+    @staticmethod
+    def _plan_fetch(missing, n, only=None):
+        """
+        Choose which rows and columns to fetch. Missing pairs usually come from a few new
+        locations, so greedily pick the locations touching the most missing pairs and fetch
+        their rows and columns; fall back to the full matrix when that is not cheaper.
+        """
+        all_indices = list(range(n))
+        if only is None and len(missing) * 2 > n * n:
+            return [(all_indices, all_indices)]
+        incident = {}
+        for i, j in missing:
+            incident.setdefault(i, set()).add((i, j))
+            incident.setdefault(j, set()).add((i, j))
+        uncovered = set(missing)
+        hot = []
+        while uncovered:
+            best = max(incident, key=lambda idx: len(incident[idx] & uncovered))
+            hot.append(best)
+            uncovered -= incident.pop(best)
+        if only is None and 2 * len(hot) >= n:
+            return [(all_indices, all_indices)]
+        hot_set = set(hot)
+        others = [idx for idx in all_indices if idx not in hot_set]
+        return [(sorted(hot), all_indices), (others, sorted(hot))]
+
+    def chunk_routes(self, sources, destinations):
+        """Split sources x destinations into blocks that respect the per-request route limit."""
+        max_routes = max(1, self.max_routes_per_request)
+        dest_chunk_size = min(len(destinations), max_routes)
+        src_chunk_size = max(1, max_routes // dest_chunk_size)
+        for d in range(0, len(destinations), dest_chunk_size):
+            for s in range(0, len(sources), src_chunk_size):
+                yield sources[s:s + src_chunk_size], destinations[d:d + dest_chunk_size]
@@ -0,0 +1,84 @@
+import copy
+import hashlib
+import json
+import logging
+import time
+
+from src.config import Config
+from src.services.cache_service import TieredCache
+from src.services.redis_service import RedisService
+
+logger = logging.getLogger(__name__)
+
+
+class PlanCacheService:
+    """
+    Cache of solved plan lists, in process memory and Redis, keyed by a hash of the
+    canonical solver input (stores, item groups, rounded user location, solver settings).
+
+    Every key embeds the current catalog version, a Redis counter bumped whenever
+    product prices may have changed, so one INCR invalidates all cached plans at once.
+    The version is re-read from Redis at most every `version_check_seconds`.
+    """
+    VERSION_KEY = "plan:catalog_version"
+
+    def __init__(self, redis_service=None, maxsize=None, ttl_seconds=None, location_precision=None,
+                 version_check_seconds=None):
+        self.redis_service = redis_service if redis_service else RedisService()
+        self.location_precision = location_precision if location_precision is not None else Config.PLAN_CACHE_LOCATION_PRECISION
+        self.version_check_seconds = version_check_seconds if version_check_seconds is not None else Config.PLAN_CACHE_VERSION_CHECK_SECONDS
+        self.cache = TieredCache(
+            namespace="plan:v1",
+            redis_service=self.redis_service,
+            maxsize=maxsize if maxsize is not None else Config.PLAN_CACHE_LRU_SIZE,
+            ttl_seconds=ttl_seconds if ttl_seconds is not None else Config.PLAN_CACHE_TTL_SECONDS
+        )
+        self._version = 0
+        self._version_checked_at = None
+
+    def catalog_version(self):
+        now = time.monotonic()
+        if self._version_checked_at is None or now - self._version_checked_at >= self.version_check_seconds:
+            try:
+                self._version = int(self.redis_service.client.get(self.VERSION_KEY) or 0)
+            except Exception as e:
+                logger.warning(f"PlanCache: could not read catalog version, keeping {self._version}: {e}")
+            self._version_checked_at = now
+        return self._version
+
+    def bump_catalog_version(self):
+        """Invalidate every cached plan (call after product prices change)."""
+        try:
+            self._version = int(self.redis_service.client.incr(self.VERSION_KEY))
+        except Exception as e:
+            logger.warning(f"PlanCache: could not bump catalog version in Redis, bumping locally: {e}")
+            self._version += 1
+        self._version_checked_at = time.monotonic()
+        logger.info(f"PlanCache: catalog version is now {self._version}.")
+        return self._version
+
+    def make_key(self, stores_for_search, required_item_groups, user_loc, solver_params):
+        """
+        Hash of the solver input that does not depend on dict or set ordering. The order of
+        the groups is kept: group indices appear in the plan output.
+        """
+        canonical = {
+            'stores': sorted(
+                [address, store['lat'], store['lng'], sorted(store['items'].items())]
+                for address, store in stores_for_search.items()
+            ),
+            'groups': [sorted(group) for group in required_item_groups],
+            'user_loc': [round(float(user_loc['lat']), self.location_precision),
+                         round(float(user_loc['lng']), self.location_precision)],
+            'params': solver_params,
+        }
+        digest = hashlib.sha256(json.dumps(canonical, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+        return f"{self.catalog_version()}:{digest}"
+
+    def get(self, key):
+        plans = self.cache.get(key)
+        # The local tier hands out the stored object, callers get their own copy
+        return copy.deepcopy(plans) if plans is not None else None
+
+    def set(self, key, plans):
+        self.cache.set(key, copy.deepcopy(plans))
@@ -0,0 +1,148 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class PlanJobService:
+    """
+    Background execution of plan requests. `submit` returns a job id at once; a bounded
+    thread pool runs SearchService.get_plans_from_nearby and appends every plan to Redis
+    as soon as its solve finishes, so any web worker can serve the job by polling or SSE.
+
+    Redis layout (every key expires after `ttl_seconds`):
+        plan_job:<id>          JSON status: status, user_id, created_at, updated_at, error
+        plan_job:<id>:plans    list of plans in the order they were produced
+        plan_job:<id>:result   JSON list of the final plans (with ids), once the job is done
+
+    Job threads only coordinate: with the "process_pool" execution mode the solves
+    themselves run in the solver processes, so they do not compete with request handling
+    for the GIL.
+    """
+    STATUSES = ("queued", "running", "done", "failed")
+
+    def __init__(self, search_service, redis_service, max_workers=None, max_pending=None, ttl_seconds=None):
+        self.search_service = search_service
+        self.redis_service = redis_service
+        max_workers = max_workers if max_workers is not None else Config.PLAN_JOB_WORKERS
+        max_pending = max_pending if max_pending is not None else Config.PLAN_JOB_MAX_PENDING
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else Config.PLAN_JOB_TTL_SECONDS
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="plan-job")
+        # Running + queued jobs; submit() refuses new jobs once they are all taken
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+
+    @staticmethod
+    def _key(job_id, suffix=None):
+        return f"plan_job:{job_id}:{suffix}" if suffix else f"plan_job:{job_id}"
+
+    def _write_status(self, job_id, status, **fields):
+        job = self._read_status(job_id) or {'job_id': job_id, 'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+        job.update(fields, status=status, updated_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        self.redis_service.client.set(self._key(job_id), json.dumps(job, default=str), ex=self.ttl_seconds)
+
+    def _read_status(self, job_id):
+        raw = self.redis_service.client.get(self._key(job_id))
+        return json.loads(raw) if raw else None
+
+    def submit(self, user_id, stores_list, user_loc, plan_kwargs=None, on_done=None):
+        """
+        Queue a plan request. Returns the job id, or None when the queue is full.
+        `on_done(plans)` is called with the final plans after they are stored.
+        """
+        if not self._slots.acquire(blocking=False):
+            return None
+        job_id = uuid.uuid4().hex
+        try:
+            self._write_status(job_id, "queued", user_id=user_id)
+            future = self._executor.submit(self._run, job_id, stores_list, user_loc, plan_kwargs or {}, on_done)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return job_id
+
+    def _run(self, job_id, stores_list, user_loc, plan_kwargs, on_done):
+        plans_key = self._key(job_id, "plans")
+
+        def on_plan(plan_list):
+            pipe = self.redis_service.client.pipeline(transaction=False)
+            for plan in plan_list:
+                pipe.rpush(plans_key, json.dumps(plan, default=str))
+            pipe.expire(plans_key, self.ttl_seconds)
+            pipe.execute()
+
+        started = time.monotonic()
+        try:
+            self._write_status(job_id, "running")
+            plans = self.search_service.get_plans_from_nearby(stores_list, user_loc, on_plan=on_plan, **plan_kwargs)
+            self.redis_service.client.set(self._key(job_id, "result"), json.dumps(plans, default=str), ex=self.ttl_seconds)
+            self._write_status(job_id, "done", elapsed_seconds=round(time.monotonic() - started, 3))
+        except Exception as e:
+            logger.exception(f"Plan job {job_id} failed")
+            self._write_status(job_id, "failed", error=str(e))
+            return
+        if on_done is not None:
+            try:
+                on_done(plans)
+            except Exception as e:
+                logger.error(f"Plan job {job_id}: on_done callback failed: {e}")
+
+    def get(self, job_id, since=0):
+        """
+        Job status with the plans produced after the first `since` ones (for polling),
+        plus the final `result` once the job is done. None if the job does not exist.
+        """
+        job = self._read_status(job_id)
+        if job is None:
+            return None
+        job['plans'] = [json.loads(raw) for raw in self.redis_service.client.lrange(self._key(job_id, "plans"), since, -1)]
+        job['next'] = since + len(job['plans'])
+        if job['status'] == "done":
+            raw = self.redis_service.client.get(self._key(job_id, "result"))
+            job['result'] = json.loads(raw) if raw else []
+        return job
+
+    def stream(self, job_id, poll_seconds=None, timeout_seconds=None, heartbeat_seconds=15):
+        """
+        Server-Sent Events for a job: one `plan` event per plan, then `done` (final plans)
+        or `error`. After `timeout_seconds` the stream ends with a `timeout` event whose
+        `next` is the `since` to poll get(job_id) from, so a request thread is not held
+        for the whole solve.
+        """
+        poll_seconds = poll_seconds if poll_seconds is not None else Config.PLAN_JOB_POLL_SECONDS
+        timeout_seconds = timeout_seconds if timeout_seconds is not None else Config.PLAN_JOB_STREAM_TIMEOUT_SECONDS
+        deadline = time.monotonic() + timeout_seconds
+        last_sent = time.monotonic()
+        since = 0
+        while time.monotonic() < deadline:
+            job = self.get(job_id, since)
+            if job is None:
+                yield self._event("error", {'error': "Job not found or expired."})
+                return
+            for plan in job['plans']:
+                yield self._event("plan", plan)
+                last_sent = time.monotonic()
+            since = job['next']
+            if job['status'] == "done":
+                yield self._event("done", {'job_id': job_id, 'plans': job['result']})
+                return
+            if job['status'] == "failed":
+                yield self._event("error", {'job_id': job_id, 'error': job.get('error')})
+                return
+            if time.monotonic() - last_sent >= heartbeat_seconds:
+                # SSE comment line, keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            time.sleep(poll_seconds)
+        yield self._event("timeout", {'job_id': job_id, 'status_url': f"/search/plans/jobs/{job_id}", 'next': since})
+
+    @staticmethod
+    def _event(name, data):
+        return f"event: {name}\ndata: {json.dumps(data, default=str)}\n\n"
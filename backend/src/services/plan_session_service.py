@@ -0,0 +1,95 @@
+import copy
+import logging
+
+from src.config import Config
+from src.services.cache_service import LRUCache, TieredCache
+from src.services.redis_service import RedisService
+
+logger = logging.getLogger(__name__)
+
+
+class PlanSessionService:
+    """
+    Plan requests kept for incremental replanning (SearchService.replan), by session id.
+
+    The request itself (the /search/nearby stores, user location, required products and
+    plan options) and the purchases of its plans are JSON in Redis, so any web worker
+    can replan. The base data model, which holds the distance matrix, stays in an
+    in-process LRU of the worker that solved the request; elsewhere it is rebuilt
+    through the distance caches.
+
+    A session is a dict:
+        stores_list     stores in the /search/nearby format
+        user_loc        [lat, lng]
+        product_names   required products, in group order
+        plan_kwargs     plan_mode, max_plans and latency_budget_seconds of the request
+        purchases       {plan id: [[store_id, item_id], ...] in visiting order}
+    """
+
+    def __init__(self, redis_service=None, maxsize=None, ttl_seconds=None):
+        self.redis_service = redis_service if redis_service else RedisService()
+        ttl_seconds = ttl_seconds if ttl_seconds is not None else Config.PLAN_SESSION_TTL_SECONDS
+        self.sessions = TieredCache(
+            namespace="plan_session:v1",
+            redis_service=self.redis_service,
+            maxsize=maxsize if maxsize is not None else Config.PLAN_SESSION_MODEL_LRU_SIZE,
+            ttl_seconds=ttl_seconds
+        )
+        self.models = LRUCache(
+            maxsize=maxsize if maxsize is not None else Config.PLAN_SESSION_MODEL_LRU_SIZE,
+            ttl_seconds=ttl_seconds
+        )
+
+    def get(self, session_id):
+        """(session, base model) for `session_id`; (None, None) once it expired, base model None when not held here."""
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None, None
+        # The local tier hands out the stored object, callers get their own copy
+        return copy.deepcopy(session), self.models.get(session_id)
+
+    def save(self, session_id, session, base_model=None):
+        self.sessions.set(session_id, copy.deepcopy(session))
+        if base_model is not None:
+            self.models.set(session_id, base_model)
+
+    @staticmethod
+    def apply_delta(session, delta):
+        """
+        Session with the edits of `delta` applied (the given session is not modified):
+
+            remove_products  product names no longer required
+            add_products     product names now required; their offers come with the stores
+            remove_stores    store addresses to drop
+            add_stores       stores in the /search/nearby format; an existing address gets
+                             the new coordinates and its item entries replaced per product
+
+        Raises ValueError when no product would be left.
+        """
+        session = copy.deepcopy(session)
+        removed_products = set(delta.get('remove_products') or [])
+        product_names = [name for name in session['product_names'] if name not in removed_products]
+        for name in delta.get('add_products') or []:
+            if name not in product_names:
+                product_names.append(name)
+        if not product_names:
+            raise ValueError("A plan needs at least one product.")
+
+        removed_stores = set(delta.get('remove_stores') or [])
+        stores = {store.get('address'): store for store in session['stores_list'] if store.get('address') not in removed_stores}
+        for new_store in delta.get('add_stores') or []:
+            address = new_store.get('address')
+            store = stores.get(address)
+            if store is None:
+                stores[address] = copy.deepcopy(new_store)
+                continue
+            store['lat'], store['lng'] = new_store.get('lat', store.get('lat')), new_store.get('lng', store.get('lng'))
+            new_items = {item.get('product_name'): item for item in new_store.get('items', [])}
+            store['items'] = [item for item in store.get('items', []) if item.get('product_name') not in new_items]
+            store['items'].extend(copy.deepcopy(list(new_items.values())))
+
+        for store in stores.values():
+            store['items'] = [item for item in store.get('items', []) if item.get('product_name') in product_names]
+        session['product_names'] = product_names
+        session['stores_list'] = list(stores.values())
+        return session
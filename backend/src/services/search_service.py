@@ -1,28 +1,232 @@
+import asyncio
+import copy
 import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
 from ortools.constraint_solver import routing_enums_pb2
 from ortools.constraint_solver import pywrapcp
+from ortools.sat.python import cp_model
 import logging
 import requests
-from typing import Dict, List, Tuple, Set, Optional
+from typing import Callable, Dict, List, Tuple, Set, Optional
 import re 
-from haversine import haversine  # Added import
 from src.config import Config
+from src.geodesic import haversine_matrix
+from src.road_network import get_road_network
+from src.models.plan_data_model import PlanDataModel
+from src.http_client import get_http_client
+from src.services.cache_service import TieredCache
+from src.services.distance_cache_service import DistanceCacheService
+from src.services.plan_cache_service import PlanCacheService
+from src.services.plan_session_service import PlanSessionService
+from src.services.redis_service import RedisService
+from src.services.solver_metrics_service import SolverMetricsService, SolverTelemetry
+from src.services.store_distance_table import StoreDistanceTable
 
 logger = logging.getLogger(__name__)
 
+# Process pool shared by every SearchService in this process. OR-Tools Python callbacks
+# hold the GIL, so parallel weighted solves need processes rather than threads.
+_solver_pool = None
+_solver_pool_lock = threading.Lock()
+
+
+def _get_solver_pool():
+    global _solver_pool
+    with _solver_pool_lock:
+        if _solver_pool is None:
+            # forkserver: workers are forked from a single-threaded server process, never from
+            # a web worker already running request, HTTP client and Redis threads (a fork
+            # there can inherit a lock held by another thread). The server imports this
+            # module once, so workers start without re-importing it.
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload([__name__])
+            _solver_pool = ProcessPoolExecutor(max_workers=Config.SOLVER_POOL_SIZE, mp_context=context)
+            logger.info(f"Solver process pool started with {Config.SOLVER_POOL_SIZE} workers.")
+        return _solver_pool
+
+
+def _reset_solver_pool(terminate=False):
+    """Drop the shared pool; with `terminate`, also kill its workers (a solve overran its deadline)."""
+    global _solver_pool
+    with _solver_pool_lock:
+        if _solver_pool is not None:
+            if terminate:
+                # shutdown() leaves running tasks alone; a stuck solve would hold its worker
+                for process in list((_solver_pool._processes or {}).values()):
+                    process.terminate()
+            _solver_pool.shutdown(wait=False, cancel_futures=True)
+            _solver_pool = None
+
+
+# SearchService of a pool worker per solver settings, built by its first task
+_worker_services = {}
+
+
+def _solve_weight_in_worker(solver_settings, base_model, deadline, distance_cost_per_km, initial_route=None):
+    """
+    Entry point executed in a pool worker; must stay module-level to be picklable. Tasks
+    carry only the base model and SearchService._solver_settings, not the service. The
+    worker's SearchService is solver-only: telemetry comes back in the plans and is
+    recorded by the web process. `deadline` (time.monotonic(), shared by the processes of
+    the host) bounds the solve; a task dequeued after it is not solved.
+    """
+    if time.monotonic() >= deadline:
+        return [SearchService._timeout_plan("Solver deadline passed before the solve started.")]
+    key = tuple(sorted(solver_settings.items()))
+    service = _worker_services.get(key)
+    if service is None:
+        settings = dict(solver_settings)
+        no_improvement_fraction = settings.pop('no_improvement_fraction')
+        service = SearchService(execution_mode="sequential", solver_only=True, **settings)
+        service.no_improvement_fraction = no_improvement_fraction
+        _worker_services[key] = service
+    return service._solve_base_model(base_model, distance_cost_per_km, deadline=deadline, initial_route=initial_route)
+
+
 class SearchService:
     # Parameter to scale distance cost
     DEFAULT_DISTANCE_COST_PER_KM = 500
     DEFAULT_ITEM_PRICE_SCALE_FACTOR = 1
     DEFAULT_TIME_LIMIT_SECONDS = 1
+    # "fixed": time_limit_seconds for every OR-Tools solve
+    # "adaptive": time and solution limits grow with the node count, up to max_time_limit_seconds
+    TIME_BUDGET_POLICIES = ("fixed", "adaptive")
+    DEFAULT_TIME_BUDGET_POLICY = "adaptive"
+    DEFAULT_MAX_TIME_LIMIT_SECONDS = 10
+    MIN_TIME_LIMIT_SECONDS = 0.1
+    TIME_LIMIT_SECONDS_PER_NODE = 0.005
+    SOLUTION_LIMIT_BASE = 100
+    SOLUTION_LIMIT_PER_NODE = 2
+    # Early stop after this share of the time limit without an improving solution
+    NO_IMPROVEMENT_FRACTION = 0.2
+    # Same for replans, whose solves start from the session's routes
+    REPLAN_NO_IMPROVEMENT_FRACTION = 0.05
+    # "matrix": arc and item costs registered as precomputed tables (evaluated in C++)
+    # "callback": Python callbacks, kept for comparison
+    TRANSIT_EVALUATORS = ("matrix", "callback")
+    DEFAULT_TRANSIT_EVALUATOR = "matrix"
+    # "arc": item prices added to the cost of every arc entering their node
+    # "dimension": legacy ItemCost dimension whose global span carries the prices
+    COST_MODELS = ("arc", "dimension")
+    DEFAULT_COST_MODEL = "arc"
     DEFAULT_AVERAGE_SPEED_KMH = 25
-
-    def __init__(self, distance_cost_per_km=None, item_price_scale_factor=None, time_limit_seconds=None, average_speed_kmh=None):
+    # "store": one routing node per (store location, group) carrying the cheapest price there
+    # "item": legacy formulation, one routing node per (store, candidate item)
+    SOLVER_MODES = ("store", "item")
+    DEFAULT_SOLVER_MODE = "store"
+    # "auto": exact DP when the instance has at most exact_max_locations candidate stores,
+    # geographic decomposition from decomposition_min_locations on, OR-Tools in between.
+    # "cp_sat" (multi-worker CP-SAT with a proven bound) is only used when requested.
+    SOLVER_ENGINES = ("auto", "exact_dp", "or_tools", "decomposed", "cp_sat")
+    DEFAULT_SOLVER_ENGINE = "auto"
+    DEFAULT_EXACT_MAX_LOCATIONS = 15
+    # Held-Karp tables take 2^n x n entries (~170 MB of path costs at 20): larger instances
+    # go to OR-Tools even when exact_dp is requested
+    EXACT_HARD_MAX_LOCATIONS = 20
+    DEFAULT_DECOMPOSITION_MIN_LOCATIONS = 150
+    # Decomposition: target candidate locations per k-means cluster, wall time of all
+    # sub-problems of one solve, best sub-routes merged by the polish step and nearest
+    # candidate locations added around each of their stops
+    DECOMPOSITION_CLUSTER_LOCATIONS = 40
+    DEFAULT_DECOMPOSITION_TIME_LIMIT_SECONDS = 2
+    DECOMPOSITION_POLISH_ROUTES = 3
+    DECOMPOSITION_POLISH_NEIGHBORS = 4
+    EXECUTION_MODES = ("sequential", "process_pool")
+    # "weights": one plan per fixed distance weight, "pareto": non-dominated (cost, distance) plans
+    PLAN_MODES = ("weights", "pareto")
+    DISTANCE_COSTS_TO_TRY = [0, 500, 500000]
+    DEFAULT_MAX_PARETO_PLANS = 5
+
+    def __init__(self, distance_cost_per_km=None, item_price_scale_factor=None, time_limit_seconds=None, average_speed_kmh=None, solver_mode=None,
+                 solver_engine=None, exact_max_locations=None, execution_mode=None, distance_cache=None,
+                 store_distance_table=None, geocode_cache=None, redis_service=None, presolve=True,
+                 time_budget_policy=None, max_time_limit_seconds=None, no_improvement_seconds=None, warm_start=True,
+                 plan_cache=None, transit_evaluator=None, decomposition_min_locations=None,
+                 decomposition_time_limit_seconds=None, cp_sat_workers=None, cp_sat_gap_limit=None, cost_model=None,
+                 anytime_plan=True, plan_sessions=None, solver_telemetry=None, solver_metrics=None, solver_only=False):
         self.distance_cost_per_km = distance_cost_per_km if distance_cost_per_km is not None else self.DEFAULT_DISTANCE_COST_PER_KM
         self.item_price_scale_factor = item_price_scale_factor if item_price_scale_factor is not None else self.DEFAULT_ITEM_PRICE_SCALE_FACTOR
         self.time_limit_seconds = time_limit_seconds if time_limit_seconds is not None else self.DEFAULT_TIME_LIMIT_SECONDS
         self.average_speed_kmh = average_speed_kmh if average_speed_kmh is not None else self.DEFAULT_AVERAGE_SPEED_KMH
+        self.solver_mode = solver_mode if solver_mode is not None else self.DEFAULT_SOLVER_MODE
+        if self.solver_mode not in self.SOLVER_MODES:
+            raise ValueError(f"Unknown solver_mode '{self.solver_mode}', expected one of {self.SOLVER_MODES}")
+        self.solver_engine = solver_engine if solver_engine is not None else self.DEFAULT_SOLVER_ENGINE
+        if self.solver_engine not in self.SOLVER_ENGINES:
+            raise ValueError(f"Unknown solver_engine '{self.solver_engine}', expected one of {self.SOLVER_ENGINES}")
+        self.exact_max_locations = min(exact_max_locations if exact_max_locations is not None else self.DEFAULT_EXACT_MAX_LOCATIONS,
+                                       self.EXACT_HARD_MAX_LOCATIONS)
+        self.decomposition_min_locations = decomposition_min_locations if decomposition_min_locations is not None else self.DEFAULT_DECOMPOSITION_MIN_LOCATIONS
+        self.decomposition_time_limit_seconds = decomposition_time_limit_seconds if decomposition_time_limit_seconds is not None else self.DEFAULT_DECOMPOSITION_TIME_LIMIT_SECONDS
+        # 0: one worker per available core
+        self.cp_sat_workers = cp_sat_workers if cp_sat_workers is not None else Config.CP_SAT_NUM_WORKERS
+        if not self.cp_sat_workers:
+            self.cp_sat_workers = os.cpu_count() or 1
+        # CP-SAT stops once (objective - lower bound) / objective is at most this
+        self.cp_sat_gap_limit = cp_sat_gap_limit if cp_sat_gap_limit is not None else Config.CP_SAT_GAP_LIMIT
+        self.execution_mode = execution_mode if execution_mode is not None else Config.SOLVER_EXECUTION_MODE
+        if self.execution_mode not in self.EXECUTION_MODES:
+            raise ValueError(f"Unknown execution_mode '{self.execution_mode}', expected one of {self.EXECUTION_MODES}")
+        self.presolve = presolve
+        self.time_budget_policy = time_budget_policy if time_budget_policy is not None else self.DEFAULT_TIME_BUDGET_POLICY
+        if self.time_budget_policy not in self.TIME_BUDGET_POLICIES:
+            raise ValueError(f"Unknown time_budget_policy '{self.time_budget_policy}', expected one of {self.TIME_BUDGET_POLICIES}")
+        self.max_time_limit_seconds = max_time_limit_seconds if max_time_limit_seconds is not None else self.DEFAULT_MAX_TIME_LIMIT_SECONDS
+        # None: no_improvement_fraction of each solve's time limit
+        self.no_improvement_seconds = no_improvement_seconds
+        self.no_improvement_fraction = self.NO_IMPROVEMENT_FRACTION
+        # Seed each sequential OR-Tools solve with the route of the previous weight
+        self.warm_start = warm_start
+        self.transit_evaluator = transit_evaluator if transit_evaluator is not None else self.DEFAULT_TRANSIT_EVALUATOR
+        if self.transit_evaluator not in self.TRANSIT_EVALUATORS:
+            raise ValueError(f"Unknown transit_evaluator '{self.transit_evaluator}', expected one of {self.TRANSIT_EVALUATORS}")
+        self.cost_model = cost_model if cost_model is not None else self.DEFAULT_COST_MODEL
+        if self.cost_model not in self.COST_MODELS:
+            raise ValueError(f"Unknown cost_model '{self.cost_model}', expected one of {self.COST_MODELS}")
+        # Stream a provisional greedy plan to on_plan listeners before the first solve
+        self.anytime_plan = anytime_plan
+        # Record each OR-Tools search (SolverTelemetry) in the plans and solver_metrics
+        self.solver_telemetry = solver_telemetry if solver_telemetry is not None else Config.SOLVER_TELEMETRY_ENABLED
+        if solver_only:
+            # Pool workers only solve prepared base models: no Redis, HTTP, cache, session or metrics clients
+            self.redis_service = self.distance_cache = self.store_distance_table = self.geocode_cache = None
+            self.plan_cache = self.plan_sessions = self.solver_metrics = None
+        else:
+            self._init_clients(redis_service, distance_cache, store_distance_table, geocode_cache, plan_cache, plan_sessions,
+                               solver_metrics)
         # ... (logging info)
+
+    def _init_clients(self, redis_service=None, distance_cache=None, store_distance_table=None, geocode_cache=None, plan_cache=None,
+                      plan_sessions=None, solver_metrics=None):
+        """
+        Redis, the distance and geocode caches, the store distance table, the plan cache,
+        plan sessions and solver metrics: the given ones, or defaults sharing one
+        RedisService. Solver-only instances (pool workers) skip this and have none.
+        """
+        self.redis_service = redis_service if redis_service is not None else RedisService()
+        self.distance_cache = distance_cache if distance_cache is not None else DistanceCacheService(redis_service=self.redis_service)
+        self.store_distance_table = store_distance_table if store_distance_table is not None else StoreDistanceTable()
+        self.geocode_cache = geocode_cache if geocode_cache is not None else TieredCache(
+            namespace="geocode:v1",
+            redis_service=self.redis_service,
+            maxsize=Config.GEOCODE_CACHE_LRU_SIZE,
+            ttl_seconds=Config.GEOCODE_CACHE_TTL_SECONDS
+        )
+        if plan_cache is None and Config.PLAN_CACHE_ENABLED:
+            plan_cache = PlanCacheService(redis_service=self.redis_service)
+        self.plan_cache = plan_cache
+        if plan_sessions is None and Config.PLAN_SESSION_ENABLED:
+            plan_sessions = PlanSessionService(redis_service=self.redis_service)
+        self.plan_sessions = plan_sessions
+        if solver_metrics is None and self.solver_telemetry:
+            solver_metrics = SolverMetricsService(redis_service=self.redis_service)
+        self.solver_metrics = solver_metrics
     
     @staticmethod    
     def _reverse_geocode(lat: float, lng: float) -> str:
@@ -32,7 +236,7 @@ class SearchService:
         if not api_key:
             logging.error("OpenRouteService API key not found in Config.ORS_API_KEY")
             return f"({lat}, {lng})"
-        url = "https://api.openrouteservice.org/geocode/reverse"
+        url = f"{Config.ORS_BASE_URL}/geocode/reverse"
         headers = {
             "Authorization": api_key,
             "Accept": "application/json"
@@ -43,7 +247,7 @@ class SearchService:
             "size": 1
         }
         try:
-            resp = requests.get(url, params=params, headers=headers, timeout=2)
+            resp = get_http_client().get(url, params=params, headers=headers, timeout=2)
             resp.raise_for_status()
             data = resp.json()
             features = data.get("features", [])
@@ -61,28 +265,109 @@ class SearchService:
             logging.exception("Unexpected error in _reverse_geocode")
         return f"({lat}, {lng})"
 
+    def _geocode_key(self, lat, lng):
+        precision = Config.GEOCODE_CACHE_PRECISION
+        return f"{round(float(lat), precision)},{round(float(lng), precision)}"
+
+    def _resolve_address(self, lat: float, lng: float) -> str:
+        """Reverse-geocode (lat, lng) through the geocode cache; failures are not cached."""
+        key = self._geocode_key(lat, lng)
+        address = self.geocode_cache.get(key)
+        if address is not None:
+            return address
+        address = self._reverse_geocode(lat, lng)
+        if address != f"({lat}, {lng})":
+            self.geocode_cache.set(key, address)
+        return address
+
+    def _get_distance_matrix(self, locations: list) -> list:
+        """
+        Distance matrix (km) for a list of (lat, lng) tuples. With a local road network
+        configured the whole matrix comes from it. Otherwise store-to-store distances come
+        from the precomputed store distance table when the stores are in it; only pairs
+        involving the user location or unknown stores are resolved live.
+        """
+        if get_road_network() is not None:
+            try:
+                return self._get_distance_matrix_local(locations)
+            except ValueError as e:
+                logger.warning(f"Local road network cannot serve this request, using ORS: {e}")
+
+        table_rows = self.store_distance_table.rows_for(locations)
+        known = [i for i, row in enumerate(table_rows) if row is not None]
+        if len(known) < 2:
+            return self._get_distance_matrix_ors(locations)
+
+        live_indices = [i for i, row in enumerate(table_rows) if row is None]
+        matrix = self.distance_cache.get_matrix(
+            locations, self._fetch_ors_matrix, only_indices=live_indices, map_fn=get_http_client().map_concurrently
+        )
+        table_block = self.store_distance_table.submatrix([table_rows[i] for i in known])
+        for r, i in enumerate(known):
+            for c, j in enumerate(known):
+                matrix[i][j] = float(table_block[r, c])
+        logger.info(f"Distance matrix: {len(known)} locations from store distance table, {len(live_indices)} resolved live.")
+        return matrix
+
     def _get_distance_matrix_ors(self, locations: list) -> list:
         """
-        Call OpenRouteService API to get the distance matrix (in meters) for a list of (lat, lng) tuples.
+        Get the road distance matrix (km) for a list of (lat, lng) tuples.
+        Pairs are served from the distance cache; only missing rows/columns are
+        requested from OpenRouteService.
         Returns a 2D list of distances in kilometers.
         """
+        return self.distance_cache.get_matrix(locations, self._fetch_ors_matrix, map_fn=get_http_client().map_concurrently)
+
+    def _get_distance_matrix_local(self, locations: list) -> list:
+        """
+        Same contract as _get_distance_matrix_ors, answered in-process by the local road
+        network (contraction hierarchies). Raises ValueError when it is not configured or
+        a location is too far from the network.
+        """
+        road_network = get_road_network()
+        if road_network is None:
+            raise ValueError("Local road network is not configured")
+        return road_network.distance_matrix(locations).tolist()
+
+    async def _fetch_external_inputs(self, locations, user_lat, user_lng):
+        """
+        Resolve the start address and the distance matrix concurrently.
+        Returns (address_or_exception, matrix_or_exception).
+        """
+        http_client = get_http_client()
+        return await asyncio.gather(
+            http_client.call_async(self._resolve_address, user_lat, user_lng),
+            http_client.call_async(self._get_distance_matrix, locations),
+            return_exceptions=True
+        )
+
+    def _fetch_ors_matrix(self, locations: list, sources: list, destinations: list) -> list:
+        """
+        Call OpenRouteService API to get the distance sub-matrix (km) between the given
+        source and destination indices of `locations`. Rows follow `sources`.
+        """
         api_key = getattr(Config, 'ORS_API_KEY', None)
         if not api_key:
             logger.error("OpenRouteService API key not found in Config.ORS_API_KEY")
             raise Exception("ORS API key missing")
-        url = "https://api.openrouteservice.org/v2/matrix/driving-car"
+        url = f"{Config.ORS_BASE_URL}/v2/matrix/driving-car"
         headers = {
             'Authorization': api_key,
             'Content-Type': 'application/json'
         }
-        coords = [[lng, lat] for lat, lng in locations]  # ORS expects [lng, lat]
+        # Chỉ gửi các điểm cần thiết cho khối này
+        used_indices = sorted(set(sources) | set(destinations))
+        position = {loc_idx: pos for pos, loc_idx in enumerate(used_indices)}
+        coords = [[locations[i][1], locations[i][0]] for i in used_indices]  # ORS expects [lng, lat]
         payload = {
             "locations": coords,
+            "sources": [position[i] for i in sources],
+            "destinations": [position[j] for j in destinations],
             "metrics": ["distance"],
             "units": "km"
         }
         try:
-            resp = requests.post(url, json=payload, headers=headers, timeout=10)
+            resp = get_http_client().post(url, json=payload, headers=headers, timeout=10)
             resp.raise_for_status()
             data = resp.json()
             if "distances" in data:
@@ -94,239 +379,1011 @@ class SearchService:
             logger.error(f"ORS matrix API error: {e}")
             raise
 
-    def _prepare_data_model(self, stores_input, user_loc_input, req_groups_input):
-        data = {}
-        locations = [] 
-        item_prices_at_nodes_original = [] 
-        node_to_store_map = {} 
-        task_nodes_for_group = [[] for _ in req_groups_input]
+    def _prepare_data_model(self, stores_input, user_loc_input, req_groups_input, distance_cost_per_km=None):
+        """Build the full routing data model for a single distance weight."""
+        base_model = self._prepare_base_model(stores_input, user_loc_input, req_groups_input)
+        if base_model is None:
+            return None
+        if distance_cost_per_km is None:
+            distance_cost_per_km = self.distance_cost_per_km
+        return self._apply_distance_cost(base_model, distance_cost_per_km)
+
+    def _prepare_base_model(self, stores_input, user_loc_input, req_groups_input, previous=None):
+        """
+        Build the weight-independent part of the routing data model (a PlanDataModel):
+        nodes, locations and the physical distance matrix (km).
 
+        In "item" mode every (store, candidate item) pair becomes a node. In "store" mode
+        each physical location keeps only its cheapest offer per required group, so the
+        model has at most one node per (location, group) and the same optimal plans.
+
+        `previous` is the base model of an earlier request (a replanned session): when it
+        has the same user location and every store location, its start address and a slice
+        of its distance matrix are used instead of fetching them again.
+        """
         try:
             user_lat = float(user_loc_input['lat'])
             user_lng = float(user_loc_input['lng'])
-            locations.append((user_lat, user_lng)) 
         except (ValueError, TypeError, KeyError) as e:
             logger.error(f"Invalid user location format: {user_loc_input}. Error: {e}")
             return None
 
-        or_tools_node_idx_counter = 1 
-        location_idx_counter = 1      
-
-        location_map_cache = {(user_lat, user_lng): 0} 
-        store_location_indices = {} 
+        locations = [(user_lat, user_lng)]
+        location_map_cache = {(user_lat, user_lng): 0}
+        location_store = [-1]
+        store_ids, store_addresses = [], []
+        item_ids, item_index = [], {}
+        # Một item chỉ thuộc nhóm đầu tiên chứa nó
+        group_of_item = {}
+        for group_idx, group_set in enumerate(req_groups_input):
+            for item_id in group_set:
+                group_of_item.setdefault(item_id, group_idx)
+        # Node 0 là depot
+        node_location, node_group, node_item, node_store, node_price = [0], [-1], [-1], [-1], [0.0]
+        # (location_idx, group_idx) -> cheapest offer (price, item, store), store mode only
+        cheapest_offers = {}
 
         for store_id, store_info in stores_input.items():
             try:
-                store_lat = float(store_info['lat'])
-                store_lng = float(store_info['lng'])
+                loc_tuple = (float(store_info['lat']), float(store_info['lng']))
             except (ValueError, TypeError, KeyError) as e:
                 logger.warning(f"Skipping store {store_id} due to invalid coordinates/format. Error: {e}")
                 continue
 
-            loc_tuple = (store_lat, store_lng)
-            if loc_tuple in location_map_cache:
-                store_loc_idx = location_map_cache[loc_tuple]
-            else:
-                locations.append(loc_tuple)
-                store_loc_idx = location_idx_counter
+            store_pos = len(store_ids)
+            store_ids.append(store_id)
+            store_addresses.append(store_info.get('address', store_id))
+            store_loc_idx = location_map_cache.get(loc_tuple)
+            if store_loc_idx is None:
+                store_loc_idx = len(locations)
                 location_map_cache[loc_tuple] = store_loc_idx
-                location_idx_counter += 1
-            store_location_indices[store_id] = store_loc_idx
+                locations.append(loc_tuple)
+                location_store.append(store_pos)
 
             for item_id, price in store_info.get('items', {}).items():
+                group_idx = group_of_item.get(item_id)
+                if group_idx is None:
+                    continue
                 try:
                     item_price_float = float(price)
                 except (ValueError, TypeError):
                     logger.warning(f"Skipping item {item_id} at {store_id} due to invalid price: {price}")
                     continue
+                item_pos = item_index.get(item_id)
+                if item_pos is None:
+                    item_pos = item_index[item_id] = len(item_ids)
+                    item_ids.append(item_id)
+
+                if self.solver_mode == "item":
+                    node_location.append(store_loc_idx)
+                    node_group.append(group_idx)
+                    node_item.append(item_pos)
+                    node_store.append(store_pos)
+                    node_price.append(item_price_float)
+                else:
+                    key = (store_loc_idx, group_idx)
+                    offer = cheapest_offers.get(key)
+                    if offer is None or item_price_float < offer[0]:
+                        cheapest_offers[key] = (item_price_float, item_pos, store_pos)
+
+        if self.solver_mode == "store":
+            # Theo thứ tự location rồi group, giống thứ tự node của item mode
+            for (store_loc_idx, group_idx), (price, item_pos, store_pos) in sorted(cheapest_offers.items()):
+                node_location.append(store_loc_idx)
+                node_group.append(group_idx)
+                node_item.append(item_pos)
+                node_store.append(store_pos)
+                node_price.append(price)
+
+        node_price = np.asarray(node_price, dtype=np.float64)
+        data = PlanDataModel(
+            solver_mode=self.solver_mode,
+            user_loc=user_loc_input,
+            groups=req_groups_input,
+            locations=locations,
+            location_store=location_store,
+            store_ids=store_ids,
+            store_addresses=store_addresses,
+            item_ids=item_ids,
+            node_location=node_location,
+            node_group=node_group,
+            node_item=node_item,
+            node_store=node_store,
+            node_price=node_price,
+            node_price_scaled=(node_price * self.item_price_scale_factor).astype(np.int64),
+        )
 
-                for group_idx, group_set in enumerate(req_groups_input):
-                    if item_id in group_set:
-                        current_or_tools_node_idx = or_tools_node_idx_counter
-                        item_prices_at_nodes_original.append(item_price_float)
-                        node_to_store_map[current_or_tools_node_idx] = store_loc_idx
-                        task_nodes_for_group[group_idx].append(current_or_tools_node_idx)
-                        or_tools_node_idx_counter += 1
-                        break 
-        
-        data['locations'] = locations
-        data['item_prices_at_nodes_original'] = [0.0] + item_prices_at_nodes_original
-        if len(data['item_prices_at_nodes_original']) != or_tools_node_idx_counter:
-             logger.error("CRITICAL: Mismatch in item_prices_at_nodes_original length and node count.")
-             return None
-
-        data['node_to_store_map'] = node_to_store_map
-        data['task_nodes_for_group'] = task_nodes_for_group
-        data['num_vehicles'] = 1
-        data['depot'] = 0 
-        data['num_nodes'] = or_tools_node_idx_counter 
-
-        data['stores_info_orig'] = stores_input 
-        data['user_loc_info_orig'] = user_loc_input 
-        data['req_groups_info_orig'] = req_groups_input
-        data['store_location_indices_orig'] = store_location_indices 
-
-        num_locs = len(locations)
-        data['distance_matrix_physical_km'] = [[0.0] * num_locs for _ in range(num_locs)] # Ma trận mới
+        previous_rows = self._previous_location_rows(previous, locations) if previous is not None else None
+        if previous_rows is not None:
+            data.start_address = previous.start_address
+            data.distance_km = previous.distance_km[np.ix_(previous_rows, previous_rows)]
+            data.distance_source = previous.distance_source
+            logger.info(f"Reusing the distance matrix of the previous request for {len(locations)} locations.")
+        else:
+            self._fetch_distances(data, locations, user_lat, user_lng)
+
+        if self.presolve:
+            data = self._presolve(data)
+        return data
+
+    def _fetch_distances(self, data, locations, user_lat, user_lng):
+        """Set the start address and the distance matrix of a new base model."""
         # --- Use OpenRouteService for distance matrix ---
+        # Địa chỉ điểm xuất phát và ma trận khoảng cách được lấy song song.
+        # Địa chỉ resolve một lần, dùng chung cho mọi plan của request.
+        logger.info("Attempting to get distance matrix from OpenRouteService...")
+        start_address, ors_matrix_km = get_http_client().run(self._fetch_external_inputs(locations, user_lat, user_lng))
+        if isinstance(start_address, Exception):
+            logger.error(f"Reverse geocode failed: {start_address}")
+            start_address = f"({user_lat}, {user_lng})"
+        data.start_address = start_address
         try:
-            logger.info("Attempting to get distance matrix from OpenRouteService...")
-            ors_matrix_km = self._get_distance_matrix_ors(locations) # Giả sử hàm này trả về km
-            logger.info(f"ORS matrix received (sample row 0): {ors_matrix_km[0][:5] if ors_matrix_km else 'Empty'}")
-            
-            # Điền vào cả ma trận physical và ma trận scaled
-            data['distance_matrix_scaled'] = [[0] * num_locs for _ in range(num_locs)]
-            for r in range(num_locs):
-                for c in range(num_locs):
-                    dist_km_val = float(ors_matrix_km[r][c])
-                    data['distance_matrix_physical_km'][r][c] = dist_km_val
-                    data['distance_matrix_scaled'][r][c] = int(dist_km_val * self.distance_cost_per_km)
+            if isinstance(ors_matrix_km, Exception):
+                raise ors_matrix_km
+            distance_km = np.asarray(ors_matrix_km, dtype=np.float64)
+            if distance_km.shape != (len(locations), len(locations)):
+                raise ValueError(f"distance matrix has shape {distance_km.shape}, expected {len(locations)}x{len(locations)}")
+            data.distance_km = distance_km
+            data.distance_source = "matrix"
             logger.info("Successfully processed ORS distance matrix.")
-            print(ors_matrix_km)
         except Exception as e:
             logger.error(f"Falling back to Haversine due to ORS error: {e}")
-            data['distance_matrix_scaled'] = [[0] * num_locs for _ in range(num_locs)]
-            for i in range(num_locs):
-                for j in range(i, num_locs):
-                    # Sử dụng haversine trực tiếp từ thư viện
-                    dist_km_val = haversine(locations[i], locations[j]) # locations[i] là (lat, lon)
-                    
-                    data['distance_matrix_physical_km'][i][j] = dist_km_val
-                    data['distance_matrix_physical_km'][j][i] = dist_km_val # Đối xứng
-
-                    scaled_dist = int(dist_km_val * self.distance_cost_per_km) if dist_km_val != float('inf') else 999999999
-                    data['distance_matrix_scaled'][i][j] = scaled_dist
-                    data['distance_matrix_scaled'][j][i] = scaled_dist
+            data.distance_km = haversine_matrix(locations)
+            data.distance_source = "haversine"
             logger.info("Successfully processed Haversine distance matrix (fallback).")
 
-        data['scaled_item_prices_at_nodes'] = [
-            int(price * self.item_price_scale_factor) for price in data['item_prices_at_nodes_original']
-        ]
+    @staticmethod
+    def _previous_location_rows(previous, locations):
+        """Row of every location in the distance matrix of `previous`, None unless it has them all with the same user location."""
+        if previous.distance_km is None:
+            return None
+        row_of = {tuple(loc): row for row, loc in enumerate(previous.locations.tolist())}
+        rows = [row_of.get(loc) for loc in locations]
+        if rows[0] != 0 or any(row is None for row in rows):
+            return None
+        return rows
 
-        max_scaled_dist = 0
-        if data['distance_matrix_scaled'] and any(data['distance_matrix_scaled']): 
-             max_scaled_dist = max(max(row) for row in data['distance_matrix_scaled'] if row)
-        
-        max_scaled_item_price = 0
-        if data['scaled_item_prices_at_nodes']: 
-            max_scaled_item_price = max(data['scaled_item_prices_at_nodes'])
+    def _presolve(self, base_model, within=None):
+        """
+        Reduction of the routing instance before any engine runs, keeping an optimal plan.
+
+        - candidate dominance: at one location only the cheapest node of each group is kept
+          (a no-op in "store" mode, which already builds one node per location and group);
+        - location dominance: location B is dropped when another location A offers every
+          group B offers at a price no higher, A is at least as close as B to and from
+          every other location, and skipping B never lengthens a route (the triangle
+          inequality through B, checked on the matrix: ORS fastest routes and cached
+          asymmetric distances do not guarantee it). A route through B is then no cheaper
+          than the same route through A, or without B when it already visits A. Branches of
+          one chain share a catalog (products are keyed by store_name), so this mostly
+          removes the farther branches. Valid for every distance weight;
+        - infeasible groups (no node left) are recorded so the caller can fail fast.
+
+        Location indices and the distance matrix are unchanged; nodes are renumbered.
+        The removals are recorded in the returned model's `presolve`. `within` limits the
+        locations a route may visit (the depot and the candidates of a sub-problem), which
+        makes location dominance only compare distances to those.
+        """
+        # --- candidate dominance ---
+        cheapest_price, cheapest_node = base_model.cheapest_nodes()
+        kept_nodes = cheapest_node[cheapest_node >= 0]
+        removed_candidates = base_model.num_nodes - 1 - len(kept_nodes)
+
+        # --- location dominance ---
+        cand_locs = np.flatnonzero((cheapest_node >= 0).any(axis=1)).tolist()
+        loc_prices = cheapest_price[cand_locs]
+        dist = base_model.distance_km
+        among = None
+        if within is not None:
+            among = np.zeros(dist.shape[0], dtype=bool)
+            among[within] = True
+        # price_dominates[a, b]: a sells every group b sells, at a price no higher
+        price_dominates = (loc_prices[:, None, :] <= loc_prices[None, :, :]).all(axis=2)
+        np.fill_diagonal(price_dominates, False)
+
+        removed_locations = []
+        removed = set()
+        for b_pos, b_loc in enumerate(cand_locs):
+            for a_pos in np.flatnonzero(price_dominates[:, b_pos]):
+                a_loc = cand_locs[a_pos]
+                if a_loc in removed:
+                    continue
+                # Mutual dominance (identical offers and distances): keep the lower index
+                if price_dominates[b_pos, a_pos] and a_loc > b_loc and self._closer_everywhere(dist, b_loc, a_loc, among):
+                    continue
+                if self._closer_everywhere(dist, a_loc, b_loc, among) and self._shortcut_holds(dist, a_loc, b_loc, among):
+                    removed.add(b_loc)
+                    removed_locations.append({'location_idx': b_loc, 'dominated_by': a_loc})
+                    break
+        kept_nodes = np.sort(kept_nodes)
+        if removed:
+            kept_nodes = kept_nodes[~np.isin(base_model.node_location[kept_nodes], list(removed))]
+
+        # --- rebuild node tables ---
+        data = base_model.select_nodes(kept_nodes)
+        data.presolve = {
+            'nodes_before': base_model.num_nodes,
+            'nodes_after': data.num_nodes,
+            'removed_candidates': int(removed_candidates),
+            'removed_locations': removed_locations,
+            'infeasible_groups': [g for g, nodes in enumerate(data.task_nodes_for_group) if not nodes],
+        }
+        logger.info(
+            f"Presolve: {base_model.num_nodes} -> {data.num_nodes} nodes, "
+            f"{removed_candidates} dominated candidates, {len(removed_locations)} dominated locations."
+        )
+        return data
 
-        estimated_max_total_cost = (max_scaled_dist * data['num_nodes']) + \
-                                   (max_scaled_item_price * len(req_groups_input))
-        data['scaled_penalty'] = max(1000000, int(estimated_max_total_cost * 2) +1) 
+    @staticmethod
+    def _closer_everywhere(dist, a_loc, b_loc, among=None):
+        """True if location a is at least as close as b to and from every other location (of `among`)."""
+        others = np.ones(dist.shape[0], dtype=bool) if among is None else among.copy()
+        others[[a_loc, b_loc]] = False
+        return bool((dist[others, a_loc] <= dist[others, b_loc]).all() and (dist[a_loc, others] <= dist[b_loc, others]).all())
 
-        return data
+    @staticmethod
+    def _shortcut_holds(dist, a_loc, b_loc, among=None):
+        """True if going straight from i to j is never longer than through b, for all locations i, j other than b (of `among`, and a)."""
+        others = np.ones(dist.shape[0], dtype=bool) if among is None else among.copy()
+        others[a_loc] = True
+        others[b_loc] = False
+        idx = np.flatnonzero(others)
+        via_b = dist[idx, b_loc][:, None] + dist[b_loc, idx][None, :]
+        # Tolerance for the rounding of distances that are exactly additive (collinear points)
+        return bool((dist[np.ix_(idx, idx)] <= via_b + 1e-9).all())
+
+    def _apply_distance_cost(self, base_model, distance_cost_per_km):
+        """
+        Derive the weight-dependent part of the data model (scaled arc costs and the
+        disjunction penalty) from a base model built by _prepare_base_model.
+        The base model is not modified, so it can be shared by several weights.
+        """
+        physical_km = base_model.distance_km
+        scaled = np.where(np.isfinite(physical_km), physical_km * distance_cost_per_km, 999999999).astype(np.int64)
+
+        max_scaled_dist = int(scaled.max()) if scaled.size else 0
+        max_scaled_item_price = int(base_model.node_price_scaled.max()) if base_model.num_nodes else 0
+        estimated_max_total_cost = (max_scaled_dist * base_model.num_nodes) + \
+                                   (max_scaled_item_price * base_model.num_groups)
+        return base_model.copy(
+            distance_cost_per_km=distance_cost_per_km,
+            distance_scaled=scaled,
+            scaled_penalty=max(1000000, int(estimated_max_total_cost * 2) + 1)
+        )
 
-    def _solve_with_or_tools(self, data_model): # Giữ nguyên
-        if data_model is None:
-            logger.error("Cannot solve, data_model is None.")
-            return None, None, None
+    def _solver_budget(self, num_nodes, deadline=None):
+        """
+        Search limits for one OR-Tools solve. `deadline` (time.monotonic()) is the end of the
+        request's latency budget; the time limit never runs past it.
+        """
+        if self.time_budget_policy == "adaptive":
+            time_limit = min(self.max_time_limit_seconds,
+                             self.MIN_TIME_LIMIT_SECONDS + self.TIME_LIMIT_SECONDS_PER_NODE * num_nodes)
+            solution_limit = self.SOLUTION_LIMIT_BASE + self.SOLUTION_LIMIT_PER_NODE * num_nodes
+        else:
+            time_limit = float(self.time_limit_seconds)
+            solution_limit = None
+        limited_by = "time_limit"
+        if deadline is not None and deadline - time.monotonic() < time_limit:
+            # Keep a floor so the first-solution heuristic still has time to run
+            time_limit = max(self.MIN_TIME_LIMIT_SECONDS, deadline - time.monotonic())
+            limited_by = "latency_budget"
+        no_improvement = self.no_improvement_seconds
+        if no_improvement is None:
+            no_improvement = max(self.MIN_TIME_LIMIT_SECONDS, self.no_improvement_fraction * time_limit)
+        return {
+            'policy': self.time_budget_policy,
+            'num_nodes': num_nodes,
+            'time_limit_seconds': round(time_limit, 3),
+            'solution_limit': solution_limit,
+            'no_improvement_seconds': round(no_improvement, 3),
+            'limited_by': limited_by,
+        }
 
-        try:
-            manager = pywrapcp.RoutingIndexManager(data_model['num_nodes'], data_model['num_vehicles'], data_model['depot'])
-            routing = pywrapcp.RoutingModel(manager)
-        except Exception as e:
-            logger.error(f"Error initializing OR-Tools manager/model: {e}. Num_nodes: {data_model.get('num_nodes')}")
-            return None, None, None 
+    def _max_solve_seconds(self):
+        """Upper bound of a single OR-Tools solve under the current policy."""
+        if self.time_budget_policy == "adaptive":
+            return self.max_time_limit_seconds
+        return self.time_limit_seconds
+
+    @staticmethod
+    def _initial_route_nodes(data_model, initial_route):
+        """
+        Map a route given as (location_idx, group_idx) stops (a plan's _route_stops) to the
+        nodes of `data_model`, cheapest node first when a stop has several. Stops that no
+        longer exist and repeated groups are dropped.
+        """
+        _, cheapest_node = data_model.cheapest_nodes()
+        route_nodes, seen_groups = [], set()
+        for location_idx, group_idx in initial_route:
+            if not (0 <= location_idx < data_model.num_locations and 0 <= group_idx < data_model.num_groups):
+                continue
+            node = int(cheapest_node[location_idx, group_idx])
+            if node >= 0 and group_idx not in seen_groups:
+                route_nodes.append(node)
+                seen_groups.add(group_idx)
+        return route_nodes
+
+    def _register_transit_costs(self, routing, manager, data_model):
+        """
+        Register the arc cost evaluator and, for the "dimension" cost model, the unary item
+        cost evaluator, and return their indices (the latter None with "arc" costs, where
+        the price of a node is part of every arc entering it). "matrix" precomputes
+        node-level NumPy tables and hands them to OR-Tools, so local search never calls
+        back into Python; "callback" keeps the original Python closures.
+        """
+        node_location = data_model.node_location
+        prices_on_arcs = self.cost_model == "arc"
+        if self.transit_evaluator == "matrix":
+            node_transit = data_model.distance_scaled[np.ix_(node_location, node_location)]
+            if prices_on_arcs:
+                node_transit = node_transit + data_model.node_price_scaled[None, :]
+                np.fill_diagonal(node_transit, 0)
+                return routing.RegisterTransitMatrix(node_transit.tolist()), None
+            transit_callback_index = routing.RegisterTransitMatrix(node_transit.tolist())
+            item_cost_callback_idx = routing.RegisterUnaryTransitVector(data_model.node_price_scaled.tolist())
+            return transit_callback_index, item_cost_callback_idx
+
+        node_location_list = node_location.tolist()
+        distance_scaled = data_model.distance_scaled.tolist()
+        node_prices = data_model.node_price_scaled.tolist()
 
         def distance_callback(from_index, to_index):
             try:
                 from_node = manager.IndexToNode(from_index)
                 to_node = manager.IndexToNode(to_index)
-                from_loc_idx = 0 if from_node == data_model['depot'] else data_model['node_to_store_map'].get(from_node)
-                to_loc_idx = 0 if to_node == data_model['depot'] else data_model['node_to_store_map'].get(to_node)
-
-                if from_loc_idx is None or to_loc_idx is None:
-                    logger.error(f"Distance_callback: Unmapped node. From_node: {from_node} (loc:{from_loc_idx}), To_node: {to_node} (loc:{to_loc_idx})")
-                    return data_model['scaled_penalty'] 
-                return data_model['distance_matrix_scaled'][from_loc_idx][to_loc_idx]
+                cost = distance_scaled[node_location_list[from_node]][node_location_list[to_node]]
+                if prices_on_arcs and from_node != to_node:
+                    cost += node_prices[to_node]
+                return cost
             except Exception as e: 
                 logger.error(f"Error in distance_callback ({from_index}->{to_index}): {e}")
-                return data_model['scaled_penalty']
-
+                return data_model.scaled_penalty
 
         transit_callback_index = routing.RegisterTransitCallback(distance_callback)
-        routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
+        if prices_on_arcs:
+            return transit_callback_index, None
 
         def item_cost_callback(from_index):
             try:
-                node_index = manager.IndexToNode(from_index)
-                if 0 <= node_index < len(data_model['scaled_item_prices_at_nodes']):
-                    return data_model['scaled_item_prices_at_nodes'][node_index]
-                else:
-                    logger.error(f"Item_cost_callback: Invalid node_index {node_index} for scaled_item_prices (len {len(data_model['scaled_item_prices_at_nodes'])}).")
-                    return 0 
+                return node_prices[manager.IndexToNode(from_index)]
             except Exception as e:
-                logger.error(f"Error in item_cost_callback (index {from_index}, node {manager.IndexToNode(from_index) if manager else 'N/A'}): {e}")
+                logger.error(f"Error in item_cost_callback (index {from_index}): {e}")
                 return 0 
 
         item_cost_callback_idx = routing.RegisterUnaryTransitCallback(item_cost_callback)
-        
-        max_possible_scaled_item_cost_for_dim = sum(data_model['scaled_item_prices_at_nodes']) + data_model['scaled_penalty']
-        vehicle_capacity_for_dim = [max(1, int(max_possible_scaled_item_cost_for_dim))] * data_model['num_vehicles']
-
-        routing.AddDimension(
-            item_cost_callback_idx,
-            0, 
-            vehicle_capacity_for_dim[0], 
-            True, 
-            'ItemCost'
-        )
-        item_cost_dimension = routing.GetDimensionOrDie('ItemCost')
-        item_cost_dimension.SetGlobalSpanCostCoefficient(1) 
+        return transit_callback_index, item_cost_callback_idx
+
+    def _solve_with_or_tools(self, data_model, budget=None, initial_route=None):
+        """
+        Solve `data_model` with OR-Tools within `budget` (see _solver_budget). The budget dict
+        is updated in place with the search outcome: solutions found, elapsed seconds and
+        `stop_reason` (no_improvement, time_limit, latency_budget, solution_limit or
+        search_completed).
+
+        `initial_route` ((location_idx, group_idx) stops, e.g. the previous weight's
+        _route_stops) replaces the PATH_CHEAPEST_ARC first solution when it maps to a
+        feasible assignment of this model; the _greedy_route construction is used when it
+        is cheaper or there is no initial route. `first_solution` in the budget says which
+        start was used.
+
+        With solver_telemetry, the budget also gets the SolverTelemetry summary of the
+        search under `telemetry` (seed route, objective-versus-time curve of the solutions
+        found from it, first solution and best times, final status), which is added to
+        solver_metrics.
+        """
+        if data_model is None:
+            logger.error("Cannot solve, data_model is None.")
+            return None, None, None
+
+        try:
+            manager = pywrapcp.RoutingIndexManager(data_model.num_nodes, data_model.num_vehicles, data_model.depot)
+            routing = pywrapcp.RoutingModel(manager)
+        except Exception as e:
+            logger.error(f"Error initializing OR-Tools manager/model: {e}. Num_nodes: {data_model.num_nodes}")
+            return None, None, None 
+
+        transit_callback_index, item_cost_callback_idx = self._register_transit_costs(routing, manager, data_model)
+        routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
+
+        if item_cost_callback_idx is not None:
+            max_possible_scaled_item_cost_for_dim = int(data_model.node_price_scaled.sum()) + data_model.scaled_penalty
+            vehicle_capacity_for_dim = [max(1, int(max_possible_scaled_item_cost_for_dim))] * data_model.num_vehicles
+
+            routing.AddDimension(
+                item_cost_callback_idx,
+                0, 
+                vehicle_capacity_for_dim[0], 
+                True, 
+                'ItemCost'
+            )
+            item_cost_dimension = routing.GetDimensionOrDie('ItemCost')
+            item_cost_dimension.SetGlobalSpanCostCoefficient(1) 
 
-        for group_idx, or_tools_nodes_in_group in enumerate(data_model['task_nodes_for_group']):
-            indices_in_group = [manager.NodeToIndex(node) for node in or_tools_nodes_in_group if node < data_model['num_nodes']] 
+        for group_idx, or_tools_nodes_in_group in enumerate(data_model.task_nodes_for_group):
+            indices_in_group = [manager.NodeToIndex(node) for node in or_tools_nodes_in_group if node < data_model.num_nodes] 
             
             if indices_in_group: 
                 routing.AddDisjunction(
                     indices_in_group,
-                    data_model['scaled_penalty'],
+                    data_model.scaled_penalty,
                     1 
                 )
-            elif data_model['req_groups_info_orig'][group_idx]: 
-                 logger.warning(f"Group {group_idx+1} ({data_model['req_groups_info_orig'][group_idx]}) is required but has no valid task nodes after filtering.")
+            elif data_model.groups[group_idx]: 
+                 logger.warning(f"Group {group_idx+1} ({data_model.groups[group_idx]}) is required but has no valid task nodes after filtering.")
 
         search_parameters = pywrapcp.DefaultRoutingSearchParameters()
         search_parameters.first_solution_strategy = (
             routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC)
         search_parameters.local_search_metaheuristic = (
             routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH)
-        search_parameters.time_limit.seconds = self.time_limit_seconds
-
-        logger.info("Starting OR-Tools solver...")
-        solution = routing.SolveWithParameters(search_parameters)
-        logger.info(f"OR-Tools solver finished with status: {routing.status()}")
+        if budget is None:
+            budget = self._solver_budget(data_model.num_nodes)
+        search_parameters.time_limit.FromMilliseconds(int(budget['time_limit_seconds'] * 1000))
+        if budget['solution_limit']:
+            search_parameters.solution_limit = budget['solution_limit']
+
+        # Early stop: the custom limit ends the search once the best objective has not
+        # improved for no_improvement_seconds
+        started = time.monotonic()
+        progress = {'searching': False, 'best': None, 'last_improvement': started, 'solutions': 0, 'stop_reason': None}
+        telemetry = SolverTelemetry(started) if self.solver_telemetry else None
+
+        # The only solution callback of the search, it also feeds the telemetry.
+        # ReadAssignmentFromRoutes runs the solver to check a start route, not counted.
+        def on_solution():
+            if not progress['searching']:
+                return
+            progress['solutions'] += 1
+            objective = routing.CostVar().Value()
+            if telemetry is not None:
+                telemetry.record(objective)
+            if progress['best'] is None or objective < progress['best']:
+                progress['best'] = objective
+                progress['last_improvement'] = time.monotonic()
+
+        def no_improvement_limit():
+            if progress['best'] is not None and time.monotonic() - progress['last_improvement'] >= budget['no_improvement_seconds']:
+                progress['stop_reason'] = "no_improvement"
+                return True
+            return False
+
+        routing.AddAtSolutionCallback(on_solution)
+        routing.AddSearchMonitor(routing.solver().CustomLimit(no_improvement_limit))
+
+        # First solution: the initial route when it beats the greedy construction under this
+        # model's weights (after a large weight change it can be a much worse start), else
+        # the greedy route, else OR-Tools' own PATH_CHEAPEST_ARC
+        initial_assignment = None
+        budget['warm_start'] = False
+        budget['first_solution'] = "path_cheapest_arc"
+        greedy_route = self._greedy_route(data_model)
+        starts = [("greedy", greedy_route[1:-1])] if greedy_route is not None else []
+        route_nodes = self._initial_route_nodes(data_model, initial_route) if initial_route else []
+        if route_nodes:
+            starts.insert(0, ("warm_start", route_nodes))
+        starts = [
+            (self._route_objective_scaled(data_model, [data_model.depot] + start_nodes + [data_model.depot]), name, start_nodes)
+            for name, start_nodes in starts
+        ]
+        starts.sort(key=lambda start: start[0])
+        if starts:
+            routing.CloseModelWithParameters(search_parameters)
+        for objective, name, start_nodes in starts:
+            initial_assignment = routing.ReadAssignmentFromRoutes([start_nodes], True)
+            if initial_assignment is not None:
+                budget['warm_start'] = name == "warm_start"
+                budget['first_solution'] = name
+                if telemetry is not None:
+                    telemetry.set_seed(name, objective)
+                break
+        if route_nodes and not budget['warm_start']:
+            logger.info("Initial route is not a better feasible start than the greedy route.")
+
+        logger.info(f"Starting OR-Tools solver (time limit {budget['time_limit_seconds']}s)...")
+        progress['searching'] = True
+        if initial_assignment is not None:
+            solution = routing.SolveFromAssignmentWithParameters(initial_assignment, search_parameters)
+        else:
+            solution = routing.SolveWithParameters(search_parameters)
+        elapsed = time.monotonic() - started
+        stop_reason = progress['stop_reason']
+        if stop_reason is None:
+            if budget['solution_limit'] and progress['solutions'] >= budget['solution_limit']:
+                stop_reason = "solution_limit"
+            elif elapsed >= 0.95 * budget['time_limit_seconds']:
+                stop_reason = budget['limited_by']
+            else:
+                stop_reason = "search_completed"
+        budget.update({
+            'elapsed_seconds': round(elapsed, 3),
+            'solutions': progress['solutions'],
+            'local_search_neighbors': routing.solver().AcceptedNeighbors(),
+            'last_improvement_seconds': round(progress['last_improvement'] - started, 3),
+            'stop_reason': stop_reason,
+        })
+        if telemetry is not None:
+            budget['telemetry'] = telemetry.summary(routing_enums_pb2.RoutingSearchStatus.Value.Name(routing.status()), stop_reason)
+            if self.solver_metrics is not None:
+                self.solver_metrics.observe(budget['telemetry'])
+        logger.info(f"OR-Tools solver finished with status: {routing.status()} ({stop_reason} after {elapsed:.2f}s)")
         return manager, routing, solution
 
+    def _solve_exact(self, data_model):
+        """
+        Exact engine for small instances: Held-Karp dynamic programming over subsets of
+        candidate locations, combined with the cheapest coverage of every required group
+        by the locations in the subset. Minimises the same scaled objective as the OR-Tools
+        model (closed tour from the depot plus item prices).
+
+        Returns (route_nodes, objective_scaled), or (None, None) if no subset covers all groups.
+        Raises ValueError above EXACT_HARD_MAX_LOCATIONS candidate locations.
+        """
+        cand_locs = data_model.candidate_locations()
+        n = len(cand_locs)
+        num_groups = data_model.num_groups
+        if n == 0:
+            return None, None
+        if n > self.EXACT_HARD_MAX_LOCATIONS:
+            raise ValueError(f"Exact DP is limited to {self.EXACT_HARD_MAX_LOCATIONS} candidate locations, got {n}")
+
+        # Cheapest scaled price (and the node offering it) per candidate location and group
+        cheapest_price, cheapest_node = data_model.cheapest_nodes()
+        prices = cheapest_price[cand_locs]
+        price_nodes = cheapest_node[cand_locs]
+
+        # dist[0] is the depot, dist[1 + pos] is cand_locs[pos]
+        loc_order = [0] + cand_locs
+        dist = data_model.distance_scaled[np.ix_(loc_order, loc_order)].astype(np.float64)
+
+        num_masks = 1 << n
+        # best_prices[mask, g]: cheapest price of group g among locations in mask
+        best_prices = np.full((num_masks, num_groups), np.inf)
+        popcount = np.zeros(num_masks, dtype=np.int64)
+        for j in range(n):
+            lo, hi = 1 << j, 1 << (j + 1)
+            best_prices[lo:hi] = np.minimum(best_prices[:lo], prices[j])
+            popcount[lo:hi] = popcount[:lo] + 1
+        item_costs = best_prices.sum(axis=1)
+
+        # path_costs[mask, j]: cheapest path from the depot through all of mask, ending at j
+        path_costs = np.full((num_masks, n), np.inf)
+        # Smallest signed type holding -1..n-1
+        parents = np.full((num_masks, n), -1, dtype=np.min_scalar_type(-n))
+        for j in range(n):
+            path_costs[1 << j, j] = dist[0, 1 + j]
+        all_masks = np.arange(num_masks)
+        for size in range(2, n + 1):
+            layer = all_masks[popcount == size]
+            for j in range(n):
+                bit = 1 << j
+                masks = layer[(layer & bit) != 0]
+                prev_costs = path_costs[masks ^ bit] + dist[1:, 1 + j]
+                best_prev = prev_costs.argmin(axis=1)
+                path_costs[masks, j] = prev_costs[np.arange(len(masks)), best_prev]
+                parents[masks, j] = best_prev
+
+        tour_costs = (path_costs + dist[1:, 0]).min(axis=1)
+        tour_costs[0] = 0.0
+        totals = tour_costs + item_costs
+        best_mask = int(np.argmin(totals))
+        if not np.isfinite(totals[best_mask]):
+            return None, None
+
+        # Walk the parents back to recover the visiting order
+        order = []
+        mask = best_mask
+        j = int(np.argmin(path_costs[mask] + dist[1:, 0]))
+        while mask:
+            order.append(j)
+            prev_j = int(parents[mask, j])
+            mask ^= 1 << j
+            j = prev_j
+        order.reverse()
+
+        # Buy each group at the cheapest visited location, the earliest one on ties
+        nodes_at_pos = {pos: [] for pos in order}
+        for group_idx in range(num_groups):
+            buy_pos = min(order, key=lambda pos: prices[pos, group_idx])
+            nodes_at_pos[buy_pos].append(int(price_nodes[buy_pos, group_idx]))
+
+        route_nodes = [data_model.depot]
+        for pos in order:
+            route_nodes.extend(nodes_at_pos[pos])
+        route_nodes.append(data_model.depot)
+        return route_nodes, self._route_objective_scaled(data_model, route_nodes)
+
+    def _solve_cp_sat(self, data_model, budget, initial_route=None):
+        """
+        CP-SAT engine: the routing model's prize-collecting tour, on locations. Arc
+        literals form one circuit through the depot (AddCircuit; a self-loop skips a
+        location), every group is bought at exactly one visited location at its cheapest
+        price there, and the objective is arc costs plus prices, as in the OR-Tools model.
+
+        Runs cp_sat_workers search workers until the time limit of `budget` or until the
+        relative gap to the proven lower bound is at most cp_sat_gap_limit. `initial_route`
+        ((location_idx, group_idx) stops), or else the _greedy_route construction, is given
+        as a solution hint.
+
+        Returns (route_nodes, objective_scaled), (None, None) without a solution; `budget`
+        is updated with the status, lower bound and gap.
+        """
+        cand_locs = data_model.candidate_locations()
+        cheapest_price, cheapest_node = data_model.cheapest_nodes()
+        dist = data_model.distance_scaled
+        model = cp_model.CpModel()
+
+        # Circuit positions: 0 is the depot, 1 + pos is cand_locs[pos]
+        loc_order = [0] + cand_locs
+        visit = [model.NewBoolVar(f"visit_{loc}") for loc in cand_locs]
+        arcs, arc_literal = [], {}
+        terms, coefficients = [], []
+        for i, from_loc in enumerate(loc_order):
+            for j, to_loc in enumerate(loc_order):
+                if i == j:
+                    continue
+                literal = model.NewBoolVar(f"arc_{from_loc}_{to_loc}")
+                arcs.append((i, j, literal))
+                arc_literal[(i, j)] = literal
+                terms.append(literal)
+                coefficients.append(int(dist[from_loc, to_loc]))
+        for pos in range(len(cand_locs)):
+            arcs.append((1 + pos, 1 + pos, visit[pos].Not()))
+        model.AddCircuit(arcs)
+
+        buy = {}
+        bought_at = [[] for _ in cand_locs]
+        for group_idx in range(data_model.num_groups):
+            options = []
+            for pos, loc in enumerate(cand_locs):
+                if np.isfinite(cheapest_price[loc, group_idx]):
+                    literal = model.NewBoolVar(f"buy_{loc}_{group_idx}")
+                    model.AddImplication(literal, visit[pos])
+                    buy[(pos, group_idx)] = literal
+                    bought_at[pos].append(literal)
+                    options.append(literal)
+                    terms.append(literal)
+                    coefficients.append(int(cheapest_price[loc, group_idx]))
+            model.AddExactlyOne(options)
+        # A visited location buys something (prunes detours that cost nothing at weight 0)
+        for pos in range(len(cand_locs)):
+            model.Add(sum(bought_at[pos]) >= 1).OnlyEnforceIf(visit[pos])
+        model.Minimize(cp_model.LinearExpr.WeightedSum(terms, coefficients))
+
+        position = {loc: 1 + pos for pos, loc in enumerate(cand_locs)}
+        # Without an initial route, hint the greedy construction
+        hint_route = initial_route or self._route_stops(data_model, self._greedy_route(data_model) or [])
+        hint_stops = [(loc, group_idx) for loc, group_idx in hint_route
+                      if loc in position and (position[loc] - 1, group_idx) in buy]
+        if hint_stops:
+            hint_positions = list(dict.fromkeys(position[loc] for loc, _ in hint_stops))
+            for pos in range(len(cand_locs)):
+                model.AddHint(visit[pos], (1 + pos) in hint_positions)
+            hint_arcs = set(zip([0] + hint_positions, hint_positions + [0]))
+            for key, literal in arc_literal.items():
+                model.AddHint(literal, key in hint_arcs)
+            hint_buys = {(position[loc] - 1, group_idx) for loc, group_idx in hint_stops}
+            for key, literal in buy.items():
+                model.AddHint(literal, key in hint_buys)
+
+        solver = cp_model.CpSolver()
+        solver.parameters.num_search_workers = self.cp_sat_workers
+        solver.parameters.max_time_in_seconds = budget['time_limit_seconds']
+        solver.parameters.relative_gap_limit = self.cp_sat_gap_limit
+        logger.info(f"Starting CP-SAT ({self.cp_sat_workers} workers, {len(cand_locs)} locations, "
+                    f"time limit {budget['time_limit_seconds']}s)...")
+        status = solver.Solve(model)
+        budget.update({
+            'num_workers': self.cp_sat_workers,
+            'status': solver.StatusName(status),
+            'elapsed_seconds': round(solver.WallTime(), 3),
+            'warm_start': bool(initial_route) and bool(hint_stops),
+        })
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            budget['stop_reason'] = budget['limited_by'] if status == cp_model.UNKNOWN else "search_completed"
+            return None, None
+
+        objective = solver.ObjectiveValue()
+        lower_bound = solver.BestObjectiveBound()
+        gap = (objective - lower_bound) / objective if objective > 0 else 0.0
+        if gap <= 1e-9:
+            stop_reason = "optimal"
+        elif gap <= self.cp_sat_gap_limit:
+            stop_reason = "gap_limit"
+        else:
+            stop_reason = budget['limited_by']
+        budget.update({
+            'lower_bound_scaled': int(math.ceil(lower_bound)),
+            'gap': round(gap, 6),
+            'stop_reason': stop_reason,
+        })
+
+        # Follow the circuit from the depot
+        successor = {i: j for (i, j), literal in arc_literal.items() if solver.BooleanValue(literal)}
+        route_nodes = [data_model.depot]
+        current = successor.get(0, 0)
+        while current != 0:
+            pos = current - 1
+            for group_idx in range(data_model.num_groups):
+                literal = buy.get((pos, group_idx))
+                if literal is not None and solver.BooleanValue(literal):
+                    route_nodes.append(int(cheapest_node[cand_locs[pos], group_idx]))
+            current = successor[current]
+        route_nodes.append(data_model.depot)
+        return route_nodes, self._route_objective_scaled(data_model, route_nodes)
+
     @staticmethod
-    def _get_location_address_helper(location_idx, data_model):
-        """Always use _reverse_geocode for user location (location_idx == 0)."""
-        if location_idx == 0:
-            user_loc = data_model['user_loc_info_orig']
-            lat = user_loc.get('lat')
-            lng = user_loc.get('lng')
-
-            if lat is not None and lng is not None:
-                try:
-                    lat_f = float(lat)
-                    lng_f = float(lng)
-                    return SearchService._reverse_geocode(lat_f, lng_f)
-                except Exception:
-                    pass
-            return "User Location"
-        for store_id, loc_idx_val in data_model['store_location_indices_orig'].items():
-            if loc_idx_val == location_idx:
-                return data_model['stores_info_orig'][store_id].get('address', store_id)
-        return f"Unknown Location (Index {location_idx})"
+    def _greedy_route(data_model, max_moves=None):
+        """
+        Add/drop construction for the model (a few milliseconds, no solver). Two starting
+        tours, both in nearest-neighbour order from the user: every group at its cheapest
+        location, and the nearest location selling some uncovered group until all are
+        covered. Each is improved by the best improving move until none is left, where a
+        move either inserts a location at its cheapest position (it takes over the groups
+        it sells cheaper) or drops a visited one (its groups go to the cheapest remaining
+        visited location), and 2-opted after every move. Distances may be asymmetric.
+
+        Returns the depot-to-depot route nodes of the better tour, None when a group is
+        not sold anywhere.
+        """
+        cheapest_price, cheapest_node = data_model.cheapest_nodes()
+        if data_model.num_groups == 0 or not np.isfinite(cheapest_price).any(axis=0).all():
+            return None
+        dist = data_model.distance_scaled
+        sells = np.isfinite(cheapest_price)
+        sells[0] = False
+        if max_moves is None:
+            max_moves = 4 * data_model.num_groups + 8
+
+        def tour_cost(tour):
+            return int(dist[tour, tour[1:] + tour[:1]].sum())
+
+        def objective(tour):
+            return tour_cost(tour) + int(cheapest_price[tour[1:]].min(axis=0).sum())
+
+        def two_opt(tour):
+            improved = True
+            while improved:
+                improved = False
+                best = tour_cost(tour)
+                for i in range(1, len(tour) - 1):
+                    for j in range(i + 1, len(tour)):
+                        candidate = tour[:i] + tour[i:j + 1][::-1] + tour[j + 1:]
+                        cost = tour_cost(candidate)
+                        if cost < best:
+                            tour, best, improved = candidate, cost, True
+            return tour
+
+        def add_drop(tour):
+            for _ in range(max_moves):
+                paid = cheapest_price[tour[1:]].min(axis=0)
+                best_delta, best_tour = 0, None
+
+                # Insertion of every unvisited location that sells something
+                candidates = np.flatnonzero(sells.any(axis=1))
+                candidates = candidates[~np.isin(candidates, tour)]
+                if len(candidates):
+                    before, after = np.asarray(tour), np.asarray(tour[1:] + tour[:1])
+                    detour = (dist[np.ix_(before, candidates)] + dist[np.ix_(candidates, after)].T
+                              - dist[before, after][:, None])
+                    position = detour.argmin(axis=0)
+                    saving = np.maximum(paid[None, :] - cheapest_price[candidates], 0).sum(axis=1)
+                    delta = detour[position, np.arange(len(candidates))] - saving
+                    k = int(delta.argmin())
+                    if delta[k] < best_delta:
+                        best_delta = delta[k]
+                        best_tour = tour[:position[k] + 1] + [int(candidates[k])] + tour[position[k] + 1:]
+
+                # Removal of every visited location whose groups are sold elsewhere on the tour
+                for i in range(1, len(tour)):
+                    rest = tour[1:i] + tour[i + 1:]
+                    if not rest:
+                        break
+                    repaid = cheapest_price[rest].min(axis=0)
+                    if not np.isfinite(repaid).all():
+                        continue
+                    prev, loc, nxt = tour[i - 1], tour[i], tour[(i + 1) % len(tour)]
+                    delta = repaid.sum() - paid.sum() - (dist[prev, loc] + dist[loc, nxt] - dist[prev, nxt])
+                    if delta < best_delta:
+                        best_delta, best_tour = delta, tour[:i] + tour[i + 1:]
+
+                if best_tour is None:
+                    break
+                tour = two_opt(best_tour)
+            return tour
+
+        def nearest_neighbour(locs):
+            tour, locs = [0], set(locs)
+            while locs:
+                nearest = min(locs, key=lambda loc: dist[tour[-1], loc])
+                locs.remove(nearest)
+                tour.append(nearest)
+            return tour
+
+        # Tours are lists of locations starting at the depot (location 0), closed implicitly
+        cheapest_start = nearest_neighbour(np.argmin(cheapest_price, axis=0).tolist())
+        nearest_start, uncovered = [0], np.ones(data_model.num_groups, dtype=bool)
+        while uncovered.any():
+            useful = np.flatnonzero(sells[:, uncovered].any(axis=1))
+            nearest = int(useful[np.argmin(dist[nearest_start[-1], useful])])
+            uncovered &= ~sells[nearest]
+            nearest_start.append(nearest)
+        tour = min((add_drop(two_opt(start)) for start in (cheapest_start, nearest_start)), key=objective)
+
+        # Every group at its cheapest visited location, purchases in tour order
+        visited = np.asarray(tour[1:])
+        buy_at = visited[np.argmin(cheapest_price[visited], axis=0)]
+        route_nodes = [data_model.depot]
+        for loc in tour[1:]:
+            route_nodes.extend(int(cheapest_node[loc, group_idx]) for group_idx in np.flatnonzero(buy_at == loc))
+        route_nodes.append(data_model.depot)
+        return route_nodes
+
+    @staticmethod
+    def _route_stops(data_model, route_nodes):
+        """(location_idx, group_idx) stops of depot-to-depot route nodes, as in a plan's _route_stops."""
+        return [(int(data_model.node_location[node]), int(data_model.node_group[node]))
+                for node in route_nodes if node != data_model.depot]
+
+    @staticmethod
+    def _route_objective_scaled(data_model, route_nodes):
+        """Scaled objective of a depot-to-depot route: arc costs plus item prices."""
+        route_nodes = np.asarray(route_nodes, dtype=np.int64)
+        route_locations = data_model.node_location[route_nodes]
+        objective = data_model.distance_scaled[route_locations[:-1], route_locations[1:]].sum()
+        objective += data_model.node_price_scaled[route_nodes[1:-1]].sum()
+        return int(objective)
+
+    def _select_engine(self, data_model):
+        num_locations = len(data_model.candidate_locations())
+        if self.solver_engine == "exact_dp" and num_locations > self.EXACT_HARD_MAX_LOCATIONS:
+            logger.warning(f"{num_locations} candidate locations exceed the exact DP limit of "
+                           f"{self.EXACT_HARD_MAX_LOCATIONS}, solving with OR-Tools.")
+            return "or_tools"
+        if self.solver_engine != "auto":
+            return self.solver_engine
+        if num_locations <= self.exact_max_locations:
+            return "exact_dp"
+        if num_locations >= self.decomposition_min_locations:
+            return "decomposed"
+        return "or_tools"
 
     @staticmethod
-    def _get_coordinates_helper(location_idx, data_model):
-        """Helper to get lat, lng for a location index."""
-        if 0 <= location_idx < len(data_model['locations']):
-            lat, lng = data_model['locations'][location_idx]
-            return {'lat': lat, 'lng': lng}
-        return {'lat': None, 'lng': None}
+    def _cluster_locations(points, k, iterations=25):
+        """
+        Deterministic k-means on (n, 2) planar points: farthest-point seeding, then Lloyd
+        iterations. Returns the cluster label of every point, numbered without gaps.
+        """
+        k = max(1, min(k, len(points)))
+        centres = [points[np.argmin(((points - points.mean(axis=0)) ** 2).sum(axis=1))]]
+        min_sq_dist = ((points - centres[0]) ** 2).sum(axis=1)
+        for _ in range(1, k):
+            centres.append(points[np.argmax(min_sq_dist)])
+            min_sq_dist = np.minimum(min_sq_dist, ((points - centres[-1]) ** 2).sum(axis=1))
+        centres = np.array(centres)
+        labels = None
+        for _ in range(iterations):
+            new_labels = ((points[:, None, :] - centres[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+            if labels is not None and (new_labels == labels).all():
+                break
+            labels = new_labels
+            for c in range(k):
+                members = points[labels == c]
+                if len(members):
+                    centres[c] = members.mean(axis=0)
+        return np.unique(labels, return_inverse=True)[1]
+
+    def _solve_subproblem(self, data_model, locations, deadline, initial_route=None):
+        """
+        Solve `data_model` restricted to the task nodes at `locations` (after a presolve
+        limited to them): exact DP when small enough, OR-Tools until `deadline` otherwise.
+        Returns (route stops as (location_idx, group_idx), info), stops None when the
+        locations cannot cover every group.
+        """
+        started = time.monotonic()
+        nodes = np.flatnonzero(np.isin(data_model.node_location, locations))
+        nodes = nodes[nodes != data_model.depot]
+        sub_model = data_model.select_nodes(nodes)
+        if self.presolve:
+            sub_model = self._presolve(sub_model, within=np.concatenate(([0], locations)))
+        info = {'locations': int(len(locations)), 'nodes': sub_model.num_nodes}
+        if not all(sub_model.task_nodes_for_group):
+            info['engine'] = None
+            return None, info
+
+        if len(sub_model.candidate_locations()) <= self.exact_max_locations:
+            info['engine'] = "exact_dp"
+            route_nodes, _ = self._solve_exact(sub_model)
+        else:
+            info['engine'] = "or_tools"
+            budget = self._solver_budget(sub_model.num_nodes, deadline)
+            manager, routing, solution = self._solve_with_or_tools(sub_model, budget, initial_route)
+            route_nodes = self._solution_route_nodes(manager, routing, solution) if solution else None
+        info['seconds'] = round(time.monotonic() - started, 3)
+        if route_nodes is None:
+            return None, info
+        stops = [(int(sub_model.node_location[n]), int(sub_model.node_group[n])) for n in route_nodes[1:-1]]
+        return stops, info
+
+    def _solve_decomposed(self, data_model, deadline=None, initial_route=None):
+        """
+        Geographic decomposition for instances with many candidate stores. Candidate
+        locations are split into k-means clusters; each cluster is solved on its own, plus
+        one cross-cluster sub-problem over the cheapest location of every group in every
+        cluster and each cluster's location closest to the user. The best sub-routes and
+        the locations around their stops are then merged into a polish sub-problem,
+        warm-started from the best route. All of it runs within
+        decomposition_time_limit_seconds (and `deadline`).
+
+        Returns (route_nodes, objective_scaled, report) in `data_model` nodes, route_nodes
+        None when no sub-problem covered every group.
+        """
+        started = time.monotonic()
+        end = started + self.decomposition_time_limit_seconds
+        if deadline is not None:
+            end = min(end, deadline)
+        cand_locs = np.asarray(data_model.candidate_locations(), dtype=np.int64)
+        # Equirectangular projection, plenty for clustering at city scale
+        lat0 = math.radians(data_model.locations[0, 0])
+        points = data_model.locations[cand_locs] * np.array([1.0, math.cos(lat0)])
+        labels = self._cluster_locations(points, math.ceil(len(cand_locs) / self.DECOMPOSITION_CLUSTER_LOCATIONS))
+        num_clusters = int(labels.max()) + 1 if len(labels) else 0
+
+        cheapest_price, _ = data_model.cheapest_nodes()
+        representatives = set()
+        clusters = []
+        for c in range(num_clusters):
+            locs = cand_locs[labels == c]
+            clusters.append(locs)
+            prices = cheapest_price[locs]
+            for group_idx in range(data_model.num_groups):
+                if np.isfinite(prices[:, group_idx]).any():
+                    representatives.add(int(locs[np.argmin(prices[:, group_idx])]))
+            representatives.add(int(locs[np.argmin(data_model.distance_km[0, locs])]))
+        # Cross-cluster first: with a low distance weight it usually holds the best route
+        subproblems = [("cross", np.array(sorted(representatives), dtype=np.int64))]
+        subproblems += [("cluster", locs) for locs in clusters]
+
+        solutions, report_subproblems = [], []
+
+        def solve(kind, locs, seed_route=None, solves_left=1):
+            sub_deadline = time.monotonic() + max(0.0, end - time.monotonic()) / solves_left
+            stops, info = self._solve_subproblem(data_model, locs, sub_deadline, seed_route)
+            info['kind'] = kind
+            if stops is not None:
+                route_nodes = [data_model.depot] + self._initial_route_nodes(data_model, stops) + [data_model.depot]
+                if len({int(data_model.node_group[n]) for n in route_nodes[1:-1]}) == data_model.num_groups:
+                    info['objective_scaled'] = self._route_objective_scaled(data_model, route_nodes)
+                    solutions.append((info['objective_scaled'], route_nodes, stops))
+            report_subproblems.append(info)
+
+        for i, (kind, locs) in enumerate(subproblems):
+            # The polish step keeps one share of the time
+            solve(kind, locs, solves_left=len(subproblems) - i + 1)
+
+        if solutions:
+            solutions.sort(key=lambda s: s[0])
+            polish_locs = {loc for _, _, stops in solutions[:self.DECOMPOSITION_POLISH_ROUTES] for loc, _ in stops}
+            if initial_route:
+                candidates = set(cand_locs.tolist())
+                polish_locs.update(loc for loc, _ in initial_route if loc in candidates)
+            for loc in list(polish_locs):
+                nearest = np.argsort(data_model.distance_km[loc, cand_locs])[:self.DECOMPOSITION_POLISH_NEIGHBORS + 1]
+                polish_locs.update(cand_locs[nearest].tolist())
+            solve("polish", np.array(sorted(polish_locs), dtype=np.int64), seed_route=solutions[0][2])
+            solutions.sort(key=lambda s: s[0])
+
+        report = {
+            'clusters': num_clusters,
+            'cluster_locations': [int(len(locs)) for locs in clusters],
+            'subproblems': report_subproblems,
+            'elapsed_seconds': round(time.monotonic() - started, 3),
+        }
+        if not solutions:
+            return None, None, report
+        best_objective, best_route, _ = solutions[0]
+        report['best'] = next(info['kind'] for info in report_subproblems if info.get('objective_scaled') == best_objective)
+        return best_route, best_objective, report
 
     def _parse_solution(self, data_model, manager, routing, solution):
         if not solution:
@@ -338,70 +1395,51 @@ class SearchService:
                 '_solver_status_code': routing.status() if routing else -1
             }]
 
-        detailed_node_map_orig_price = {} # Maps OR-Tools node index to its details
-        or_tools_node_idx_tracker = 1
-        for store_id, store_info in data_model['stores_info_orig'].items():
-            store_loc_idx = data_model['store_location_indices_orig'].get(store_id)
-            if store_loc_idx is None: continue
+        route_nodes_from_solution = self._solution_route_nodes(manager, routing, solution)
+        logger.info(f"DEBUG: Full route nodes from OR-Tools solution: {route_nodes_from_solution}")
+        return [self._build_trip_object(data_model, route_nodes_from_solution, solution.ObjectiveValue())]
 
-            for item_id, price in store_info.get('items', {}).items():
-                try:
-                    price_float = float(price)
-                except (ValueError, TypeError): continue
-                for group_set in data_model['req_groups_info_orig']:
-                    if item_id in group_set:
-                        detailed_node_map_orig_price[or_tools_node_idx_tracker] = {
-                            'item_id': item_id, 'store_id': store_id,
-                            'store_address': store_info.get('address', store_id),
-                            'price_original': price_float, 'location_idx': store_loc_idx
-                        }
-                        or_tools_node_idx_tracker += 1
-                        break
-        
+    @staticmethod
+    def _solution_route_nodes(manager, routing, solution):
+        """Node indices of the vehicle's route in an OR-Tools solution, depot to depot."""
+        # Solution chứa một chuỗi các OR-Tools Node Indices
+        current_or_tools_idx = routing.Start(0)
+        route_nodes = []
+        while not routing.IsEnd(current_or_tools_idx):
+            route_nodes.append(manager.IndexToNode(current_or_tools_idx))
+            current_or_tools_idx = solution.Value(routing.NextVar(current_or_tools_idx))
+        # Thêm node cuối cùng (thường là depot)
+        route_nodes.append(manager.IndexToNode(current_or_tools_idx))
+        return route_nodes
+
+    def _build_trip_object(self, data_model, route_nodes_from_solution, objective_scaled):
+        """
+        Turn a route, given as OR-Tools node indices starting and ending at the depot,
+        into the plan JSON returned by the API. Shared by every solver engine.
+        """
         trip_coordinates = []
         trip_waypoints_addresses = []
         trip_purchased_items = []
         total_trip_distance_km_to_last_store = 0 # Đổi tên để rõ ràng
         total_trip_duration_seconds_to_last_store = 0 # Đổi tên
+        return_leg_distance_km = 0.0 # Chặng về depot, chỉ dùng cho objective (tour khép kín)
 
         start_trip_location_idx = 0 
-        start_trip_address = self._get_location_address_helper(start_trip_location_idx, data_model)
-        start_trip_coords = self._get_coordinates_helper(start_trip_location_idx, data_model)
+        start_trip_address = data_model.location_address(start_trip_location_idx)
+        start_trip_coords = data_model.location_coordinates(start_trip_location_idx)
         
         trip_coordinates.append(start_trip_coords)
         trip_waypoints_addresses.append(start_trip_address)
 
         last_visited_physical_location_idx_for_waypoint = start_trip_location_idx # Chỉ để quản lý waypoints
         
-        visited_or_tools_nodes_in_order = []
-        temp_index = routing.Start(0)
-        while not routing.IsEnd(temp_index):
-            visited_or_tools_nodes_in_order.append(manager.IndexToNode(temp_index))
-            temp_index = solution.Value(routing.NextVar(temp_index))
-        # KHÔNG thêm điểm cuối (depot) vào đây nếu không muốn tính chặng về
-        # visited_or_tools_nodes_in_order.append(manager.IndexToNode(temp_index)) # Dòng này có thể bỏ nếu không muốn xử lý chặng cuối cùng trong vòng lặp
-
-
         last_store_physical_loc_idx = -1 # Sẽ lưu location_idx của cửa hàng cuối cùng ghé
         last_store_address = start_trip_address # Mặc định nếu không ghé cửa hàng nào
         last_store_item_purchase_node = -1 # OR-Tools node của task mua hàng cuối cùng
 
 
         # Lặp qua các CHẶNG ĐƯỜNG (arcs) của lộ trình
-        # Nếu không muốn tính chặng cuối về depot, chỉ lặp đến trước chặng cuối
-        # num_arcs_to_consider = len(visited_or_tools_nodes_in_order) - 1
-        
-        # Xây dựng lại lộ trình từ solution để lấy các task thực sự
-        # Solution chứa một chuỗi các OR-Tools Node Indices
-        current_or_tools_idx = routing.Start(0)
-        route_nodes_from_solution = []
-        while not routing.IsEnd(current_or_tools_idx):
-            route_nodes_from_solution.append(manager.IndexToNode(current_or_tools_idx))
-            current_or_tools_idx = solution.Value(routing.NextVar(current_or_tools_idx))
-        # Thêm node cuối cùng (thường là depot)
-        route_nodes_from_solution.append(manager.IndexToNode(current_or_tools_idx))
-
-        logger.info(f"DEBUG: Full route nodes from OR-Tools solution: {route_nodes_from_solution}")
+        # Chặng cuối về depot không được tính vào distance/duration
 
         # Bây giờ lặp qua các CUNG ĐƯỜNG (legs) của lộ trình này
         for i in range(len(route_nodes_from_solution) - 1):
@@ -414,21 +1452,20 @@ class SearchService:
             # thì chặng này (i) là chặng về.
             
             is_last_leg_to_depot = False
-            if to_or_tools_node_in_path == data_model['depot'] and i == len(route_nodes_from_solution) - 2:
+            if to_or_tools_node_in_path == data_model.depot and i == len(route_nodes_from_solution) - 2:
                 is_last_leg_to_depot = True
                 logger.info(f"DEBUG: Identified last leg to depot: from {from_or_tools_node_in_path} to {to_or_tools_node_in_path}. Skipping distance/duration for this leg.")
+                if from_or_tools_node_in_path != data_model.depot:
+                    from_loc_idx = data_model.node_location[from_or_tools_node_in_path]
+                    return_leg_distance_km = float(data_model.distance_km[from_loc_idx, 0])
 
 
             leg_distance_km = 0.0
             if not is_last_leg_to_depot: # Chỉ tính khoảng cách nếu không phải chặng cuối về nhà
-                from_loc_idx = 0 if from_or_tools_node_in_path == data_model['depot'] else data_model['node_to_store_map'].get(from_or_tools_node_in_path)
-                to_loc_idx = 0 if to_or_tools_node_in_path == data_model['depot'] else data_model['node_to_store_map'].get(to_or_tools_node_in_path)
-
-                if from_loc_idx is not None and to_loc_idx is not None:
-                    leg_distance_km = data_model['distance_matrix_physical_km'][from_loc_idx][to_loc_idx]
-                    total_trip_distance_km_to_last_store += leg_distance_km
-                else:
-                    logger.warning(f"Could not map nodes to loc_idx for leg: {from_or_tools_node_in_path} -> {to_or_tools_node_in_path}")
+                from_loc_idx = data_model.node_location[from_or_tools_node_in_path]
+                to_loc_idx = data_model.node_location[to_or_tools_node_in_path]
+                leg_distance_km = float(data_model.distance_km[from_loc_idx, to_loc_idx])
+                total_trip_distance_km_to_last_store += leg_distance_km
             
             # Duration vẫn tính từ leg_distance_km (sẽ là 0 nếu is_last_leg_to_depot)
             leg_duration_hours = leg_distance_km / self.average_speed_kmh if self.average_speed_kmh > 0 else 0
@@ -437,8 +1474,8 @@ class SearchService:
                 total_trip_duration_seconds_to_last_store += leg_duration_seconds
 
             # Xử lý việc mua hàng và waypoints (logic này vẫn giữ nguyên)
-            if to_or_tools_node_in_path != data_model['depot']: # Đây là một task node (cửa hàng)
-                task_detail = detailed_node_map_orig_price.get(to_or_tools_node_in_path)
+            if to_or_tools_node_in_path != data_model.depot: # Đây là một task node (cửa hàng)
+                task_detail = data_model.node_detail(to_or_tools_node_in_path) if to_or_tools_node_in_path < data_model.num_nodes else None
                 if task_detail:
                     trip_purchased_items.append({
                         "item_id": task_detail['item_id'],
@@ -449,13 +1486,13 @@ class SearchService:
                     current_physical_loc_idx = task_detail['location_idx']
                     # Cập nhật thông tin cửa hàng cuối cùng
                     last_store_physical_loc_idx = current_physical_loc_idx
-                    last_store_address = self._get_location_address_helper(current_physical_loc_idx, data_model)
+                    last_store_address = data_model.location_address(current_physical_loc_idx)
                     last_store_item_purchase_node = to_or_tools_node_in_path
 
 
                     if current_physical_loc_idx != last_visited_physical_location_idx_for_waypoint:
-                        trip_coordinates.append(self._get_coordinates_helper(current_physical_loc_idx, data_model))
-                        trip_waypoints_addresses.append(self._get_location_address_helper(current_physical_loc_idx, data_model))
+                        trip_coordinates.append(data_model.location_coordinates(current_physical_loc_idx))
+                        trip_waypoints_addresses.append(data_model.location_address(current_physical_loc_idx))
                         last_visited_physical_location_idx_for_waypoint = current_physical_loc_idx
             # Không cần xử lý đặc biệt cho to_node là depot cuối cùng ở đây nữa vì đã check is_last_leg_to_depot
 
@@ -478,29 +1515,44 @@ class SearchService:
             'duration': int(total_trip_duration_seconds_to_last_store/60), # Thời gian đến cửa hàng cuối
             'coordinates': trip_coordinates, # Vẫn bao gồm tất cả các điểm đã ghé
             'waypoints': trip_waypoints_addresses, # Vẫn bao gồm tất cả các điểm đã ghé
-            '_solver_objective_scaled': solution.ObjectiveValue(), 
+            '_solver_objective_scaled': objective_scaled, 
+            '_tour_distance_km': round(total_trip_distance_km_to_last_store + return_leg_distance_km, 3),
+            '_solver_mode': data_model.solver_mode,
+            '_solver_num_nodes': data_model.num_nodes,
+            '_presolve': data_model.presolve,
+            # (location_idx, group_idx) per purchase in visiting order; lets a later solve warm-start from this route
+            '_route_stops': [
+                [int(data_model.node_location[node]), int(data_model.node_group[node])]
+                for node in route_nodes_from_solution if node != data_model.depot and node < data_model.num_nodes
+            ],
             '_coverage_check': {}, 
             '_purchased_items_details': trip_purchased_items
         }
 
         
         # --- Coverage Check  ---
-        covered_groups_flags = [False] * len(data_model['req_groups_info_orig'])
+        covered_groups_flags = [False] * len(data_model.groups)
         for item_info in trip_purchased_items:
-            for i, group_set in enumerate(data_model['req_groups_info_orig']):
+            for i, group_set in enumerate(data_model.groups):
                 if item_info['item_id'] in group_set:
                     covered_groups_flags[i] = True
                     break
         
-        for i, group_set in enumerate(data_model['req_groups_info_orig']):
+        for i, group_set in enumerate(data_model.groups):
             group_key_name = "_".join(sorted(list(group_set))[:2]) if group_set else f"empty_group_{i+1}"
             if not group_key_name: group_key_name = f"group_{i+1}"
             final_trip_object['_coverage_check'][f"group_{group_key_name}"] = "COVERED" if covered_groups_flags[i] else "NOT_COVERED"
 
-        # The result is a list containing this single trip object
-        return [final_trip_object]
+        return final_trip_object
 
-    def find_optimal_shopping_plan(self, stores_for_search, required_item_groups, user_loc):
+    def find_optimal_shopping_plan(self, stores_for_search, required_item_groups, user_loc, base_model=None, distance_cost_per_km=None,
+                                   deadline=None, initial_route=None):
+        """
+        Solve one weighted shopping plan. `base_model` lets callers that solve several
+        weights for the same input reuse one _prepare_base_model result (and its
+        distance matrix) instead of rebuilding it per call. `deadline` (time.monotonic())
+        caps the OR-Tools time limit and `initial_route` warm-starts it.
+        """
         logger.info("Received request for optimal shopping plan (single trip output).")
         # ... (input validation as before, returning [{_error_message:...}] on error) ...
         if not stores_for_search or not required_item_groups or not user_loc:
@@ -512,8 +1564,16 @@ class SearchService:
             }]
 
 
-        logger.info("Preparing data model...")
-        data_model = self._prepare_data_model(stores_for_search, user_loc, required_item_groups)
+        if base_model is None:
+            logger.info("Preparing data model...")
+            base_model = self._prepare_base_model(stores_for_search, user_loc, required_item_groups)
+        return self._solve_base_model(base_model, distance_cost_per_km, deadline, initial_route)
+
+    def _solve_base_model(self, base_model, distance_cost_per_km=None, deadline=None, initial_route=None):
+        """find_optimal_shopping_plan once the base model is built; all a pool worker needs."""
+        if distance_cost_per_km is None:
+            distance_cost_per_km = self.distance_cost_per_km
+        data_model = self._apply_distance_cost(base_model, distance_cost_per_km) if base_model is not None else None
         
         if data_model is None:
             logger.error("Failed to prepare data model.")
@@ -523,8 +1583,8 @@ class SearchService:
                 '_error_message': "Error preparing data for OR-Tools."
             }]
         
-        for i, task_nodes in enumerate(data_model['task_nodes_for_group']):
-            group_set = required_item_groups[i]
+        for i, task_nodes in enumerate(data_model.task_nodes_for_group):
+            group_set = data_model.groups[i]
             if not task_nodes and group_set:
                 group_name_preview = "_".join(sorted(list(group_set))[:2])
                 msg = f"No items available for a required group: ({group_name_preview}...). Cannot find a valid plan."
@@ -536,8 +1596,54 @@ class SearchService:
                     '_status_code': "INFEASIBLE_REQUIREMENTS"
                 }]
 
-        logger.info(f"Data model prepared. Num_nodes: {data_model['num_nodes']}, Num_locations: {len(data_model['locations'])}")
-        manager, routing, solution = self._solve_with_or_tools(data_model)
+        logger.info(f"Data model prepared. Num_nodes: {data_model.num_nodes}, Num_locations: {data_model.num_locations}")
+        engine = self._select_engine(data_model)
+        if engine == "exact_dp":
+            logger.info("Solving with exact DP engine...")
+            route_nodes, objective_scaled = self._solve_exact(data_model)
+            if route_nodes is None:
+                return [{
+                    'start': "N/A", 'end': "N/A", 'cost': 0, 'distance': 0, 'duration': 0,
+                    'coordinates': [], 'waypoints': [],
+                    '_error_message': "Exact solver found no store combination covering all groups.",
+                    '_solver_engine': engine
+                }]
+            plan = self._build_trip_object(data_model, route_nodes, objective_scaled)
+            plan['_solver_engine'] = engine
+            logger.info("Optimal shopping plan (exact DP) processed successfully.")
+            return [plan]
+
+        if engine == "cp_sat":
+            budget = self._solver_budget(data_model.num_nodes, deadline)
+            route_nodes, objective_scaled = self._solve_cp_sat(data_model, budget, initial_route)
+            if route_nodes is None:
+                return [{
+                    'start': "N/A", 'end': "N/A", 'cost': 0, 'distance': 0, 'duration': 0,
+                    'coordinates': [], 'waypoints': [],
+                    '_error_message': f"CP-SAT found no solution. Status: {budget['status']}",
+                    '_solver_engine': engine,
+                    '_solver_budget': budget
+                }]
+            plan = self._build_trip_object(data_model, route_nodes, objective_scaled)
+            plan['_solver_engine'] = engine
+            plan['_solver_budget'] = budget
+            logger.info("Optimal shopping plan (CP-SAT) processed successfully.")
+            return [plan]
+
+        if engine == "decomposed":
+            logger.info("Solving with geographic decomposition...")
+            route_nodes, objective_scaled, decomposition = self._solve_decomposed(data_model, deadline, initial_route)
+            if route_nodes is not None:
+                plan = self._build_trip_object(data_model, route_nodes, objective_scaled)
+                plan['_solver_engine'] = engine
+                plan['_decomposition'] = decomposition
+                logger.info("Optimal shopping plan (decomposition) processed successfully.")
+                return [plan]
+            logger.warning("Decomposition found no plan covering every group, solving the full model.")
+            engine = "or_tools"
+
+        budget = self._solver_budget(data_model.num_nodes, deadline)
+        manager, routing, solution = self._solve_with_or_tools(data_model, budget, initial_route)
 
         if not solution: # Handle no solution from solver
             status_map = {0: "ROUTING_NOT_SOLVED", 1: "ROUTING_SUCCESS", 2: "ROUTING_FAIL",
@@ -548,26 +1654,96 @@ class SearchService:
                 'start': "N/A", 'end': "N/A", 'cost': 0, 'distance': 0, 'duration': 0,
                 'coordinates': [], 'waypoints': [],
                 '_error_message': f"Solver did not find a solution. Status: {solver_status_str}",
-                '_solver_status_code': routing.status() if routing else -1
+                '_solver_status_code': routing.status() if routing else -1,
+                '_solver_budget': budget
             }]
 
 
         logger.info("Solution found. Parsing results for single trip output...")
         parsed_plan = self._parse_solution(data_model, manager, routing, solution)
+        for p in parsed_plan:
+            p['_solver_engine'] = engine
+            p['_solver_budget'] = budget
         logger.info("Optimal shopping plan (single trip) processed successfully.")
         return parsed_plan
 
     def get_plans_from_nearby(
         self,
         stores_list: List[dict],  
-        user_loc_tuple: Tuple[float, float] 
+        user_loc_tuple: Tuple[float, float],
+        plan_mode: str = "weights",
+        max_plans: Optional[int] = None,
+        latency_budget_seconds: Optional[float] = None,
+        on_plan: Optional[Callable[[List[dict]], None]] = None,
+        session_id: Optional[str] = None
     ) -> List[dict]:
+        """
+        Plans for the stores returned by /search/nearby. `latency_budget_seconds` bounds
+        the solving time of the whole request (defaults to SOLVER_LATENCY_BUDGET_SECONDS,
+        0 for none); it is shared between the sequential solves.
+
+        `on_plan(plans)` is called with the plans of each solve (weight or Pareto point) as
+        soon as it finishes, for streaming; the returned list is the final answer (Pareto
+        points found early may be dropped or reordered there). With anytime_plan, the
+        first call carries a greedy plan for the first weight (`_provisional`, id 0) built
+        in milliseconds, to show until the solved plans arrive.
+
+        With a `session_id`, the request, its base model and its plans are kept in
+        plan_sessions so that replan can answer edits of it.
+        """
+        return self._plan_request(
+            stores_list, user_loc_tuple, plan_mode, max_plans, latency_budget_seconds, on_plan, session_id=session_id
+        )
+
+    def replan(self, session_id: str, delta: dict, on_plan: Optional[Callable[[List[dict]], None]] = None) -> Optional[List[dict]]:
+        """
+        Plans for a session after an edit of its shopping list or stores (`delta`, see
+        PlanSessionService.apply_delta), with the plan options of the original request.
+        The distance matrix and start address of the session's base model are reused when
+        no store location was added, node tables are rebuilt from the edited request, and
+        every solve is warm-started from the session's plan with the same id. Starting
+        next to the answer, solves stop after REPLAN_NO_IMPROVEMENT_FRACTION of their time
+        limit without improvement instead of NO_IMPROVEMENT_FRACTION.
+
+        Returns None when the session is unknown or expired; raises ValueError for a
+        delta that leaves nothing to plan.
+        """
+        if self.plan_sessions is None:
+            return None
+        session, previous_model = self.plan_sessions.get(session_id)
+        if session is None:
+            return None
+        session = PlanSessionService.apply_delta(session, delta)
+        plan_kwargs = session['plan_kwargs']
+        # Copy, so concurrent requests on this service keep the regular budget
+        replanner = copy.copy(self)
+        replanner.no_improvement_fraction = self.REPLAN_NO_IMPROVEMENT_FRACTION
+        return replanner._plan_request(
+            session['stores_list'], tuple(session['user_loc']), plan_kwargs['plan_mode'], plan_kwargs['max_plans'],
+            plan_kwargs['latency_budget_seconds'], on_plan, session_id=session_id, product_names=session['product_names'],
+            previous_session=session, previous_model=previous_model
+        )
+
+    def _plan_request(self, stores_list, user_loc_tuple, plan_mode, max_plans, latency_budget_seconds, on_plan,
+                      session_id=None, product_names=None, previous_session=None, previous_model=None):
+        """
+        get_plans_from_nearby and replan. `product_names` are the required products, in
+        group order (default: the products of the first store); `previous_session` and
+        `previous_model` are the session being replanned and its base model, if held here.
+        """
+        started = time.monotonic()
+        if plan_mode not in self.PLAN_MODES:
+            raise ValueError(f"Unknown plan_mode '{plan_mode}', expected one of {self.PLAN_MODES}")
         if not stores_list:
             logger.warning("get_plans_from_nearby: Empty stores_list provided.")
             return []
 
         original_product_groups_structure = [] # Lưu lại cấu trúc product_name và candidates ban đầu
-        if stores_list:
+        if product_names is not None:
+            original_product_groups_structure = [
+                {"product_name": name, "candidates_names": set()} for name in product_names
+            ]
+        elif stores_list:
             for item_info_template in stores_list[0].get("items", []):
                 product_name_needed = item_info_template.get("product_name")
                 if product_name_needed:
@@ -661,20 +1837,370 @@ class SearchService:
         logger.debug("-------------------------------------------------")
 
 
+        session_request = {
+            'stores_list': stores_list,
+            'user_loc': list(user_loc_tuple),
+            'product_names': [pg['product_name'] for pg in original_product_groups_structure],
+            'plan_kwargs': {'plan_mode': plan_mode, 'max_plans': max_plans, 'latency_budget_seconds': latency_budget_seconds},
+        }
+        if latency_budget_seconds is None:
+            latency_budget_seconds = Config.SOLVER_LATENCY_BUDGET_SECONDS
+        plan_cache_key = None
+        if self.plan_cache is not None:
+            plan_cache_key = self.plan_cache.make_key(
+                stores_for_search, required_item_groups, user_loc_for_solver,
+                self._plan_cache_params(plan_mode, max_plans, latency_budget_seconds)
+            )
+            cached_plans = self.plan_cache.get(plan_cache_key)
+            if cached_plans is not None:
+                logger.info(f"Plan cache hit ({plan_cache_key[:16]}...), skipping the solver.")
+                for p in cached_plans:
+                    p['_plan_cache'] = "hit"
+                self._notify_plan(on_plan, cached_plans)
+                if session_id is not None:
+                    self._save_session(session_id, session_request, cached_plans, previous_model)
+                return cached_plans
+
+        # Node tables và ma trận khoảng cách chỉ phụ thuộc vào input, dựng một lần cho mọi trọng số
+        base_model = self._prepare_base_model(stores_for_search, user_loc_for_solver, required_item_groups, previous=previous_model)
+        # Replan: mỗi plan bắt đầu từ lộ trình của plan cùng id trong session
+        initial_routes = {}
+        if previous_session is not None and base_model is not None:
+            initial_routes = {
+                int(plan_id): self._purchase_stops(base_model, stores_for_search, purchases)
+                for plan_id, purchases in previous_session.get('purchases', {}).items()
+            }
+
         # --- Gọi find_optimal_shopping_plan nhiều lần với distance_cost_per_km khác nhau ---
-        results = []
-        distance_costs_to_try = [0, 500, 500000] # Các giá trị bạn muốn thử
-
-        for i, cost_per_km in enumerate(distance_costs_to_try):
-            self.distance_cost_per_km = cost_per_km # Cập nhật cho instance
-            logger.info(f"\n--- Finding plan with DISTANCE_COST_PER_KM = {self.distance_cost_per_km} ---")
-            plan = self.find_optimal_shopping_plan(
-                stores_for_search=stores_for_search,
-                required_item_groups=required_item_groups,
-                user_loc=user_loc_for_solver
+        distance_costs_to_try = self.DISTANCE_COSTS_TO_TRY # Các giá trị bạn muốn thử
+
+        # Exact DP solves take milliseconds, shipping them to the pool would only add overhead
+        use_pool = (
+            self.execution_mode == "process_pool"
+            and base_model is not None
+            and self._select_engine(base_model) != "exact_dp"
+        )
+        deadline = started + latency_budget_seconds if latency_budget_seconds else None
+        solve_args = (stores_for_search, required_item_groups, user_loc_for_solver, base_model, deadline)
+        # Exact DP answers about as fast as the greedy construction, nothing to show before it
+        if on_plan is not None and self.anytime_plan and base_model is not None and self._select_engine(base_model) != "exact_dp":
+            greedy_plan = self._greedy_plan(base_model, distance_costs_to_try[0])
+            if greedy_plan is not None:
+                self._notify_plan(on_plan, [greedy_plan], plan_id=0)
+        if plan_mode == "pareto":
+            plans_per_weight = self._solve_pareto(
+                solve_args, max_plans or self.DEFAULT_MAX_PARETO_PLANS, use_pool, on_plan, initial_routes
             )
+        elif use_pool:
+            plans_per_weight = self._solve_weights_in_pool(
+                solve_args, distance_costs_to_try, on_plan, [initial_routes.get(i) for i in range(len(distance_costs_to_try))]
+            )
+        else:
+            # Mỗi trọng số bắt đầu từ lộ trình của trọng số trước (warm start)
+            plans_per_weight = []
+            for i, cost_per_km in enumerate(distance_costs_to_try):
+                initial_route = initial_routes.get(i)
+                if not initial_route and plans_per_weight:
+                    initial_route = self._warm_start_route(plans_per_weight[-1])
+                plans_per_weight.append(self._solve_weight(
+                    solve_args, cost_per_km, solves_left=len(distance_costs_to_try) - i, initial_route=initial_route
+                ))
+                self._notify_plan(on_plan, plans_per_weight[-1], plan_id=i)
+
+        results = []
+        for i, plan in enumerate(plans_per_weight):
             for p in plan:
                 p['id'] = i
             results.extend(plan) 
 
+        # Lỗi (timeout, thiếu dữ liệu...) và ma trận Haversine do ORS lỗi có thể là tạm thời, không cache
+        if (plan_cache_key is not None and results and not any(p.get('_error_message') for p in results)
+                and (base_model is None or base_model.distance_source != "haversine")):
+            self.plan_cache.set(plan_cache_key, results)
+        if session_id is not None:
+            self._save_session(session_id, session_request, results, base_model if base_model is not None else previous_model)
         return results
+
+    def _save_session(self, session_id, session_request, plans, base_model):
+        """Keep a request for replan, with the purchases of its plans as warm starts."""
+        if self.plan_sessions is None:
+            return
+        purchases = {
+            str(p['id']): [[item['store_id'], item['item_id']] for item in p['_purchased_items_details']]
+            for p in plans if 'id' in p and p.get('_purchased_items_details') and not p.get('_error_message')
+        }
+        try:
+            self.plan_sessions.save(session_id, dict(session_request, purchases=purchases), base_model)
+        except Exception as e:
+            logger.error(f"Could not save plan session {session_id}: {e}")
+
+    @staticmethod
+    def _purchase_stops(base_model, stores_for_search, purchases):
+        """
+        (location_idx, group_idx) stops of `base_model` for [store_id, item_id] purchases
+        of another request; purchases of stores or items it no longer has are dropped.
+        """
+        location_of = {tuple(loc): idx for idx, loc in enumerate(base_model.locations.tolist())}
+        stops = []
+        for store_id, item_id in purchases:
+            store = stores_for_search.get(store_id)
+            if store is None:
+                continue
+            location_idx = location_of.get((float(store['lat']), float(store['lng'])))
+            group_idx = next((g for g, group in enumerate(base_model.groups) if item_id in group), None)
+            if location_idx is not None and group_idx is not None:
+                stops.append((location_idx, group_idx))
+        return stops
+
+    @staticmethod
+    def _notify_plan(on_plan, plan_list, plan_id=None):
+        """Hand finished plans to an on_plan listener; a failing listener must not abort the solve."""
+        if on_plan is None:
+            return
+        if plan_id is not None:
+            for p in plan_list:
+                p['id'] = plan_id
+        try:
+            on_plan(plan_list)
+        except Exception as e:
+            logger.error(f"on_plan listener failed: {e}")
+
+    def _solver_settings(self):
+        """Constructor settings (and no_improvement_fraction) a pool worker needs to solve a base model as this service does."""
+        return {
+            'distance_cost_per_km': self.distance_cost_per_km,
+            'item_price_scale_factor': self.item_price_scale_factor,
+            'time_limit_seconds': self.time_limit_seconds,
+            'average_speed_kmh': self.average_speed_kmh,
+            'solver_mode': self.solver_mode,
+            'solver_engine': self.solver_engine,
+            'exact_max_locations': self.exact_max_locations,
+            'presolve': self.presolve,
+            'time_budget_policy': self.time_budget_policy,
+            'max_time_limit_seconds': self.max_time_limit_seconds,
+            'no_improvement_seconds': self.no_improvement_seconds,
+            'no_improvement_fraction': self.no_improvement_fraction,
+            'warm_start': self.warm_start,
+            'transit_evaluator': self.transit_evaluator,
+            'decomposition_min_locations': self.decomposition_min_locations,
+            'decomposition_time_limit_seconds': self.decomposition_time_limit_seconds,
+            'cp_sat_workers': self.cp_sat_workers,
+            'cp_sat_gap_limit': self.cp_sat_gap_limit,
+            'cost_model': self.cost_model,
+            'solver_telemetry': self.solver_telemetry,
+        }
+
+    def _plan_cache_params(self, plan_mode, max_plans, latency_budget_seconds):
+        """Every setting that changes the plans returned for a given input."""
+        return {
+            'plan_mode': plan_mode,
+            'max_plans': max_plans,
+            'latency_budget_seconds': latency_budget_seconds,
+            'distance_costs': self.DISTANCE_COSTS_TO_TRY,
+            'item_price_scale_factor': self.item_price_scale_factor,
+            'average_speed_kmh': self.average_speed_kmh,
+            'solver_mode': self.solver_mode,
+            'solver_engine': self.solver_engine,
+            'exact_max_locations': self.exact_max_locations,
+            'decomposition_min_locations': self.decomposition_min_locations,
+            'decomposition_time_limit_seconds': self.decomposition_time_limit_seconds,
+            'cp_sat_workers': self.cp_sat_workers,
+            'cp_sat_gap_limit': self.cp_sat_gap_limit,
+            # Pooled weights are solved without the sequential warm start chain
+            'execution_mode': self.execution_mode,
+            'presolve': self.presolve,
+            'time_budget_policy': self.time_budget_policy,
+            'time_limit_seconds': self.time_limit_seconds,
+            'max_time_limit_seconds': self.max_time_limit_seconds,
+            'no_improvement_seconds': self.no_improvement_seconds,
+            'no_improvement_fraction': self.no_improvement_fraction,
+            'warm_start': self.warm_start,
+            'transit_evaluator': self.transit_evaluator,
+            'cost_model': self.cost_model,
+            # Adds the search telemetry to the plans' debug output
+            'solver_telemetry': self.solver_telemetry,
+            # Local road network distances instead of ORS
+            'road_network': Config.ROAD_NETWORK_PATH if get_road_network() is not None else None,
+        }
+
+    def _greedy_plan(self, base_model, distance_cost_per_km):
+        """Provisional plan from _greedy_route for one weight, or None when no route covers every group."""
+        started = time.monotonic()
+        data_model = self._apply_distance_cost(base_model, distance_cost_per_km)
+        route_nodes = self._greedy_route(data_model)
+        if route_nodes is None:
+            return None
+        plan = self._build_trip_object(data_model, route_nodes, self._route_objective_scaled(data_model, route_nodes))
+        plan['_solver_engine'] = "greedy"
+        plan['_provisional'] = True
+        plan['_greedy_seconds'] = round(time.monotonic() - started, 4)
+        return plan
+
+    def _warm_start_route(self, plan_list):
+        """Route stops of a solved plan to seed the next solve, or None."""
+        if not self.warm_start or not plan_list or plan_list[0].get('_error_message'):
+            return None
+        return plan_list[0].get('_route_stops') or None
+
+    def _solve_weight(self, solve_args, cost_per_km, solves_left=1, initial_route=None):
+        """One weighted solve; with a request deadline it gets an equal share of the time left for `solves_left` solves."""
+        stores_for_search, required_item_groups, user_loc, base_model, deadline = solve_args
+        if deadline is not None:
+            deadline = time.monotonic() + max(0.0, deadline - time.monotonic()) / max(1, solves_left)
+        logger.info(f"\n--- Finding plan with DISTANCE_COST_PER_KM = {cost_per_km} ---")
+        return self.find_optimal_shopping_plan(
+            stores_for_search=stores_for_search,
+            required_item_groups=required_item_groups,
+            user_loc=user_loc,
+            base_model=base_model,
+            distance_cost_per_km=cost_per_km,
+            deadline=deadline,
+            initial_route=initial_route
+        )
+
+    def _plan_point(self, plan):
+        """(scaled item cost, tour km) of a plan, the two objectives the solver trades off."""
+        if plan.get('_error_message') or '_tour_distance_km' not in plan:
+            return None
+        return (round(plan['cost'] * self.item_price_scale_factor, 2), plan['_tour_distance_km'])
+
+    def _solve_pareto(self, solve_args, max_plans, use_pool, on_plan=None, initial_routes=None):
+        """
+        Approximate the price-vs-distance Pareto frontier by weight bisection: solve the two
+        extreme weights, then for each pair of neighbouring plans solve the weight at which
+        both have the same weighted cost. A segment is closed as soon as that weight returns
+        one of its end plans (or nothing strictly better), so redundant solves are skipped.
+        Returns up to `max_plans` non-dominated plans ordered by item cost.
+
+        `initial_routes` ({plan id: stops}, from a replanned session) warm-start the two
+        extremes from the cheapest and the shortest earlier plan.
+        """
+        low_weight, high_weight = self.DISTANCE_COSTS_TO_TRY[0], self.DISTANCE_COSTS_TO_TRY[-1]
+        seeds = [None, None]
+        if initial_routes:
+            seeds = [initial_routes[min(initial_routes)] or None, initial_routes[max(initial_routes)] or None]
+        if use_pool:
+            extremes = self._solve_weights_in_pool(solve_args, [low_weight, high_weight], initial_routes=seeds)
+        else:
+            extremes = [self._solve_weight(solve_args, low_weight, solves_left=2, initial_route=seeds[0])]
+            extremes.append(self._solve_weight(
+                solve_args, high_weight, initial_route=seeds[1] or self._warm_start_route(extremes[0])
+            ))
+
+        frontier = {}
+        def add(plan_list, weight):
+            plan = plan_list[0]
+            point = self._plan_point(plan)
+            if point is not None and point not in frontier:
+                plan['_pareto_weight'] = weight
+                frontier[point] = plan
+                self._notify_plan(on_plan, plan_list)
+            return point
+
+        cheapest = add(extremes[0], low_weight)
+        shortest = add(extremes[1], high_weight)
+        if cheapest is None and shortest is None:
+            return [extremes[0]]
+
+        segments = [(cheapest, shortest)] if cheapest and shortest and cheapest != shortest else []
+        solves, max_solves = 2, 2 * max_plans + 1
+        while segments and len(frontier) < max_plans and solves < max_solves:
+            left, right = segments.pop(0) # left: rẻ hơn nhưng xa hơn, right: đắt hơn nhưng gần hơn
+            if not (left[0] < right[0] and left[1] > right[1]):
+                continue
+            weight = (right[0] - left[0]) / (left[1] - right[1])
+            # Warm start from the cheaper end of the segment
+            middle = add(self._solve_weight(
+                solve_args, weight, solves_left=max_solves - solves, initial_route=self._warm_start_route([frontier[left]])
+            ), weight)
+            solves += 1
+            if middle is None or middle in (left, right):
+                continue
+            if middle[0] + weight * middle[1] < left[0] + weight * left[1] - 1e-6:
+                segments.extend([(left, middle), (middle, right)])
+
+        points = sorted(
+            point for point in frontier
+            if not any(other != point and other[0] <= point[0] and other[1] <= point[1] for other in frontier)
+        )
+        logger.info(f"Pareto search: {solves} solves, {len(points)} non-dominated plans.")
+        return [[frontier[point]] for point in points[:max_plans]]
+
+    def _solve_weights_in_pool(self, solve_args, distance_costs, on_plan=None, initial_routes=None):
+        """
+        Dispatch one solve per weight to the shared process pool and gather the plans in
+        the order of `distance_costs`, each warm-started from its entry of `initial_routes`
+        if any. All solves share one timeout: the waves of SOLVER_POOL_SIZE solves needed
+        at _max_solve_seconds each, capped by the request deadline. Workers end their
+        solves by then; the web process waits SOLVER_POOL_TIMEOUT_MARGIN_SECONDS longer.
+        Solves unfinished after that are cancelled and yield an error plan, and a worker
+        still running one is killed with the pool. A broken pool is recreated and the
+        remaining weights are solved in-process.
+        """
+        initial_routes = initial_routes or [None] * len(distance_costs)
+        _, _, _, base_model, deadline = solve_args
+        solver_settings = self._solver_settings()
+
+        waves = math.ceil(len(distance_costs) / max(1, Config.SOLVER_POOL_SIZE))
+        timeout = waves * self._max_solve_seconds()
+        if deadline is not None:
+            timeout = min(timeout, max(0.0, deadline - time.monotonic()))
+        # Workers stop solving at solve_deadline; the margin covers pickling and process start
+        solve_deadline = time.monotonic() + timeout
+        timeout += Config.SOLVER_POOL_TIMEOUT_MARGIN_SECONDS
+        wait_until = time.monotonic() + timeout
+        try:
+            pool = _get_solver_pool()
+            futures = [
+                pool.submit(_solve_weight_in_worker, solver_settings, base_model, solve_deadline, cost_per_km, initial_route)
+                for cost_per_km, initial_route in zip(distance_costs, initial_routes)
+            ]
+        except (BrokenProcessPool, RuntimeError) as e:
+            logger.error(f"Solver pool unavailable, solving sequentially: {e}")
+            _reset_solver_pool()
+            plans_per_weight = []
+            for i, cost_per_km in enumerate(distance_costs):
+                plans_per_weight.append(self._solve_weight(solve_args, cost_per_km, initial_route=initial_routes[i]))
+                self._notify_plan(on_plan, plans_per_weight[-1], plan_id=i)
+            return plans_per_weight
+
+        # Plans are handed to on_plan in weight order; a solve gets whatever is left of the
+        # shared timeout once the earlier weights are done
+        plans_per_weight = []
+        for future, cost_per_km, initial_route in zip(futures, distance_costs, initial_routes):
+            if not wait([future], timeout=max(0.0, wait_until - time.monotonic())).done:
+                logger.error(f"Pooled solve for DISTANCE_COST_PER_KM = {cost_per_km} timed out after {timeout:.1f}s.")
+                if not future.cancel():
+                    # Running past its deadline: the worker is stuck, replace the pool
+                    logger.error("Pool worker overran the solve deadline, recycling the solver pool.")
+                    _reset_solver_pool(terminate=True)
+                plans_per_weight.append([self._timeout_plan(f"Solver timed out after {timeout:.1f}s.")])
+            else:
+                try:
+                    plans_per_weight.append(future.result())
+                    self._observe_telemetry(plans_per_weight[-1])
+                except BrokenProcessPool as e:
+                    logger.error(f"Solver pool broke during solve, retrying in-process: {e}")
+                    _reset_solver_pool()
+                    plans_per_weight.append(self._solve_weight(solve_args, cost_per_km, initial_route=initial_route))
+            self._notify_plan(on_plan, plans_per_weight[-1], plan_id=len(plans_per_weight) - 1)
+        return plans_per_weight
+
+    @staticmethod
+    def _timeout_plan(message):
+        """Error plan of a pooled solve that did not finish in time."""
+        return {
+            'start': "N/A", 'end': "N/A", 'cost': 0, 'distance': 0, 'duration': 0,
+            'coordinates': [], 'waypoints': [],
+            '_error_message': message,
+            '_status_code': "SOLVER_TIMEOUT"
+        }
+
+    def _observe_telemetry(self, plans):
+        """Add the telemetry of plans solved in a pool worker, which has no metrics client, to solver_metrics."""
+        if self.solver_metrics is None:
+            return
+        for plan in plans:
+            telemetry = (plan.get('_solver_budget') or {}).get('telemetry')
+            if telemetry:
+                self.solver_metrics.observe(telemetry)
@@ -0,0 +1,213 @@
+import logging
+import threading
+import time
+from collections import Counter
+
+from src.services.redis_service import RedisService
+
+logger = logging.getLogger(__name__)
+
+
+class SolverTelemetry:
+    """
+    Records one OR-Tools search: the route it was seeded with, the objective-versus-time
+    curve of the improving solutions the search found from there, the number of those
+    solutions and, once summarized, the final status. Times are seconds since `started`
+    (time.monotonic()).
+
+    It registers no callback: the solve's own RoutingModel.AddAtSolutionCallback, a
+    monitor OR-Tools runs natively, passes each solution to `record` (a Python
+    pywrapcp.SearchMonitor subclass is called back on every search event and more than
+    halves the solutions found per second).
+    """
+    # Improving solutions kept in the curve; later ones replace the last point
+    MAX_CURVE_POINTS = 100
+
+    def __init__(self, started=None):
+        self.started = started if started is not None else time.monotonic()
+        self.solutions = 0
+        self.curve = []
+        self.seed = None
+        self.seed_objective = None
+        self.seed_seconds = None
+        self._seed_pending = False
+
+    def set_seed(self, name, objective):
+        """
+        The search starts from the `name` route ("greedy", "warm_start") of scaled
+        `objective`. OR-Tools reports that assignment as its first solution; it is kept
+        apart from the solutions the search finds.
+        """
+        self.seed, self.seed_objective = name, objective
+        self._seed_pending = True
+
+    def record(self, objective):
+        """Called with the objective of every solution of the search."""
+        if self._seed_pending:
+            self._seed_pending = False
+            self.seed_seconds = round(time.monotonic() - self.started, 4)
+            return
+        self.solutions += 1
+        if not self.curve or objective < self.curve[-1][1]:
+            point = [round(time.monotonic() - self.started, 4), objective]
+            if len(self.curve) >= self.MAX_CURVE_POINTS:
+                self.curve[-1] = point
+            else:
+                self.curve.append(point)
+
+    def summary(self, status, stop_reason=None):
+        """
+        The solve as a JSON-ready dict, for the plan debug output and SolverMetricsService.
+        `status` is the name of the routing search status. The best solution is the seed
+        when the search found nothing cheaper; improvement_after_first compares the
+        search's own solutions, improvement_over_seed the best solution with the seed.
+        """
+        elapsed = time.monotonic() - self.started
+        summary = {
+            'status': status,
+            'stop_reason': stop_reason,
+            'elapsed_seconds': round(elapsed, 4),
+            'seed': self.seed,
+            'seed_objective': self.seed_objective,
+            'solutions': self.solutions,
+            'first_solution_seconds': None,
+            'first_objective': None,
+            'time_to_best_seconds': self.seed_seconds,
+            'best_objective': self.seed_objective,
+            'improvement_after_first': None,
+            'improvement_over_seed': None,
+            'curve': self.curve,
+        }
+        if self.curve:
+            first_seconds, first_objective = self.curve[0]
+            found_seconds, found_objective = self.curve[-1]
+            summary.update({
+                'first_solution_seconds': first_seconds,
+                'first_objective': first_objective,
+                'improvement_after_first': round((first_objective - found_objective) / first_objective, 6) if first_objective else 0.0,
+            })
+            if self.seed_objective is None or found_objective < self.seed_objective:
+                summary.update({'time_to_best_seconds': found_seconds, 'best_objective': found_objective})
+        if self.seed_objective is not None:
+            summary['improvement_over_seed'] = (
+                round((self.seed_objective - summary['best_objective']) / self.seed_objective, 6) if self.seed_objective else 0.0
+            )
+        return summary
+
+
+class SolverMetricsService:
+    """
+    Fixed-bucket histograms and counters of solver telemetry (SolverTelemetry.summary),
+    aggregated across web and pool worker processes in Redis hashes under
+    `solver_metrics:v1:<name>`. Buckets are cumulative, as in Prometheus: `le_<bound>`
+    counts the observations at most `bound`, and `le_inf` equals `count`. While Redis
+    is unreachable observations are counted in process only, and Redis is retried after
+    `redis_retry_seconds`.
+    """
+    NAMESPACE = "solver_metrics:v1"
+    # Histogram -> upper bounds of its buckets (le_inf is added)
+    HISTOGRAMS = {
+        'first_solution_seconds': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+        'time_to_best_seconds': (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+        # Time to best over the whole search time: low values mean the budget ran on unused
+        'time_to_best_fraction': (0.05, 0.1, 0.2, 0.3, 0.5, 0.7, 0.9, 1.0),
+        'improvement_after_first_pct': (0, 0.1, 0.5, 1, 2, 5, 10, 25, 50),
+        # Best solution over the seeded route: 0 means the search only confirmed the seed
+        'improvement_over_seed_pct': (0, 0.1, 0.5, 1, 2, 5, 10, 25, 50),
+        'solutions': (1, 2, 5, 10, 20, 50, 100, 200, 500),
+    }
+    COUNTERS = ('status', 'stop_reason')
+
+    def __init__(self, redis_service=None, redis_retry_seconds=30):
+        self.redis_service = redis_service if redis_service else RedisService()
+        self.redis_retry_seconds = redis_retry_seconds
+        self._redis_disabled_until = 0.0
+        self._local = {name: Counter() for name in (*self.HISTOGRAMS, *self.COUNTERS)}
+        self._lock = threading.Lock()
+
+    def _key(self, name):
+        return f"{self.NAMESPACE}:{name}"
+
+    @staticmethod
+    def _buckets(bounds, value):
+        """Fields of every cumulative bucket counting `value`."""
+        return [f"le_{bound}" for bound in bounds if value <= bound] + ["le_inf"]
+
+    def _values(self, telemetry):
+        elapsed = telemetry.get('elapsed_seconds') or 0.0
+        time_to_best = telemetry.get('time_to_best_seconds')
+        improvement = telemetry.get('improvement_after_first')
+        over_seed = telemetry.get('improvement_over_seed')
+        return {
+            'first_solution_seconds': telemetry.get('first_solution_seconds'),
+            'time_to_best_seconds': time_to_best,
+            'time_to_best_fraction': min(1.0, time_to_best / elapsed) if time_to_best is not None and elapsed > 0 else None,
+            'improvement_after_first_pct': improvement * 100 if improvement is not None else None,
+            'improvement_over_seed_pct': over_seed * 100 if over_seed is not None else None,
+            'solutions': telemetry.get('solutions'),
+        }
+
+    def observe(self, telemetry):
+        """Add one solve's telemetry summary to the histograms and counters."""
+        # (hash name, field, amount)
+        increments = []
+        for name, value in self._values(telemetry).items():
+            if value is not None:
+                increments.extend((name, field, 1) for field in self._buckets(self.HISTOGRAMS[name], value))
+                increments.extend([(name, 'count', 1), (name, 'sum', float(value))])
+        for name in self.COUNTERS:
+            if telemetry.get(name) is not None:
+                increments.append((name, str(telemetry[name]), 1))
+
+        with self._lock:
+            for name, field, amount in increments:
+                self._local[name][field] += amount
+        if time.monotonic() < self._redis_disabled_until:
+            return
+        try:
+            pipe = self.redis_service.client.pipeline(transaction=False)
+            for name, field, amount in increments:
+                if field == 'sum':
+                    pipe.hincrbyfloat(self._key(name), field, amount)
+                else:
+                    pipe.hincrby(self._key(name), field, amount)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"SolverMetrics: Redis unavailable, counting in process only for {self.redis_retry_seconds}s: {e}")
+            self._redis_disabled_until = time.monotonic() + self.redis_retry_seconds
+
+    def snapshot(self):
+        """
+        {'histograms': {name: {'buckets': [[upper bound, cumulative count], ...], 'count', 'mean'}},
+         'counters': {name: {value: count}}, 'source': 'redis' or 'process'}
+        """
+        raw, source = None, "redis"
+        if time.monotonic() >= self._redis_disabled_until:
+            try:
+                pipe = self.redis_service.client.pipeline(transaction=False)
+                for name in (*self.HISTOGRAMS, *self.COUNTERS):
+                    pipe.hgetall(self._key(name))
+                raw = dict(zip((*self.HISTOGRAMS, *self.COUNTERS), pipe.execute()))
+                raw = {
+                    name: {(k.decode() if isinstance(k, bytes) else k): float(v) for k, v in fields.items()}
+                    for name, fields in raw.items()
+                }
+            except Exception as e:
+                logger.warning(f"SolverMetrics: could not read Redis, reporting this process only: {e}")
+                raw = None
+        if raw is None:
+            source = "process"
+            with self._lock:
+                raw = {name: dict(counter) for name, counter in self._local.items()}
+
+        histograms = {}
+        for name, bounds in self.HISTOGRAMS.items():
+            fields = raw.get(name, {})
+            count = int(fields.get('count', 0))
+            histograms[name] = {
+                'buckets': [[bound, int(fields.get(f"le_{bound}", 0))] for bound in (*bounds, "inf")],
+                'count': count,
+                'mean': round(fields.get('sum', 0.0) / count, 6) if count else None,
+            }
+        counters = {name: {k: int(v) for k, v in raw.get(name, {}).items()} for name in self.COUNTERS}
+        return {'histograms': histograms, 'counters': counters, 'source': source}
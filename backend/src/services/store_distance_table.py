@@ -0,0 +1,230 @@
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class StoreDistanceTable:
+    """
+    Precomputed dense store x store road-distance matrix (km) stored as a NumPy `.npy`
+    file, with a JSON index (`<path>.index.json`) mapping store id and rounded
+    coordinates to a row. The matrix is opened with `mmap_mode='r'`, so request handlers
+    only page in the sub-matrices they slice.
+
+    The file is append-only: an incremental build keeps the existing block and adds
+    rows/columns for new stores, so a reader holding an older index stays consistent.
+    A store whose coordinates changed gets a new row too; its old row keeps the
+    distances of the old coordinates, no longer under its id, until a full rebuild.
+    """
+
+    def __init__(self, path=None, precision=None):
+        self.path = path if path is not None else Config.STORE_DISTANCE_TABLE_PATH
+        self.precision = precision if precision is not None else Config.DISTANCE_CACHE_PRECISION
+        self._matrix = None
+        self._row_by_coord = {}
+        self._ids = []
+        self._coords = []
+        self._loaded_mtime = None
+        self._lock = threading.Lock()
+
+    @property
+    def index_path(self):
+        return f"{self.path}.index.json"
+
+    def coord_key(self, lat, lng):
+        return f"{round(float(lat), self.precision)},{round(float(lng), self.precision)}"
+
+    def _maybe_reload(self):
+        """(Re)open the memory map if the files changed on disk. Returns False if no table exists."""
+        if not self.path or not os.path.exists(self.path) or not os.path.exists(self.index_path):
+            return False
+        mtime = max(os.path.getmtime(self.path), os.path.getmtime(self.index_path))
+        if self._matrix is not None and mtime == self._loaded_mtime:
+            return True
+        with self._lock:
+            try:
+                with open(self.index_path) as f:
+                    index = json.load(f)
+                matrix = np.load(self.path, mmap_mode='r')
+            except (OSError, ValueError) as e:
+                logger.error(f"Could not load store distance table {self.path}: {e}")
+                return self._matrix is not None
+            ids = index.get("ids", [])
+            coords = index.get("coords", [])
+            if matrix.ndim != 2 or matrix.shape[0] < len(ids) or matrix.shape[1] < len(ids):
+                logger.error(f"Store distance table {self.path} has shape {matrix.shape}, index has {len(ids)} stores.")
+                return self._matrix is not None
+            self._matrix = matrix
+            self._ids = ids
+            self._coords = coords
+            self._row_by_coord = {self.coord_key(lat, lng): row for row, (lat, lng) in enumerate(coords)}
+            self._loaded_mtime = mtime
+            logger.info(f"Loaded store distance table with {len(ids)} stores from {self.path}.")
+        return True
+
+    def rows_for(self, locations):
+        """Row of each (lat, lng) location in the table, or None when it is not in the table."""
+        if not self._maybe_reload():
+            return [None] * len(locations)
+        return [self._row_by_coord.get(self.coord_key(lat, lng)) for lat, lng in locations]
+
+    def submatrix(self, rows):
+        """Dense km sub-matrix for the given table rows (rows and columns in that order)."""
+        if not self._maybe_reload():
+            raise Exception("Store distance table is not available")
+        rows = np.asarray(rows, dtype=np.int64)
+        return np.asarray(self._matrix[np.ix_(rows, rows)], dtype=np.float64)
+
+    def build(self, stores, fetch_matrix, chunk_routes, incremental=True):
+        """
+        Build or extend the table.
+
+        `stores` is a list of dicts with `_id`, `lat` and `lng`. `fetch_matrix(locations,
+        sources, destinations)` returns a km sub-matrix, and `chunk_routes(sources, destinations)`
+        splits a block into request-sized chunks. With `incremental=True` only the rows and
+        columns of stores missing from the current index, or whose coordinates moved, are
+        computed. Returns the number of rows added.
+        """
+        old_ids, old_coords, old_matrix = [], [], None
+        if incremental and self._maybe_reload():
+            old_ids, old_coords = list(self._ids), [list(coord) for coord in self._coords]
+            old_matrix = np.asarray(self._matrix[:len(old_ids), :len(old_ids)], dtype=np.float32)
+
+        row_by_id = {store_id: row for row, store_id in enumerate(old_ids) if store_id is not None}
+        seen_ids = set()
+        new_stores, moved = [], 0
+        for store in stores:
+            store_id = str(store.get("_id"))
+            try:
+                lat, lng = float(store.get("lat")), float(store.get("lng"))
+            except (TypeError, ValueError):
+                logger.warning(f"Skipping store {store_id} with invalid coordinates.")
+                continue
+            if store_id in seen_ids:
+                continue
+            seen_ids.add(store_id)
+            row = row_by_id.get(store_id)
+            if row is not None:
+                if self.coord_key(*old_coords[row]) == self.coord_key(lat, lng):
+                    continue
+                # Moved store: its old row keeps serving the old coordinates, without the id
+                old_ids[row] = None
+                moved += 1
+            new_stores.append((store_id, [lat, lng]))
+
+        if not new_stores and old_matrix is not None:
+            logger.info("Store distance table is up to date.")
+            return 0
+
+        ids = old_ids + [store_id for store_id, _ in new_stores]
+        coords = old_coords + [coord for _, coord in new_stores]
+        n_old, n = len(old_ids), len(ids)
+        matrix = np.zeros((n, n), dtype=np.float32)
+        if old_matrix is not None:
+            matrix[:n_old, :n_old] = old_matrix
+
+        locations = [tuple(coord) for coord in coords]
+        new_rows = list(range(n_old, n))
+        all_rows = list(range(n))
+        # New rows against every store, then existing rows against the new columns
+        blocks = [(new_rows, all_rows)]
+        if n_old:
+            blocks.append((list(range(n_old)), new_rows))
+        for sources, destinations in blocks:
+            for chunk_sources, chunk_destinations in chunk_routes(sources, destinations):
+                sub_matrix = np.asarray([
+                    [np.inf if value is None else value for value in row]
+                    for row in fetch_matrix(locations, chunk_sources, chunk_destinations)
+                ], dtype=np.float32)
+                matrix[np.ix_(chunk_sources, chunk_destinations)] = sub_matrix
+        np.fill_diagonal(matrix, 0.0)
+
+        self._write(matrix, ids, coords)
+        logger.info(f"Store distance table now has {n} rows ({len(new_stores) - moved} stores added, {moved} moved).")
+        return len(new_stores)
+
+    def _write(self, matrix, ids, coords):
+        """Write both files to temporary paths first so readers never see a partial file."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # Per process: web workers may rebuild the table at the same time
+        tmp_matrix_path = f"{self.path}.{os.getpid()}.tmp.npy"
+        tmp_index_path = f"{self.index_path}.{os.getpid()}.tmp"
+        np.save(tmp_matrix_path, matrix)
+        with open(tmp_index_path, "w") as f:
+            json.dump({"ids": ids, "coords": coords}, f)
+        os.replace(tmp_matrix_path, self.path)
+        os.replace(tmp_index_path, self.index_path)
+
+
+# Background updates of this process (schedule_store_distance_table_update)
+_update_lock = threading.Lock()
+_update_running = False
+_update_requested = False
+# Serializes builds in this process: each one reads the table the previous one wrote
+_build_lock = threading.Lock()
+
+
+def schedule_store_distance_table_update():
+    """
+    Run update_store_distance_table in a background thread. Calls made while an update
+    is running are coalesced into a single update run after it, which sees their stores.
+    Returns True when a new thread was started.
+    """
+    global _update_running, _update_requested
+    with _update_lock:
+        if _update_running:
+            _update_requested = True
+            return False
+        _update_running = True
+    threading.Thread(target=_run_scheduled_updates, daemon=True).start()
+    return True
+
+
+def _run_scheduled_updates():
+    global _update_running, _update_requested
+    while True:
+        try:
+            update_store_distance_table()
+        except Exception as e:
+            logger.error(f"Store distance table update failed: {e}")
+        with _update_lock:
+            if not _update_requested:
+                _update_running = False
+                return
+            _update_requested = False
+
+
+def update_store_distance_table(path=None, use_haversine=False, incremental=True):
+    """
+    Batch job: (re)build the store distance table from every store in the `stores`
+    collection. Road distances come from OpenRouteService through SearchService; with
+    `use_haversine=True` straight-line distances are used instead (no API key needed).
+    """
+    with _build_lock:
+        return _update_store_distance_table(path, use_haversine, incremental)
+
+
+def _update_store_distance_table(path, use_haversine, incremental):
+    from src.extensions import db
+    from src.geodesic import haversine_matrix
+    from src.services.search_service import SearchService
+
+    search_service = SearchService()
+    table = StoreDistanceTable(path=path)
+    if not table.path:
+        raise ValueError("STORE_DISTANCE_TABLE_PATH is not configured")
+    stores = list(db.get_collection("stores").find({}, {"_id": 1, "lat": 1, "lng": 1}))
+
+    if use_haversine:
+        def fetch_matrix(locations, sources, destinations):
+            return haversine_matrix([locations[i] for i in sources], [locations[j] for j in destinations]).tolist()
+    else:
+        fetch_matrix = search_service._fetch_ors_matrix
+    return table.build(stores, fetch_matrix, search_service.distance_cache.chunk_routes, incremental=incremental)
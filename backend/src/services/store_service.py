@@ -5,6 +5,7 @@ import re
 from time import time
 import json # Added import
 from src.services.redis_service import RedisService # Added import
+from src.geodesic import haversine_to_point
 
 class StoreService:
     def __init__(self, ai_service=None, product_service=None, redis_service=None): # Added redis_service
@@ -82,28 +83,28 @@ class StoreService:
 
     @staticmethod
     def haversine(lat1, lng1, lat2, lng2):
-        import math
-        R = 6371  # Earth radius in km
-        phi1, phi2 = math.radians(lat1), math.radians(lat2)
-        dphi = math.radians(lat2 - lat1)
-        dlambda = math.radians(lng2 - lng1)
-        a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
-        return 2 * R * math.asin(math.sqrt(a))
+        return float(haversine_to_point(lat1, lng1, [(lat2, lng2)])[0])
 
     def get_stores_within_radius(self, lat, lng, radius_km):
         stores = list(self.collection.find({}))
-        result = []
+        candidates = []
+        coords = []
         for store in stores:
             store_lat = store.get("lat")
             store_lng = store.get("lng")
             if store_lat is None or store_lng is None:
                 continue
             try:
-                store_lat = float(store_lat)
-                store_lng = float(store_lng)
+                coords.append((float(store_lat), float(store_lng)))
             except (ValueError, TypeError):
                 continue
-            distance = self.haversine(lat, lng, store_lat, store_lng)
+            candidates.append(store)
+        if not candidates:
+            return []
+
+        distances = haversine_to_point(lat, lng, coords)
+        result = []
+        for store, distance in zip(candidates, distances):
             if distance <= radius_km:
                 store["_id"] = {"$oid": str(store["_id"])}
                 result.append(store)
@@ -0,0 +1,65 @@
+import pytest
+
+from benchmarks.bench_solver_suite import OfflineSearchService
+from benchmarks.instances import generate_instance
+from tests.test_exact_solver import _brute_force_objective, _data_model
+
+
+def _service(**kwargs):
+    return OfflineSearchService(execution_mode="sequential", plan_cache=None, plan_sessions=None, **kwargs)
+
+
+def _stores_list(instance):
+    """The instance in the /search/nearby shape, one product per required group."""
+    stores_list = []
+    for address, store in instance.stores_for_search.items():
+        items = [
+            {'product_name': f"group {g}", 'candidates': [{'name': name, 'price': price}
+                                                          for name, price in store['items'].items() if name in group]}
+            for g, group in enumerate(instance.required_item_groups)
+        ]
+        stores_list.append({'address': address, 'lat': store['lat'], 'lng': store['lng'], 'items': items})
+    return stores_list
+
+
+@pytest.mark.parametrize("n_stores", [5, 8, 10])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("cost_per_km", [0, 500, 500000])
+def test_greedy_route_covers_every_group(n_stores, seed, cost_per_km):
+    service = _service(presolve=False)
+    data_model = _data_model(service, n_stores, seed, cost_per_km)
+
+    route_nodes = service._greedy_route(data_model)
+
+    assert route_nodes[0] == route_nodes[-1] == data_model.depot
+    assert sorted(int(data_model.node_group[node]) for node in route_nodes[1:-1]) == list(range(data_model.num_groups))
+    assert service._route_objective_scaled(data_model, route_nodes) >= _brute_force_objective(data_model)
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_provisional_greedy_plan_comes_first(seed):
+    service = _service(solver_engine="or_tools", max_time_limit_seconds=1)
+    instance = generate_instance(40, seed=seed)
+    notified = []
+
+    plans = service.get_plans_from_nearby(_stores_list(instance), (instance.user_loc['lat'], instance.user_loc['lng']),
+                                          on_plan=notified.append)
+
+    provisional = notified[0]
+    assert len(provisional) == 1 and provisional[0]['_provisional'] and provisional[0]['id'] == 0
+    assert provisional[0]['_solver_engine'] == "greedy"
+    assert not any(p.get('_provisional') for plan_list in notified[1:] for p in plan_list)
+    assert not any(p.get('_provisional') for p in plans)
+    solved = next(p for p in plans if p['id'] == 0)
+    assert solved['_solver_objective_scaled'] <= provisional[0]['_solver_objective_scaled']
+
+
+def test_no_provisional_plan_for_exact_solves():
+    service = _service(solver_engine="exact_dp")
+    instance = generate_instance(8, n_groups=3, candidates_per_group=3, seed=0)
+    notified = []
+
+    service.get_plans_from_nearby(_stores_list(instance), (instance.user_loc['lat'], instance.user_loc['lng']),
+                                  on_plan=notified.append)
+
+    assert notified and not any(p.get('_provisional') for plan_list in notified for p in plan_list)
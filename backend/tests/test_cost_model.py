@@ -0,0 +1,55 @@
+import pytest
+
+from benchmarks.bench_solver_suite import OfflineSearchService
+from benchmarks.instances import generate_instance
+from tests.test_exact_solver import _brute_force_objective
+
+
+def _service(cost_model, transit_evaluator="matrix"):
+    return OfflineSearchService(execution_mode="sequential", presolve=False, solver_engine="or_tools", cost_model=cost_model,
+                                transit_evaluator=transit_evaluator, plan_cache=None, plan_sessions=None)
+
+
+def _data_model(service, n_stores, seed, cost_per_km, n_groups=3):
+    instance = generate_instance(n_stores, n_groups=n_groups, candidates_per_group=3, seed=seed)
+    base_model = service._prepare_base_model(instance.stores_for_search, instance.user_loc, instance.required_item_groups)
+    return service._apply_distance_cost(base_model, cost_per_km)
+
+
+def _solve(service, data_model):
+    manager, routing, solution = service._solve_with_or_tools(data_model)
+    return service._solution_route_nodes(manager, routing, solution), solution.ObjectiveValue()
+
+
+@pytest.mark.parametrize("cost_model", ["arc", "dimension"])
+@pytest.mark.parametrize("transit_evaluator", ["matrix", "callback"])
+@pytest.mark.parametrize("cost_per_km", [0, 500, 500000])
+def test_routing_objective_is_distance_plus_prices(cost_model, transit_evaluator, cost_per_km):
+    service = _service(cost_model, transit_evaluator)
+    data_model = _data_model(service, 40, 0, cost_per_km, n_groups=5)
+
+    route_nodes, objective = _solve(service, data_model)
+
+    assert objective == service._route_objective_scaled(data_model, route_nodes)
+
+
+@pytest.mark.parametrize("n_stores", [5, 6, 7])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("cost_per_km", [0, 500, 500000])
+def test_arc_costs_reach_the_brute_force_optimum(n_stores, seed, cost_per_km):
+    service = _service("arc")
+    data_model = _data_model(service, n_stores, seed, cost_per_km)
+
+    _, objective = _solve(service, data_model)
+
+    assert objective == _brute_force_objective(data_model)
+
+
+def test_arc_costs_build_no_item_cost_dimension():
+    service = _service("arc")
+    data_model = _data_model(service, 10, 0, 500)
+
+    _, routing, _ = service._solve_with_or_tools(data_model)
+
+    assert "ItemCost" not in routing.GetAllDimensionNames()
+    assert "ItemCost" in _service("dimension")._solve_with_or_tools(data_model)[1].GetAllDimensionNames()
@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.geodesic import haversine_matrix
+from src.services.distance_cache_service import DistanceCacheService
+
+
+class UnavailableRedisClient:
+    def __getattr__(self, name):
+        raise ConnectionError("Redis is down")
+
+
+class RecordingMatrixApi:
+    """Haversine sub-matrices, recording the (sources, destinations) of every call."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, locations, sources, destinations):
+        self.calls.append((list(sources), list(destinations)))
+        return haversine_matrix([locations[i] for i in sources], [locations[j] for j in destinations]).tolist()
+
+    @property
+    def routes(self):
+        return sum(len(sources) * len(destinations) for sources, destinations in self.calls)
+
+
+LOCATIONS = [(10.78 + 0.01 * i, 106.70 - 0.007 * (i % 4)) for i in range(9)]
+
+
+def _distance_cache(max_routes=3500):
+    return DistanceCacheService(redis_service=SimpleNamespace(client=UnavailableRedisClient()), precision=5,
+                                maxsize=10000, ttl_seconds=60, max_routes_per_request=max_routes)
+
+
+@pytest.mark.parametrize("n_sources, n_destinations, max_routes", [(9, 9, 3500), (9, 9, 10), (3, 50, 7), (50, 2, 7), (1, 1, 1)])
+def test_chunks_respect_the_route_limit_and_cover_every_pair_once(n_sources, n_destinations, max_routes):
+    sources, destinations = list(range(n_sources)), list(range(100, 100 + n_destinations))
+
+    chunks = list(_distance_cache(max_routes).chunk_routes(sources, destinations))
+
+    assert all(len(chunk_sources) * len(chunk_destinations) <= max_routes for chunk_sources, chunk_destinations in chunks)
+    pairs = [(i, j) for chunk_sources, chunk_destinations in chunks for i in chunk_sources for j in chunk_destinations]
+    assert sorted(pairs) == [(i, j) for i in sources for j in destinations]
+
+
+def test_repeat_matrix_is_served_from_the_cache():
+    distance_cache, api = _distance_cache(), RecordingMatrixApi()
+
+    first = distance_cache.get_matrix(LOCATIONS, api)
+    routes = api.routes
+    second = distance_cache.get_matrix(LOCATIONS, api)
+
+    assert first == second
+    np.testing.assert_allclose(first, haversine_matrix(LOCATIONS))
+    assert routes == len(LOCATIONS) ** 2 and api.routes == routes
+
+
+def test_only_pairs_of_a_new_location_are_fetched():
+    distance_cache, api = _distance_cache(), RecordingMatrixApi()
+    distance_cache.get_matrix(LOCATIONS[:-1], api)
+    api.calls.clear()
+
+    matrix = distance_cache.get_matrix(LOCATIONS, api)
+
+    np.testing.assert_allclose(matrix, haversine_matrix(LOCATIONS))
+    new = len(LOCATIONS) - 1
+    assert all(new in sources or new in destinations for sources, destinations in api.calls)
+    assert api.routes == 2 * len(LOCATIONS) - 1
+
+
+def test_fetches_are_chunked_to_the_route_limit():
+    distance_cache, api = _distance_cache(max_routes=10), RecordingMatrixApi()
+
+    matrix = distance_cache.get_matrix(LOCATIONS, api)
+
+    np.testing.assert_allclose(matrix, haversine_matrix(LOCATIONS))
+    assert len(api.calls) > 1 and all(len(sources) * len(destinations) <= 10 for sources, destinations in api.calls)
+
+
+def test_only_indices_leaves_other_pairs_to_the_caller():
+    distance_cache, api = _distance_cache(), RecordingMatrixApi()
+
+    matrix = distance_cache.get_matrix(LOCATIONS, api, only_indices=[0])
+
+    assert matrix[1][2] == 0.0 and matrix[0][2] == pytest.approx(haversine_matrix(LOCATIONS)[0][2])
+    assert all(0 in sources or 0 in destinations for sources, destinations in api.calls)
@@ -0,0 +1,117 @@
+import copy
+import itertools
+
+import numpy as np
+import pytest
+
+from benchmarks.bench_solver_suite import OfflineSearchService
+from benchmarks.instances import generate_instance
+
+
+def _data_model(service, n_stores, seed, cost_per_km):
+    instance = generate_instance(n_stores, n_groups=3, candidates_per_group=3, seed=seed)
+    base_model = service._prepare_base_model(instance.stores_for_search, instance.user_loc, instance.required_item_groups)
+    return service._apply_distance_cost(base_model, cost_per_km)
+
+
+def _brute_force_objective(data_model):
+    """
+    Cheapest plan of the routing model by enumeration: every way to buy each group at one
+    location selling it, each set of bought-at locations toured in its cheapest order.
+    """
+    cheapest_price, _ = data_model.cheapest_nodes()
+    dist = data_model.distance_scaled
+    sellers = [np.flatnonzero(np.isfinite(cheapest_price[:, g])).tolist() for g in range(data_model.num_groups)]
+    best = None
+    for buy_at in itertools.product(*sellers):
+        prices = sum(int(cheapest_price[loc, g]) for g, loc in enumerate(buy_at))
+        for order in itertools.permutations(set(buy_at)):
+            tour = [0, *order, 0]
+            objective = prices + int(sum(dist[a, b] for a, b in zip(tour, tour[1:])))
+            if best is None or objective < best:
+                best = objective
+    return best
+
+
+@pytest.fixture(scope="module")
+def service():
+    return OfflineSearchService(execution_mode="sequential", presolve=False, plan_cache=None, plan_sessions=None)
+
+
+@pytest.mark.parametrize("n_stores", [5, 6, 7, 8, 9, 10])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("cost_per_km", [0, 500, 500000])
+def test_exact_dp_matches_brute_force(service, n_stores, seed, cost_per_km):
+    data_model = _data_model(service, n_stores, seed, cost_per_km)
+    route_nodes, objective_scaled = service._solve_exact(data_model)
+
+    assert objective_scaled == _brute_force_objective(data_model)
+    assert route_nodes[0] == route_nodes[-1] == data_model.depot
+    assert service._route_objective_scaled(data_model, route_nodes) == objective_scaled
+    covered = {int(data_model.node_group[node]) for node in route_nodes[1:-1]}
+    assert covered == set(range(data_model.num_groups))
+
+
+def test_exact_dp_above_the_hard_limit_falls_back_to_or_tools():
+    service = OfflineSearchService(execution_mode="sequential", solver_engine="exact_dp", exact_max_locations=50,
+                                   presolve=False, plan_cache=None, plan_sessions=None)
+    data_model = _data_model(service, 40, 0, 500)
+    assert len(data_model.candidate_locations()) > service.EXACT_HARD_MAX_LOCATIONS
+    instance = generate_instance(40, n_groups=3, candidates_per_group=3, seed=0)
+
+    plans = service.find_optimal_shopping_plan(instance.stores_for_search, instance.required_item_groups, instance.user_loc)
+
+    assert service.exact_max_locations == service.EXACT_HARD_MAX_LOCATIONS
+    assert plans[0]['_solver_engine'] == "or_tools"
+    with pytest.raises(ValueError):
+        service._solve_exact(data_model)
+
+
+@pytest.mark.parametrize("n_stores", [5, 8, 10])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("cost_per_km", [0, 500, 500000])
+def test_decomposition_matches_brute_force_on_one_cluster(service, n_stores, seed, cost_per_km):
+    data_model = _data_model(service, n_stores, seed, cost_per_km)
+
+    route_nodes, objective_scaled, report = service._solve_decomposed(data_model)
+
+    assert report['clusters'] == 1
+    assert objective_scaled == _brute_force_objective(data_model)
+    assert service._route_objective_scaled(data_model, route_nodes) == objective_scaled
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("cost_per_km", [0, 500, 500000])
+def test_decomposition_over_several_clusters_returns_a_covering_route(service, seed, cost_per_km):
+    data_model = _data_model(service, 10, seed, cost_per_km)
+    clustered = copy.copy(service)
+    clustered.DECOMPOSITION_CLUSTER_LOCATIONS = 3
+
+    route_nodes, objective_scaled, report = clustered._solve_decomposed(data_model)
+
+    assert report['clusters'] > 1
+    assert route_nodes[0] == route_nodes[-1] == data_model.depot
+    assert {int(data_model.node_group[node]) for node in route_nodes[1:-1]} == set(range(data_model.num_groups))
+    assert objective_scaled == service._route_objective_scaled(data_model, route_nodes) >= _brute_force_objective(data_model)
+
+
+@pytest.fixture(scope="module")
+def cp_sat_service():
+    return OfflineSearchService(execution_mode="sequential", presolve=False, solver_engine="cp_sat", cp_sat_workers=1,
+                                cp_sat_gap_limit=0.0, max_time_limit_seconds=10, plan_cache=None, plan_sessions=None)
+
+
+@pytest.mark.parametrize("n_stores", [5, 8, 10])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("cost_per_km", [0, 500, 500000])
+def test_cp_sat_matches_brute_force(cp_sat_service, n_stores, seed, cost_per_km):
+    data_model = _data_model(cp_sat_service, n_stores, seed, cost_per_km)
+    budget = cp_sat_service._solver_budget(data_model.num_nodes)
+    budget['time_limit_seconds'] = 10
+
+    route_nodes, objective_scaled = cp_sat_service._solve_cp_sat(data_model, budget)
+
+    assert budget['status'] == "OPTIMAL"
+    assert objective_scaled == _brute_force_objective(data_model)
+    assert budget['lower_bound_scaled'] <= objective_scaled
+    assert cp_sat_service._route_objective_scaled(data_model, route_nodes) == objective_scaled
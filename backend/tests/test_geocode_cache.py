@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.instances import generate_instance
+from src.geodesic import haversine_matrix
+from src.services.cache_service import TieredCache
+from src.services.search_service import SearchService
+from tests.test_anytime_plan import _stores_list
+
+
+class UnavailableRedisClient:
+    def __getattr__(self, name):
+        raise ConnectionError("Redis is down")
+
+
+class GeocodingSearchService(SearchService):
+    """SearchService with haversine distances and a recorded, scripted reverse geocoder."""
+
+    def __init__(self, addresses=None, **kwargs):
+        super().__init__(**kwargs)
+        self.addresses = addresses
+        self.geocoded = []
+
+    def _get_distance_matrix(self, locations):
+        return haversine_matrix(locations)
+
+    def _reverse_geocode(self, lat, lng):
+        self.geocoded.append((lat, lng))
+        if self.addresses is None:
+            return f"({lat}, {lng})"
+        return self.addresses.pop(0)
+
+
+@pytest.fixture
+def redis_service():
+    return SimpleNamespace(client=UnavailableRedisClient())
+
+
+def _service(redis_service, addresses=None, **kwargs):
+    geocode_cache = TieredCache(namespace="geocode:test", redis_service=redis_service, maxsize=100, ttl_seconds=60)
+    return GeocodingSearchService(addresses, execution_mode="sequential", geocode_cache=geocode_cache, plan_cache=None,
+                                  plan_sessions=None, redis_service=redis_service, **kwargs)
+
+
+def test_nearby_points_share_a_cached_address(redis_service):
+    service = _service(redis_service, ["12 Le Loi, District 1"])
+
+    first = service._resolve_address(10.776901, 106.700902)
+    second = service._resolve_address(10.776899, 106.700898)
+
+    assert first == second == "12 Le Loi, District 1"
+    assert len(service.geocoded) == 1
+
+
+def test_failed_lookups_are_not_cached(redis_service):
+    service = _service(redis_service)
+
+    assert service._resolve_address(10.7769, 106.7009) == "(10.7769, 106.7009)"
+    service.addresses = ["12 Le Loi, District 1"]
+
+    assert service._resolve_address(10.7769, 106.7009) == "12 Le Loi, District 1"
+    assert len(service.geocoded) == 2
+
+
+def test_one_lookup_per_request_shared_by_every_plan(redis_service):
+    service = _service(redis_service, ["12 Le Loi, District 1"], solver_engine="or_tools", max_time_limit_seconds=0.5)
+    instance = generate_instance(20, n_groups=3, candidates_per_group=3, seed=0)
+    user_loc = (instance.user_loc['lat'], instance.user_loc['lng'])
+
+    plans = service.get_plans_from_nearby(_stores_list(instance), user_loc)
+    again = service.get_plans_from_nearby(_stores_list(instance), user_loc)
+
+    assert len(plans) == len(SearchService.DISTANCE_COSTS_TO_TRY)
+    assert {plan['start'] for plan in plans + again} == {"12 Le Loi, District 1"}
+    assert service.geocoded == [user_loc]
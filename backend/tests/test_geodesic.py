@@ -0,0 +1,63 @@
+import math
+
+import numpy as np
+import pytest
+
+from src.geodesic import EARTH_RADIUS_KM, haversine_matrix, haversine_to_point
+
+
+def _scalar_haversine(lat1, lng1, lat2, lng2):
+    """The scalar formula StoreService.haversine used before the NumPy version."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def _city_points(n, seed):
+    rnd = np.random.default_rng(seed)
+    return np.column_stack((rnd.normal(10.78, 0.05, n), rnd.normal(106.70, 0.05, n)))
+
+
+# Poles, the antimeridian, antipodes and a repeated point
+GLOBAL_POINTS = np.array([
+    [90.0, 0.0], [-90.0, 0.0], [0.0, 179.9], [0.0, -179.9], [10.78, 106.70], [-10.78, -73.30], [10.78, 106.70], [51.5, -0.12],
+])
+
+
+@pytest.mark.parametrize("points", [_city_points(40, 0), _city_points(40, 1), GLOBAL_POINTS])
+def test_matrix_matches_the_scalar_formula_in_float64(points):
+    matrix = haversine_matrix(points)
+
+    expected = np.array([[_scalar_haversine(*a, *b) for b in points] for a in points])
+    # arcsin and atan2 differ by a few centimetres next to antipodes
+    np.testing.assert_allclose(matrix, expected, rtol=1e-8, atol=1e-9)
+    assert matrix.dtype == np.float64
+    np.testing.assert_array_equal(np.diag(matrix), 0.0)
+
+
+@pytest.mark.parametrize("points, atol_km", [(_city_points(40, 2), 5e-3), (GLOBAL_POINTS, 5.0)])
+def test_float32_matrix_stays_close_to_float64(points, atol_km):
+    matrix = haversine_matrix(points, dtype=np.float32)
+
+    assert matrix.dtype == np.float32
+    np.testing.assert_allclose(matrix, haversine_matrix(points), rtol=1e-4, atol=atol_km)
+
+
+def test_rectangular_matrix_and_distances_to_a_point():
+    origins, destinations = _city_points(5, 3), _city_points(7, 4)
+
+    matrix = haversine_matrix(origins, destinations)
+
+    assert matrix.shape == (5, 7)
+    np.testing.assert_allclose(matrix[2], haversine_to_point(*origins[2], destinations))
+    np.testing.assert_allclose(matrix.T, haversine_matrix(destinations, origins))
+
+
+def test_store_service_haversine_matches_the_scalar_formula():
+    store_service = pytest.importorskip("src.services.store_service")
+    points = _city_points(10, 5)
+
+    for a, b in zip(points, points[::-1]):
+        assert store_service.StoreService.haversine(*a, *b) == pytest.approx(_scalar_haversine(*a, *b), rel=1e-9, abs=1e-9)
@@ -0,0 +1,79 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from src import http_client
+from src.http_client import HttpClient, get_http_client
+
+
+class ConcurrencyRecordingSession:
+    """Stands in for requests.Session, recording the peak number of concurrent requests per host."""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.active = {}
+        self.peak = {}
+        self._lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        host = url.split("/")[2]
+        with self._lock:
+            self.active[host] = self.active.get(host, 0) + 1
+            self.peak[host] = max(self.peak.get(host, 0), self.active[host])
+        time.sleep(self.delay)
+        with self._lock:
+            self.active[host] -= 1
+        return (method, url, kwargs['timeout'])
+
+
+def _child_client_state(queue):
+    inherited = http_client._shared_client
+    client = get_http_client()
+    queue.put((client is inherited, client is get_http_client()))
+
+
+def test_client_is_shared_within_a_process():
+    assert get_http_client() is get_http_client()
+
+
+def test_forked_process_builds_its_own_client():
+    parent_client = get_http_client()
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    child = context.Process(target=_child_client_state, args=(queue,))
+    child.start()
+    inherited, shared_in_child = queue.get(timeout=10)
+    child.join(10)
+
+    assert not inherited and shared_in_child
+    assert get_http_client() is parent_client
+
+
+def test_new_pid_gets_a_new_client(monkeypatch):
+    parent_client = get_http_client()
+    monkeypatch.setattr(http_client.os, "getpid", lambda: -1)
+
+    assert get_http_client() is not parent_client
+
+
+def test_per_host_limit_caps_concurrent_requests():
+    client = HttpClient(pool_maxsize=4, per_host_limit=2, max_workers=8, default_timeout=3)
+    client.session = ConcurrencyRecordingSession()
+    urls = [f"https://{host}/v2/matrix" for host in ("ors.example", "geo.example") for _ in range(6)]
+
+    responses = client.map_concurrently(client.get, urls)
+
+    assert [url for _, url, _ in responses] == urls and {timeout for _, _, timeout in responses} == {3}
+    assert client.session.peak == {"ors.example": 2, "geo.example": 2}
+
+
+def test_run_works_inside_a_running_event_loop():
+    client = HttpClient(max_workers=2)
+
+    async def outer():
+        return client.run(client.call_async(sum, [1, 2, 3]))
+
+    assert asyncio.run(outer()) == 6
@@ -0,0 +1,48 @@
+import pytest
+
+from benchmarks.bench_solver_suite import OfflineSearchService
+from benchmarks.instances import generate_instance
+
+
+@pytest.fixture(scope="module")
+def service():
+    return OfflineSearchService(execution_mode="sequential", solver_engine="exact_dp", exact_max_locations=20,
+                                plan_cache=None, plan_sessions=None)
+
+
+def _solve_args(service, n_stores, seed):
+    instance = generate_instance(n_stores, n_groups=4, candidates_per_group=3, seed=seed)
+    base_model = service._prepare_base_model(instance.stores_for_search, instance.user_loc, instance.required_item_groups)
+    return instance.stores_for_search, instance.required_item_groups, instance.user_loc, base_model, None
+
+
+@pytest.mark.parametrize("n_stores", [8, 12, 16])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_frontier_is_non_dominated_and_ordered_by_cost(service, n_stores, seed):
+    plans = [plan_list[0] for plan_list in service._solve_pareto(_solve_args(service, n_stores, seed), max_plans=20, use_pool=False)]
+    points = [service._plan_point(plan) for plan in plans]
+
+    assert points and None not in points
+    assert len(set(points)) == len(points)
+    for point in points:
+        assert not any(other != point and other[0] <= point[0] and other[1] <= point[1] for other in points)
+    assert points == sorted(points)
+
+
+@pytest.mark.parametrize("n_stores", [8, 12, 16])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_frontier_holds_the_optimum_of_every_fixed_weight(service, n_stores, seed):
+    solve_args = _solve_args(service, n_stores, seed)
+    points = [service._plan_point(plan_list[0]) for plan_list in service._solve_pareto(solve_args, max_plans=20, use_pool=False)]
+
+    for weight in service.DISTANCE_COSTS_TO_TRY:
+        cost, distance = service._plan_point(service._solve_weight(solve_args, weight)[0])
+        # Scaled distances are rounded per arc, allow a unit per arc
+        tolerance = solve_args[3].num_groups + 1
+        assert min(c + weight * d for c, d in points) <= cost + weight * distance + tolerance
+
+
+def test_frontier_is_capped_at_max_plans(service):
+    plans = service._solve_pareto(_solve_args(service, 16, 0), max_plans=2, use_pool=False)
+
+    assert len(plans) <= 2
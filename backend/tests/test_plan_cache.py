@@ -0,0 +1,114 @@
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.bench_solver_suite import OfflineSearchService
+from src.services.plan_cache_service import PlanCacheService
+
+
+class FakeRedisClient:
+    """The catalog version counter of Redis, shared by every service built on it."""
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def incr(self, key):
+        self.values[key] = int(self.values.get(key, 0)) + 1
+        return self.values[key]
+
+
+@pytest.fixture
+def redis_service():
+    return SimpleNamespace(client=FakeRedisClient())
+
+
+def _plan_cache(redis_service):
+    return PlanCacheService(redis_service=redis_service, location_precision=4, version_check_seconds=0)
+
+
+STORES = {
+    'Co.op Food #1': {'lat': 10.7769, 'lng': 106.7009, 'items': {'milk Vinamilk': 32000, 'rice ST25': 41000}},
+    'GS25 #2': {'lat': 10.7844, 'lng': 106.6844, 'items': {'milk TH': 35000}},
+}
+GROUPS = [{'milk Vinamilk', 'milk TH'}, {'rice ST25'}]
+USER_LOC = {'lat': 10.78, 'lng': 106.69}
+PARAMS = {'plan_mode': 'weights', 'solver_engine': 'auto'}
+
+
+def test_key_ignores_store_item_and_group_member_order(redis_service):
+    plan_cache = _plan_cache(redis_service)
+    reordered_stores = {
+        address: {**store, 'items': dict(reversed(list(store['items'].items())))}
+        for address, store in reversed(list(STORES.items()))
+    }
+    reordered_groups = [set(sorted(group, reverse=True)) for group in GROUPS]
+
+    assert (plan_cache.make_key(STORES, GROUPS, USER_LOC, PARAMS)
+            == plan_cache.make_key(reordered_stores, reordered_groups, USER_LOC, dict(reversed(list(PARAMS.items())))))
+
+
+def test_key_rounds_the_user_location(redis_service):
+    plan_cache = _plan_cache(redis_service)
+    nearby = {'lat': 10.780004, 'lng': 106.689996}
+
+    assert plan_cache.make_key(STORES, GROUPS, USER_LOC, PARAMS) == plan_cache.make_key(STORES, GROUPS, nearby, PARAMS)
+
+
+@pytest.mark.parametrize("stores, groups, params", [
+    ({**STORES, 'GS25 #2': {**STORES['GS25 #2'], 'items': {'milk TH': 36000}}}, GROUPS, PARAMS),
+    (STORES, list(reversed(GROUPS)), PARAMS),
+    (STORES, GROUPS, {**PARAMS, 'solver_engine': 'or_tools'}),
+])
+def test_key_changes_with_the_solver_input(redis_service, stores, groups, params):
+    plan_cache = _plan_cache(redis_service)
+
+    assert plan_cache.make_key(STORES, GROUPS, USER_LOC, PARAMS) != plan_cache.make_key(stores, groups, USER_LOC, params)
+
+
+def test_bumping_the_catalog_version_changes_every_key(redis_service):
+    plan_cache = _plan_cache(redis_service)
+    other_worker = _plan_cache(redis_service)
+    key = plan_cache.make_key(STORES, GROUPS, USER_LOC, PARAMS)
+    assert other_worker.make_key(STORES, GROUPS, USER_LOC, PARAMS) == key
+
+    plan_cache.bump_catalog_version()
+
+    assert plan_cache.make_key(STORES, GROUPS, USER_LOC, PARAMS) != key
+    assert other_worker.make_key(STORES, GROUPS, USER_LOC, PARAMS) == plan_cache.make_key(STORES, GROUPS, USER_LOC, PARAMS)
+
+
+class HaversineFallbackSearchService(OfflineSearchService):
+    """Offline SearchService whose distance matrix request always fails."""
+
+    def _get_distance_matrix(self, locations):
+        raise RuntimeError("ORS unavailable")
+
+
+def _stores_list():
+    return [
+        {
+            'address': address, 'lat': store['lat'], 'lng': store['lng'],
+            'items': [{'product_name': name.split()[0], 'candidates': [{'name': name, 'price': price}]}
+                      for name, price in store['items'].items()],
+        }
+        for address, store in STORES.items()
+    ]
+
+
+@pytest.mark.parametrize("service_class, cached", [
+    (OfflineSearchService, True),
+    (HaversineFallbackSearchService, False),
+])
+def test_plans_on_the_haversine_fallback_are_not_cached(redis_service, service_class, cached):
+    plan_cache = _plan_cache(redis_service)
+    service = service_class(plan_cache=plan_cache, plan_sessions=None, execution_mode="sequential", solver_telemetry=False)
+    user_loc = (USER_LOC['lat'], USER_LOC['lng'])
+
+    plans = service.get_plans_from_nearby(_stores_list(), user_loc)
+    assert plans and not any(p.get('_error_message') for p in plans)
+    again = service.get_plans_from_nearby(_stores_list(), user_loc)
+
+    assert all(p.get('_plan_cache') == "hit" for p in again) == cached
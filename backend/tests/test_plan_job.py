@@ -0,0 +1,184 @@
+import json
+import threading
+import time
+
+import pytest
+
+from src.services.plan_job_service import PlanJobService
+
+
+class FakeRedisClient:
+    """The string and list commands PlanJobService uses, thread-safe."""
+
+    def __init__(self):
+        self.values = {}
+        self.lists = {}
+        self._lock = threading.Lock()
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self.values[key] = value
+
+    def get(self, key):
+        with self._lock:
+            return self.values.get(key)
+
+    def lrange(self, key, start, end):
+        with self._lock:
+            items = self.lists.get(key, [])
+            return items[start:] if end == -1 else items[start:end + 1]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def rpush(self, key, value):
+        self.commands.append((key, value))
+
+    def expire(self, key, seconds):
+        pass
+
+    def execute(self):
+        with self.client._lock:
+            for key, value in self.commands:
+                self.client.lists.setdefault(key, []).append(value)
+
+
+class SteppedSearchService:
+    """Streams one plan per step; each step waits until the test releases it."""
+
+    def __init__(self, steps=2, fail=False):
+        self.steps = steps
+        self.fail = fail
+        self.released = threading.Semaphore(0)
+
+    def get_plans_from_nearby(self, stores_list, user_loc, on_plan=None, **plan_kwargs):
+        plans = []
+        for i in range(self.steps):
+            self.released.acquire(timeout=5)
+            if self.fail:
+                raise RuntimeError("solver crashed")
+            plans.append({'id': i, 'cost': 1000 * (i + 1)})
+            on_plan([plans[-1]])
+        return plans
+
+
+class FakeRedisService:
+    def __init__(self):
+        self.client = FakeRedisClient()
+
+
+def _wait_for(jobs, job_id, status, timeout=5):
+    until = time.monotonic() + timeout
+    while time.monotonic() < until:
+        job = jobs.get(job_id)
+        if job['status'] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} never reached {status}: {jobs.get(job_id)}")
+
+
+def _wait_for_plans(jobs, job_id, timeout=5):
+    until = time.monotonic() + timeout
+    while not jobs.get(job_id)['plans'] and time.monotonic() < until:
+        time.sleep(0.01)
+    return jobs.get(job_id)
+
+
+def _events(stream):
+    events = []
+    for chunk in stream:
+        if chunk.startswith(":"):
+            continue
+        name_line, data_line = chunk.strip().split("\n")
+        events.append((name_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return events
+
+
+@pytest.fixture
+def search_service():
+    return SteppedSearchService()
+
+
+@pytest.fixture
+def jobs(search_service):
+    return PlanJobService(search_service, FakeRedisService(), max_workers=1, max_pending=1, ttl_seconds=60)
+
+
+def test_job_runs_and_serves_plans_incrementally(jobs, search_service):
+    done = []
+    job_id = jobs.submit("user-1", [], (10.78, 106.69), on_done=done.append)
+    running = _wait_for(jobs, job_id, "running")
+    assert running['plans'] == [] and running['user_id'] == "user-1"
+
+    search_service.released.release()
+    first = _wait_for_plans(jobs, job_id)
+    assert [plan['id'] for plan in first['plans']] == [0] and first['next'] == 1
+
+    search_service.released.release()
+    job = _wait_for(jobs, job_id, "done")
+    assert [plan['id'] for plan in jobs.get(job_id, since=first['next'])['plans']] == [1]
+    assert [plan['id'] for plan in job['result']] == [0, 1]
+    assert done == [job['result']]
+
+
+def test_stream_sends_plans_then_done(jobs, search_service):
+    job_id = jobs.submit("user-1", [], (10.78, 106.69))
+    search_service.released.release()
+    search_service.released.release()
+
+    events = _events(jobs.stream(job_id, poll_seconds=0.01, timeout_seconds=5))
+
+    assert [name for name, _ in events] == ["plan", "plan", "done"]
+    assert [data['id'] for _, data in events[:2]] == [0, 1]
+    assert events[-1][1]['plans'] == [{'id': 0, 'cost': 1000}, {'id': 1, 'cost': 2000}]
+
+
+def test_stream_times_out_with_the_polling_position(jobs, search_service):
+    job_id = jobs.submit("user-1", [], (10.78, 106.69))
+    search_service.released.release()
+    _wait_for_plans(jobs, job_id)
+
+    events = _events(jobs.stream(job_id, poll_seconds=0.01, timeout_seconds=0.1))
+
+    assert [name for name, _ in events] == ["plan", "timeout"]
+    assert events[-1][1]['next'] == 1
+    search_service.released.release()
+    _wait_for(jobs, job_id, "done")
+
+
+def test_failed_job_reports_its_error():
+    search_service = SteppedSearchService(fail=True)
+    jobs = PlanJobService(search_service, FakeRedisService(), max_workers=1, max_pending=0, ttl_seconds=60)
+    job_id = jobs.submit("user-1", [], (10.78, 106.69))
+    search_service.released.release()
+
+    job = _wait_for(jobs, job_id, "failed")
+
+    assert job['error'] == "solver crashed" and 'result' not in job
+    assert _events(jobs.stream(job_id, poll_seconds=0.01, timeout_seconds=1)) == [
+        ("error", {'job_id': job_id, 'error': "solver crashed"})
+    ]
+
+
+def test_unknown_job_is_reported(jobs):
+    assert jobs.get("missing") is None
+    assert [name for name, _ in _events(jobs.stream("missing", poll_seconds=0.01))] == ["error"]
+
+
+def test_submit_refuses_jobs_beyond_workers_and_queue(jobs, search_service):
+    first = jobs.submit("user-1", [], (10.78, 106.69))
+    second = jobs.submit("user-1", [], (10.78, 106.69))
+
+    assert first and second
+    assert jobs.get(second)['status'] == "queued"
+    assert jobs.submit("user-1", [], (10.78, 106.69)) is None
+
+    for _ in range(4):
+        search_service.released.release()
+    _wait_for(jobs, second, "done")
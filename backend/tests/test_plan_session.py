@@ -0,0 +1,95 @@
+import copy
+
+import pytest
+
+from src.services.plan_session_service import PlanSessionService
+
+
+def _item(product_name, price, quantity=1):
+    return {
+        'product_name': product_name,
+        'quantity': quantity,
+        'candidates': [{'id': f"{product_name}-1", 'name': f"{product_name} 1kg", 'price': price}],
+    }
+
+
+@pytest.fixture
+def session():
+    return {
+        'stores_list': [
+            {'address': "12 Le Loi", 'lat': 10.776, 'lng': 106.700, 'items': [_item('milk', 32000), _item('rice', 41000)]},
+            {'address': "5 Hai Ba Trung", 'lat': 10.781, 'lng': 106.698, 'items': [_item('milk', 35000)]},
+        ],
+        'user_loc': [10.78, 106.69],
+        'product_names': ['milk', 'rice'],
+        'plan_kwargs': {'plan_mode': "weights", 'max_plans': None, 'latency_budget_seconds': None},
+        'purchases': {'0': [["12 Le Loi", "milk-1"], ["12 Le Loi", "rice-1"]]},
+    }
+
+
+def _store(session, address):
+    return next(store for store in session['stores_list'] if store['address'] == address)
+
+
+def _products(store):
+    return [item['product_name'] for item in store['items']]
+
+
+def test_add_product_with_its_offers(session):
+    edited = PlanSessionService.apply_delta(session, {
+        'add_products': ['eggs'],
+        'add_stores': [{'address': "12 Le Loi", 'lat': 10.776, 'lng': 106.700, 'items': [_item('eggs', 28000)]}],
+    })
+
+    assert edited['product_names'] == ['milk', 'rice', 'eggs']
+    assert _products(_store(edited, "12 Le Loi")) == ['milk', 'rice', 'eggs']
+    assert _products(_store(edited, "5 Hai Ba Trung")) == ['milk']
+
+
+def test_add_store(session):
+    new_store = {'address': "88 Nguyen Hue", 'lat': 10.774, 'lng': 106.703, 'items': [_item('rice', 39000)]}
+
+    edited = PlanSessionService.apply_delta(session, {'add_stores': [new_store]})
+
+    assert [store['address'] for store in edited['stores_list']] == ["12 Le Loi", "5 Hai Ba Trung", "88 Nguyen Hue"]
+    assert _store(edited, "88 Nguyen Hue") == new_store
+
+
+def test_remove_product_drops_its_offers(session):
+    edited = PlanSessionService.apply_delta(session, {'remove_products': ['rice']})
+
+    assert edited['product_names'] == ['milk']
+    assert _products(_store(edited, "12 Le Loi")) == ['milk']
+
+
+def test_remove_store(session):
+    edited = PlanSessionService.apply_delta(session, {'remove_stores': ["5 Hai Ba Trung"]})
+
+    assert [store['address'] for store in edited['stores_list']] == ["12 Le Loi"]
+
+
+def test_removing_every_product_is_rejected(session):
+    with pytest.raises(ValueError):
+        PlanSessionService.apply_delta(session, {'remove_products': ['milk', 'rice']})
+
+
+def test_quantity_change_replaces_only_that_item_entry(session):
+    edited = PlanSessionService.apply_delta(session, {
+        'add_stores': [{'address': "12 Le Loi", 'lat': 10.776, 'lng': 106.700, 'items': [_item('milk', 32000, quantity=3)]}],
+    })
+
+    items = {item['product_name']: item for item in _store(edited, "12 Le Loi")['items']}
+    assert items['milk']['quantity'] == 3
+    assert items['rice'] == _item('rice', 41000)
+    assert len(_store(edited, "12 Le Loi")['items']) == 2
+
+
+def test_delta_leaves_the_given_session_unchanged(session):
+    original = copy.deepcopy(session)
+
+    PlanSessionService.apply_delta(session, {
+        'remove_products': ['rice'], 'remove_stores': ["5 Hai Ba Trung"],
+        'add_stores': [{'address': "12 Le Loi", 'lat': 10.777, 'lng': 106.701, 'items': [_item('milk', 30000, quantity=2)]}],
+    })
+
+    assert session == original
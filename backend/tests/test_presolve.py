@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from benchmarks.bench_solver_suite import OfflineSearchService
+from benchmarks.instances import generate_instance
+from src.geodesic import haversine_matrix
+
+WEIGHTS = [0, 500, 500000]
+
+
+class DetourSearchService(OfflineSearchService):
+    """Haversine distances lengthened by a seeded, asymmetric detour factor, like road routes."""
+
+    def _get_distance_matrix(self, locations):
+        rnd = np.random.default_rng(len(locations))
+        return haversine_matrix(locations) * rnd.uniform(1.0, 1.8, size=(len(locations), len(locations)))
+
+
+class MatrixSearchService(OfflineSearchService):
+    def __init__(self, matrix, **kwargs):
+        super().__init__(**kwargs)
+        self.matrix = matrix
+
+    def _get_distance_matrix(self, locations):
+        return np.asarray(self.matrix, dtype=np.float64)
+
+
+def _objectives(service_class, stores_for_search, required_item_groups, user_loc, presolve, **kwargs):
+    service = service_class(execution_mode="sequential", solver_engine="exact_dp", exact_max_locations=20, presolve=presolve,
+                            plan_cache=None, plan_sessions=None, **kwargs)
+    base_model = service._prepare_base_model(stores_for_search, user_loc, required_item_groups)
+    objectives = []
+    for cost_per_km in WEIGHTS:
+        _, objective_scaled = service._solve_exact(service._apply_distance_cost(base_model, cost_per_km))
+        objectives.append(objective_scaled)
+    return objectives, base_model.presolve
+
+
+@pytest.mark.parametrize("service_class", [OfflineSearchService, DetourSearchService])
+@pytest.mark.parametrize("n_stores", [8, 12, 16])
+@pytest.mark.parametrize("seed", [0, 1, 2, 3])
+def test_presolve_keeps_the_optimum(service_class, n_stores, seed):
+    instance = generate_instance(n_stores, n_groups=4, candidates_per_group=3, seed=seed)
+    args = (instance.stores_for_search, instance.required_item_groups, instance.user_loc)
+
+    without, _ = _objectives(service_class, *args, presolve=False)
+    with_presolve, stats = _objectives(service_class, *args, presolve=True)
+
+    assert with_presolve == without
+    assert stats['nodes_after'] <= stats['nodes_before']
+
+
+def test_presolve_removes_dominated_locations():
+    removed = 0
+    for seed in range(4):
+        instance = generate_instance(16, n_groups=4, candidates_per_group=3, seed=seed)
+        _, stats = _objectives(OfflineSearchService, instance.stores_for_search, instance.required_item_groups, instance.user_loc, True)
+        removed += len(stats['removed_locations'])
+    assert removed > 0
+
+
+def test_presolve_keeps_a_dominated_location_that_shortcuts_a_route():
+    # Hubs A and B are 1 km from everything while C, D and the user are 100 km apart.
+    # A sells everything B sells as cheaply and is as close, but the best route passes
+    # through both hubs: dropping B would need the triangle inequality, which fails here.
+    stores = {
+        'A': {'lat': 10.0, 'lng': 106.0, 'items': {'rice': 20000, 'milk': 30000}},
+        'B': {'lat': 10.1, 'lng': 106.1, 'items': {'rice': 20000}},
+        'C': {'lat': 10.2, 'lng': 106.2, 'items': {'eggs': 25000}},
+        'D': {'lat': 10.3, 'lng': 106.3, 'items': {'coffee': 40000}},
+    }
+    groups = [{'rice'}, {'milk'}, {'eggs'}, {'coffee'}]
+    # user, A, B, C, D
+    matrix = [
+        [0, 1, 1, 100, 100],
+        [1, 0, 1, 1, 1],
+        [1, 1, 0, 1, 1],
+        [100, 1, 1, 0, 100],
+        [100, 1, 1, 100, 0],
+    ]
+    user_loc = {'lat': 10.5, 'lng': 106.5}
+
+    without, _ = _objectives(MatrixSearchService, stores, groups, user_loc, False, matrix=matrix)
+    with_presolve, stats = _objectives(MatrixSearchService, stores, groups, user_loc, True, matrix=matrix)
+
+    assert with_presolve == without
+    assert stats['removed_locations'] == []
@@ -0,0 +1,98 @@
+import copy
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.bench_solver_suite import OfflineSearchService
+from benchmarks.instances import generate_instance
+from src.services.plan_session_service import PlanSessionService
+from tests.test_anytime_plan import _stores_list
+
+
+class UnavailableRedisClient:
+    def __getattr__(self, name):
+        raise ConnectionError("Redis is down")
+
+
+class CountingSearchService(OfflineSearchService):
+    """Offline SearchService recording the distance matrices it fetches (shared with its replan copies)."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.matrix_fetches = []
+
+    def _get_distance_matrix(self, locations):
+        self.matrix_fetches.append(len(locations))
+        return super()._get_distance_matrix(locations)
+
+
+INSTANCE = generate_instance(12, n_groups=4, candidates_per_group=3, seed=3)
+USER_LOC = (INSTANCE.user_loc['lat'], INSTANCE.user_loc['lng'])
+ALL_STORES = _stores_list(INSTANCE)
+# The session starts without the last product
+STORES = [{**store, 'items': store['items'][:3]} for store in ALL_STORES]
+
+
+def _service(plan_sessions=None):
+    return CountingSearchService(execution_mode="sequential", solver_engine="exact_dp", plan_cache=None,
+                                 plan_sessions=plan_sessions)
+
+
+def _delta(kind):
+    if kind == "remove_product":
+        return {'remove_products': ["group 2"]}
+    if kind == "remove_store":
+        return {'remove_stores': [STORES[1]['address']]}
+    if kind == "add_product":
+        return {'add_products': ["group 3"],
+                'add_stores': [{**store, 'items': store['items'][3:]} for store in ALL_STORES if store['items'][3]['candidates']]}
+    if kind == "add_store":
+        return {'add_stores': [{'address': "New store", 'lat': USER_LOC[0] + 0.002, 'lng': USER_LOC[1] - 0.001,
+                                'items': copy.deepcopy(STORES[0]['items'])}]}
+    if kind == "move_store":
+        return {'add_stores': [{**STORES[0], 'lat': STORES[0]['lat'] + 0.003}]}
+    raise ValueError(kind)
+
+
+@pytest.fixture
+def service():
+    plan_sessions = PlanSessionService(redis_service=SimpleNamespace(client=UnavailableRedisClient()))
+    service = _service(plan_sessions)
+    service.get_plans_from_nearby(STORES, USER_LOC, session_id="session-1")
+    assert len(service.matrix_fetches) == 1
+    return service
+
+
+@pytest.mark.parametrize("kind, reuses_matrix", [
+    ("remove_product", True),
+    ("remove_store", True),
+    ("add_product", True),
+    ("add_store", False),
+    ("move_store", False),
+])
+def test_replan_matches_a_fresh_plan_of_the_edited_request(service, kind, reuses_matrix):
+    session, _ = service.plan_sessions.get("session-1")
+    edited = PlanSessionService.apply_delta(session, _delta(kind))
+
+    replanned = service.replan("session-1", _delta(kind))
+
+    fresh_service = _service()
+    fresh = fresh_service._plan_request(edited['stores_list'], USER_LOC, "weights", None, None, None,
+                                        product_names=edited['product_names'])
+    assert [(p['id'], p['_solver_objective_scaled'], p['_route_stops']) for p in replanned] == \
+           [(p['id'], p['_solver_objective_scaled'], p['_route_stops']) for p in fresh]
+    assert len(service.matrix_fetches) == (1 if reuses_matrix else 2)
+
+
+def test_replan_of_a_replan_keeps_the_edits(service):
+    service.replan("session-1", _delta("remove_store"))
+    replanned = service.replan("session-1", _delta("remove_product"))
+
+    session, _ = service.plan_sessions.get("session-1")
+    assert session['product_names'] == ["group 0", "group 1"]
+    assert STORES[1]['address'] not in [store['address'] for store in session['stores_list']]
+    assert all(len(p['_route_stops']) <= 2 for p in replanned)
+
+
+def test_unknown_session_is_not_replanned(service):
+    assert service.replan("missing", _delta("remove_product")) is None
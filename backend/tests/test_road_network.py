@@ -0,0 +1,81 @@
+import heapq
+import math
+import random
+
+import numpy as np
+import pytest
+
+from src.road_network import RoadNetwork
+
+
+def _synthetic_graph(seed, rows=8, cols=8):
+    """Jittered grid with random lengths, some one-way streets, diagonals and an isolated node."""
+    rnd = random.Random(seed)
+    node_coords = [(10.75 + r * 0.004 + rnd.uniform(-0.001, 0.001), 106.65 + c * 0.004 + rnd.uniform(-0.001, 0.001))
+                   for r in range(rows) for c in range(cols)]
+    node_coords.append((10.9, 106.9))
+    tails, heads, lengths = [], [], []
+
+    def road(u, v):
+        length = rnd.uniform(0.3, 1.5)
+        tails.append(u)
+        heads.append(v)
+        lengths.append(length)
+        if rnd.random() > 0.2:
+            tails.append(v)
+            heads.append(u)
+            lengths.append(length * rnd.uniform(1.0, 1.3))
+
+    for r in range(rows):
+        for c in range(cols):
+            u = r * cols + c
+            if c + 1 < cols:
+                road(u, u + 1)
+            if r + 1 < rows:
+                road(u, u + cols)
+            if r + 1 < rows and c + 1 < cols and rnd.random() < 0.3:
+                road(u, u + cols + 1)
+    return node_coords, tails, heads, lengths
+
+
+def _dijkstra(num_nodes, tails, heads, lengths, source):
+    adjacency = [[] for _ in range(num_nodes)]
+    for u, v, length in zip(tails, heads, lengths):
+        adjacency[u].append((v, length))
+    dist = [math.inf] * num_nodes
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for v, length in adjacency[u]:
+            if d + length < dist[v]:
+                dist[v] = d + length
+                heapq.heappush(heap, (dist[v], v))
+    return dist
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_many_to_many_distances_match_dijkstra(seed):
+    node_coords, tails, heads, lengths = _synthetic_graph(seed)
+    network = RoadNetwork.from_edges(node_coords, tails, heads, lengths)
+    nodes = np.arange(len(node_coords))
+
+    expected = np.array([_dijkstra(len(node_coords), tails, heads, lengths, source) for source in nodes])
+
+    np.testing.assert_allclose(network.node_distances(nodes, nodes), expected, rtol=1e-9)
+
+
+def test_distance_matrix_adds_the_access_legs():
+    node_coords, tails, heads, lengths = _synthetic_graph(0)
+    network = RoadNetwork.from_edges(node_coords, tails, heads, lengths, max_snap_km=1.0)
+    locations = [(lat + 0.0003, lng - 0.0002) for lat, lng in node_coords[:64:9]]
+
+    nodes, offsets = network.snap(locations)
+    expected = offsets[:, None] + np.array([
+        [_dijkstra(len(node_coords), tails, heads, lengths, int(source))[int(target)] for target in nodes] for source in nodes
+    ]) + offsets[None, :]
+    np.fill_diagonal(expected, 0.0)
+
+    np.testing.assert_allclose(network.distance_matrix(locations), expected, rtol=1e-9)
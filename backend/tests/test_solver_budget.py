@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+from benchmarks.bench_solver_suite import OfflineSearchService
+from benchmarks.instances import generate_instance
+
+
+def _service(**kwargs):
+    return OfflineSearchService(execution_mode="sequential", plan_cache=None, plan_sessions=None, **kwargs)
+
+
+def test_adaptive_budget_grows_with_the_node_count_up_to_the_cap():
+    service = _service(max_time_limit_seconds=2)
+    budgets = [service._solver_budget(num_nodes) for num_nodes in (10, 50, 100, 200, 1000, 5000)]
+    time_limits = [budget['time_limit_seconds'] for budget in budgets]
+    solution_limits = [budget['solution_limit'] for budget in budgets]
+
+    assert time_limits == sorted(time_limits) and time_limits[0] < time_limits[-1]
+    assert max(time_limits) == service._max_solve_seconds() == 2
+    assert solution_limits == sorted(solution_limits) and len(set(solution_limits)) == len(solution_limits)
+    assert all(budget['limited_by'] == "time_limit" for budget in budgets)
+
+
+def test_fixed_budget_ignores_the_node_count():
+    service = _service(time_budget_policy="fixed", time_limit_seconds=3)
+
+    assert {service._solver_budget(num_nodes)['time_limit_seconds'] for num_nodes in (10, 1000)} == {3}
+    assert service._solver_budget(1000)['solution_limit'] is None
+
+
+@pytest.mark.parametrize("seconds_left, expected", [(0.5, 0.5), (0.0, 0.1)])
+def test_deadline_caps_the_time_limit(seconds_left, expected):
+    service = _service(max_time_limit_seconds=10)
+
+    budget = service._solver_budget(5000, deadline=time.monotonic() + seconds_left)
+
+    assert budget['limited_by'] == "latency_budget"
+    assert budget['time_limit_seconds'] == pytest.approx(expected, abs=0.01)
+
+
+def test_no_improvement_window_is_a_share_of_the_time_limit():
+    service = _service(max_time_limit_seconds=10)
+
+    budget = service._solver_budget(1000)
+
+    assert budget['no_improvement_seconds'] == pytest.approx(service.NO_IMPROVEMENT_FRACTION * budget['time_limit_seconds'])
+    assert _service(no_improvement_seconds=0.3)._solver_budget(1000)['no_improvement_seconds'] == 0.3
+
+
+def test_search_stops_early_without_improvement():
+    service = _service(solver_engine="or_tools", max_time_limit_seconds=5, no_improvement_seconds=0.2)
+    instance = generate_instance(100, seed=0)
+
+    plan = service.find_optimal_shopping_plan(instance.stores_for_search, instance.required_item_groups, instance.user_loc)[0]
+
+    budget = plan['_solver_budget']
+    assert budget['stop_reason'] in ("no_improvement", "solution_limit", "search_completed")
+    assert budget['elapsed_seconds'] < budget['time_limit_seconds']
@@ -0,0 +1,83 @@
+import time
+from types import SimpleNamespace
+
+from benchmarks.bench_solver_suite import OfflineSearchService
+from benchmarks.instances import generate_instance
+from src.services.solver_metrics_service import SolverMetricsService, SolverTelemetry
+
+
+class UnavailableRedisClient:
+    def pipeline(self, transaction=True):
+        raise ConnectionError("Redis is down")
+
+
+def _telemetry(first_solution_seconds, time_to_best_seconds, improvement_after_first, solutions):
+    return {
+        'status': "ROUTING_SUCCESS", 'stop_reason': "no_improvement", 'elapsed_seconds': 1.0, 'solutions': solutions,
+        'first_solution_seconds': first_solution_seconds, 'time_to_best_seconds': time_to_best_seconds,
+        'improvement_after_first': improvement_after_first,
+    }
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics = SolverMetricsService(redis_service=SimpleNamespace(client=UnavailableRedisClient()))
+    metrics.observe(_telemetry(0.004, 0.02, 0.0, 3))
+    metrics.observe(_telemetry(0.03, 0.6, 0.015, 40))
+    metrics.observe(_telemetry(7.0, 12.0, 0.3, 800))
+
+    snapshot = metrics.snapshot()
+
+    assert snapshot['source'] == "process"
+    first_solution = snapshot['histograms']['first_solution_seconds']
+    buckets = dict((bound, count) for bound, count in first_solution['buckets'])
+    assert (buckets[0.005], buckets[0.025], buckets[0.05], buckets[5], buckets["inf"]) == (1, 1, 2, 2, 3)
+    assert first_solution['count'] == 3
+    assert abs(first_solution['mean'] - (0.004 + 0.03 + 7.0) / 3) < 1e-6
+    for histogram in snapshot['histograms'].values():
+        counts = [count for _, count in histogram['buckets']]
+        assert counts == sorted(counts) and counts[-1] == histogram['count']
+    assert snapshot['counters']['stop_reason'] == {"no_improvement": 3}
+
+
+def test_seed_is_kept_apart_from_the_solutions_found():
+    telemetry = SolverTelemetry(started=time.monotonic())
+    telemetry.set_seed("greedy", 1000)
+    for objective in (1000, 1010, 990, 995, 980):
+        telemetry.record(objective)
+
+    summary = telemetry.summary("ROUTING_SUCCESS", "no_improvement")
+
+    assert (summary['seed'], summary['seed_objective'], summary['solutions']) == ("greedy", 1000, 4)
+    assert [objective for _, objective in summary['curve']] == [1010, 990, 980]
+    assert (summary['first_objective'], summary['best_objective']) == (1010, 980)
+    assert summary['improvement_after_first'] == round(30 / 1010, 6)
+    assert summary['improvement_over_seed'] == 0.02
+
+
+def test_seed_is_the_best_when_the_search_finds_nothing_cheaper():
+    telemetry = SolverTelemetry(started=time.monotonic())
+    telemetry.set_seed("warm_start", 1000)
+    for objective in (1000, 1000, 1200):
+        telemetry.record(objective)
+
+    summary = telemetry.summary("ROUTING_SUCCESS")
+
+    assert summary['best_objective'] == 1000 and summary['time_to_best_seconds'] == telemetry.seed_seconds
+    assert summary['first_objective'] == 1000 and summary['improvement_over_seed'] == 0.0
+
+
+def test_solve_telemetry_counts_the_search_solutions_only():
+    service = OfflineSearchService(execution_mode="sequential", solver_engine="or_tools", solver_telemetry=True,
+                                   plan_cache=None, plan_sessions=None)
+    service.solver_metrics = None
+    instance = generate_instance(30, seed=1)
+
+    plan = service.find_optimal_shopping_plan(instance.stores_for_search, instance.required_item_groups, instance.user_loc)[0]
+
+    budget = plan['_solver_budget']
+    telemetry = budget['telemetry']
+    assert telemetry['seed'] == budget['first_solution'] == "greedy"
+    # OR-Tools reports the seed assignment as the search's first solution
+    assert telemetry['solutions'] == budget['solutions'] - 1
+    assert telemetry['best_objective'] == plan['_solver_objective_scaled'] <= telemetry['seed_objective']
+    assert telemetry['time_to_best_seconds'] <= telemetry['elapsed_seconds']
@@ -0,0 +1,62 @@
+import pytest
+
+from benchmarks.bench_solver_suite import OfflineSearchService
+from benchmarks.instances import generate_instance
+from src.services import search_service
+from src.services.search_service import SearchService
+
+
+class RecordingSolverMetrics:
+    def __init__(self):
+        self.observed = []
+
+    def observe(self, telemetry):
+        self.observed.append(telemetry)
+
+
+@pytest.fixture
+def solver_pool():
+    yield
+    search_service._reset_solver_pool()
+
+
+def _service(execution_mode):
+    return OfflineSearchService(
+        execution_mode=execution_mode, solver_engine="or_tools", warm_start=False, solver_telemetry=True,
+        solver_metrics=RecordingSolverMetrics(), plan_cache=None, plan_sessions=None
+    )
+
+
+def _solve_args(service, n_stores, seed):
+    instance = generate_instance(n_stores, n_groups=3, candidates_per_group=3, seed=seed)
+    base_model = service._prepare_base_model(instance.stores_for_search, instance.user_loc, instance.required_item_groups)
+    return instance.stores_for_search, instance.required_item_groups, instance.user_loc, base_model, None
+
+
+@pytest.mark.parametrize("n_stores, seed", [(12, 0), (20, 1)])
+def test_pool_returns_the_sequential_plans(solver_pool, n_stores, seed):
+    sequential, pooled = _service("sequential"), _service("process_pool")
+
+    expected = [sequential._solve_weight(_solve_args(sequential, n_stores, seed), cost_per_km)
+                for cost_per_km in SearchService.DISTANCE_COSTS_TO_TRY]
+    plans = pooled._solve_weights_in_pool(_solve_args(pooled, n_stores, seed), SearchService.DISTANCE_COSTS_TO_TRY)
+
+    assert ([[(p['_solver_objective_scaled'], p['_route_stops']) for p in plan] for plan in plans]
+            == [[(p['_solver_objective_scaled'], p['_route_stops']) for p in plan] for plan in expected])
+    # Workers have no metrics client, their telemetry is recorded by the calling process
+    assert len(pooled.solver_metrics.observed) == len(SearchService.DISTANCE_COSTS_TO_TRY)
+
+
+def test_task_dequeued_after_its_deadline_is_not_solved():
+    service = _service("sequential")
+    _, _, _, base_model, _ = _solve_args(service, 12, 0)
+
+    plans = search_service._solve_weight_in_worker(service._solver_settings(), base_model, 0.0, 500)
+
+    assert plans[0]['_status_code'] == "SOLVER_TIMEOUT"
+
+
+def test_worker_service_has_no_clients():
+    service = SearchService(execution_mode="sequential", solver_only=True)
+
+    assert (service.redis_service, service.plan_cache, service.plan_sessions, service.solver_metrics) == (None, None, None, None)
@@ -0,0 +1,91 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src.geodesic import haversine_matrix
+from src.services import store_distance_table
+from src.services.store_distance_table import StoreDistanceTable
+
+STORES = [
+    {'_id': "s1", 'lat': 10.7769, 'lng': 106.7009},
+    {'_id': "s2", 'lat': 10.7844, 'lng': 106.6844},
+    {'_id': "s3", 'lat': 10.7540, 'lng': 106.6634},
+]
+
+
+def _fetch_matrix(locations, sources, destinations):
+    return haversine_matrix([locations[i] for i in sources], [locations[j] for j in destinations]).tolist()
+
+
+def _chunk_routes(sources, destinations):
+    # Small chunks, so that a build stitches several blocks
+    return [([source], destinations) for source in sources]
+
+
+def _locations(stores):
+    return [(store['lat'], store['lng']) for store in stores]
+
+
+def _distances(table, stores):
+    rows = table.rows_for(_locations(stores))
+    assert None not in rows
+    return table.submatrix(rows)
+
+
+@pytest.fixture
+def table(tmp_path):
+    return StoreDistanceTable(path=str(tmp_path / "store_distances.npy"), precision=6)
+
+
+def test_incremental_build_adds_only_new_stores(table):
+    assert table.build(STORES[:2], _fetch_matrix, _chunk_routes) == 2
+    assert table.build(STORES, _fetch_matrix, _chunk_routes) == 1
+    assert table.build(STORES, _fetch_matrix, _chunk_routes) == 0
+
+    np.testing.assert_allclose(_distances(table, STORES), haversine_matrix(_locations(STORES)), rtol=1e-6)
+
+
+def test_moved_store_gets_the_distances_of_its_new_coordinates(table):
+    table.build(STORES, _fetch_matrix, _chunk_routes)
+    moved = [*STORES[:2], {**STORES[2], 'lat': 10.8106, 'lng': 106.7091}]
+
+    assert table.build(moved, _fetch_matrix, _chunk_routes) == 1
+
+    np.testing.assert_allclose(_distances(table, moved), haversine_matrix(_locations(moved)), rtol=1e-6)
+    # The old coordinates keep their own distances for readers of the previous index
+    np.testing.assert_allclose(_distances(table, STORES), haversine_matrix(_locations(STORES)), rtol=1e-6)
+    assert table.build(moved, _fetch_matrix, _chunk_routes) == 0
+
+
+def test_full_rebuild_drops_rows_of_moved_stores(table):
+    table.build(STORES, _fetch_matrix, _chunk_routes)
+    moved = [*STORES[:2], {**STORES[2], 'lat': 10.8106, 'lng': 106.7091}]
+    table.build(moved, _fetch_matrix, _chunk_routes)
+
+    assert table.build(moved, _fetch_matrix, _chunk_routes, incremental=False) == 3
+    assert table.rows_for(_locations(STORES[2:])) == [None]
+
+
+def test_updates_requested_while_one_runs_are_coalesced(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    runs = []
+
+    def update():
+        runs.append(threading.current_thread().name)
+        started.set()
+        release.wait(5)
+
+    monkeypatch.setattr(store_distance_table, "update_store_distance_table", update)
+    assert store_distance_table.schedule_store_distance_table_update()
+    assert started.wait(5)
+    assert not any(store_distance_table.schedule_store_distance_table_update() for _ in range(3))
+    release.set()
+
+    for _ in range(100):
+        with store_distance_table._update_lock:
+            if not store_distance_table._update_running:
+                break
+        time.sleep(0.05)
+    assert len(runs) == 2
@@ -0,0 +1,67 @@
+import pytest
+
+from benchmarks.bench_solver_suite import OfflineSearchService
+from benchmarks.instances import generate_instance
+
+
+@pytest.fixture(scope="module")
+def service():
+    return OfflineSearchService(execution_mode="sequential", solver_engine="or_tools", max_time_limit_seconds=1,
+                                plan_cache=None, plan_sessions=None)
+
+
+def _model(service, n_stores, seed, cost_per_km):
+    instance = generate_instance(n_stores, seed=seed)
+    base_model = service._prepare_base_model(instance.stores_for_search, instance.user_loc, instance.required_item_groups)
+    return base_model, service._apply_distance_cost(base_model, cost_per_km)
+
+
+def _greedy_objective(service, data_model):
+    return service._route_objective_scaled(data_model, service._greedy_route(data_model))
+
+
+@pytest.mark.parametrize("n_stores", [30, 80])
+@pytest.mark.parametrize("seed", [0, 1])
+def test_previous_weight_start_is_never_worse_than_greedy(service, n_stores, seed):
+    base_model, data_model = _model(service, n_stores, seed, 500)
+    previous = service._solve_base_model(base_model, 0)[0]
+
+    plan = service._solve_base_model(base_model, 500, initial_route=previous['_route_stops'])[0]
+
+    assert plan['_solver_objective_scaled'] <= _greedy_objective(service, data_model)
+    start = plan['_solver_budget']['first_solution']
+    assert start in ("warm_start", "greedy")
+    if start == "warm_start":
+        start_objective = service._route_objective_scaled(
+            data_model, [data_model.depot, *service._initial_route_nodes(data_model, previous['_route_stops']), data_model.depot]
+        )
+        assert start_objective <= _greedy_objective(service, data_model)
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_worse_initial_route_is_replaced_by_greedy(service, seed):
+    base_model, data_model = _model(service, 30, seed, 500000)
+    # Each group bought at the farthest location selling it
+    cheapest_price, _ = data_model.cheapest_nodes()
+    distance_from_user = data_model.distance_km[0]
+    bad_route = []
+    for group_idx in range(data_model.num_groups):
+        sellers = [loc for loc in range(1, data_model.num_locations) if cheapest_price[loc, group_idx] < float("inf")]
+        bad_route.append([max(sellers, key=lambda loc: distance_from_user[loc]), group_idx])
+
+    plan = service._solve_base_model(base_model, 500000, initial_route=bad_route)[0]
+
+    assert plan['_solver_budget']['first_solution'] == "greedy"
+    assert plan['_solver_budget']['warm_start'] is False
+    assert plan['_solver_objective_scaled'] <= _greedy_objective(service, data_model)
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_solved_route_of_the_same_weight_is_used_and_kept(service, seed):
+    base_model, data_model = _model(service, 80, seed, 500)
+    solved = service._solve_base_model(base_model, 500)[0]
+
+    plan = service._solve_base_model(base_model, 500, initial_route=solved['_route_stops'])[0]
+
+    assert plan['_solver_budget']['first_solution'] == "warm_start"
+    assert plan['_solver_objective_scaled'] <= solved['_solver_objective_scaled']